@@ -0,0 +1,41 @@
+"""Mevcut form gönderileri için mükerrer kayıt özetlerini (data_hash) ve
+alan bazlı şifreli değerleri (submission_values) doldurur.
+
+Tek seferlik çalıştırılır:
+    python bot/backfill_hashes.py [--batch 500]
+"""
+import argparse
+import sys
+from config import logger
+from bot.database.db_manager import get_database_manager
+from bot.database.keys import get_encryption_key
+
+
+def main():
+    parser = argparse.ArgumentParser(description="form_submissions.data_hash ve submission_values doldur")
+    parser.add_argument('--batch', type=int, default=500, help="Her işlemde güncellenecek kayıt sayısı")
+    args = parser.parse_args()
+    
+    # Özetler ve şifreli değerler canlı yolla aynı anahtarlarla üretilmeli
+    if not get_encryption_key():
+        logger.error("POSTGRES_ENCRYPTION_KEY bulunamadı!")
+        sys.exit(1)
+    
+    db_manager = get_database_manager()
+    
+    # Sütun ve indeksin var olduğundan emin ol
+    if not db_manager.setup_database():
+        logger.error("Veritabanı kurulumu başarısız oldu!")
+        sys.exit(1)
+    
+    result = db_manager.backfill_submission_hashes(batch_size=args.batch)
+    print(f"✅ Özet doldurma tamamlandı: {result['updated']} kayıt güncellendi, "
+          f"{result['duplicates']} mükerrer kayıt atlandı.")
+    
+    result = db_manager.backfill_submission_values(batch_size=args.batch)
+    print(f"✅ Alan değeri doldurma tamamlandı: {result['updated']} kayıt işlendi, "
+          f"{result['cleared']} kaydın tüm veri kopyası silindi.")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,9 +11,119 @@ SUPER_ADMIN_ID = int(os.getenv('SUPER_ADMIN_ID'))  # Süper admin Telegram ID'si
 NOWPAYMENTS_API_KEY = os.getenv('NOWPAYMENTS_API_KEY')  # NowPayments API anahtarı
 NOTIFICATION_BOT_TOKEN = os.getenv('NOTIFICATION_BOT_TOKEN')  # Bildirim botu token'ı
 
+# NowPayments HTTP istemcisi ayarları
+NOWPAYMENTS_API_URL = os.getenv('NOWPAYMENTS_API_URL', 'https://api.nowpayments.io/v1')
+NOWPAYMENTS_TIMEOUT = float(os.getenv('NOWPAYMENTS_TIMEOUT', '15'))
+NOWPAYMENTS_RETRIES = int(os.getenv('NOWPAYMENTS_RETRIES', '2'))
+# Ardışık bu kadar hatadan sonra istekler NOWPAYMENTS_BREAKER_RESET saniye kesilir
+NOWPAYMENTS_BREAKER_THRESHOLD = int(os.getenv('NOWPAYMENTS_BREAKER_THRESHOLD', '5'))
+NOWPAYMENTS_BREAKER_RESET = float(os.getenv('NOWPAYMENTS_BREAKER_RESET', '60'))
+
+# Güncelleme alma modu: 'polling' veya 'webhook'
+BOT_MODE = os.getenv('BOT_MODE', 'polling').lower()
+# Webhook modunda dışarıdan erişilen adres (ör. https://bot.example.com)
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '').rstrip('/')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN', '')
+NOWPAYMENTS_IPN_PATH = os.getenv('NOWPAYMENTS_IPN_PATH', '/nowpayments/ipn')
+NOWPAYMENTS_IPN_SECRET = os.getenv('NOWPAYMENTS_IPN_SECRET', '')
+
+# Prometheus /metrics sunucusu (0: kapalı); yalnızca yerel ağdan erişilmesi önerilir
+METRICS_LISTEN = os.getenv('METRICS_LISTEN', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+
+# Bekleyen ödemeleri sorgulayan zamanlayıcı ayarları (saniye)
+PAYMENT_POLL_INTERVAL = float(os.getenv('PAYMENT_POLL_INTERVAL', '15'))
+PAYMENT_POLL_MAX_INTERVAL = float(os.getenv('PAYMENT_POLL_MAX_INTERVAL', '120'))
+# Ödeme her bu kadar saniye yaşlandığında sorgulama aralığı iki katına çıkar
+PAYMENT_BACKOFF_STEP = float(os.getenv('PAYMENT_BACKOFF_STEP', '120'))
+PAYMENT_POLL_BATCH = int(os.getenv('PAYMENT_POLL_BATCH', '20'))
+# Ödeme adresinin geçerlilik süresi (dakika); bu sürede ödeme gelmezse ödeme seyrek
+# sorgulanır (PAYMENT_TIMED_OUT_POLL_INTERVAL sn). Zincirde ilerleyen ödemeler son duruma
+# kadar, en fazla PAYMENT_HARD_EXPIRY_HOURS saat sorgulanır
+PAYMENT_EXPIRY_MINUTES = int(os.getenv('PAYMENT_EXPIRY_MINUTES', '20'))
+PAYMENT_TIMED_OUT_POLL_INTERVAL = float(os.getenv('PAYMENT_TIMED_OUT_POLL_INTERVAL', '600'))
+PAYMENT_HARD_EXPIRY_HOURS = float(os.getenv('PAYMENT_HARD_EXPIRY_HOURS', '72'))
+
+# Bot persistence: değişen verinin veritabanına yazılma aralığı (sn) ve
+# birden fazla bot sürecinin aynı veriyi paylaşması (her güncellemede sürüm kontrolü)
+PERSISTENCE_UPDATE_INTERVAL = float(os.getenv('PERSISTENCE_UPDATE_INTERVAL', '5'))
+PERSISTENCE_SHARED = os.getenv('PERSISTENCE_SHARED', 'false').lower() == 'true'
+
+# Yarıda bırakılan konuşmaların zaman aşımı (sn), dokunulmayan user_data/chat_data
+# ömrü (sn), temizlik işinin aralığı (sn) ve bellekte tutulacak en fazla callback verisi
+CONVERSATION_TIMEOUT = float(os.getenv('CONVERSATION_TIMEOUT', '900'))
+USER_DATA_TTL = float(os.getenv('USER_DATA_TTL', '86400'))
+COMPACTION_INTERVAL = float(os.getenv('COMPACTION_INTERVAL', '3600'))
+CALLBACK_DATA_MAXSIZE = int(os.getenv('CALLBACK_DATA_MAXSIZE', '512'))
+
+# Yavaş sorgu eşiği (ms, 0: kapalı) ve isteğe bağlı EXPLAIN (ANALYZE, BUFFERS) örneklemesi:
+# aynı sorgu için en fazla EXPLAIN_INTERVAL saniyede bir plan alınır, plan sorgusu TIMEOUT sn ile sınırlıdır
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '500'))
+SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'false').lower() == 'true'
+SLOW_QUERY_EXPLAIN_INTERVAL = float(os.getenv('SLOW_QUERY_EXPLAIN_INTERVAL', '600'))
+SLOW_QUERY_EXPLAIN_TIMEOUT = float(os.getenv('SLOW_QUERY_EXPLAIN_TIMEOUT', '10'))
+
+# Event loop izleyicisi: ölçüm aralığı (sn, 0: kapalı), gecikme uyarı eşiği (ms) ve
+# loop bu kadar ms bloklandığında çalışan kodun yığın izini loglayan izleme thread'i (0: kapalı)
+LOOP_MONITOR_INTERVAL = float(os.getenv('LOOP_MONITOR_INTERVAL', '0.25'))
+LOOP_LAG_WARN_MS = float(os.getenv('LOOP_LAG_WARN_MS', '250'))
+LOOP_BLOCK_MS = float(os.getenv('LOOP_BLOCK_MS', '0'))
+
+# Veritabanı bağlantı havuzu ayarları (tüm süreç için tek havuz)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+# Senkron engine sadece kurulum ve senkron metotlar için kullanılır
+DB_SYNC_POOL_SIZE = int(os.getenv('DB_SYNC_POOL_SIZE', '2'))
+
+# Yetki önbelleği ayarları (admin ve yetkili grup kontrolleri)
+AUTH_CACHE_TTL = float(os.getenv('AUTH_CACHE_TTL', '60'))
+AUTH_CACHE_SIZE = int(os.getenv('AUTH_CACHE_SIZE', '10000'))
+# Olumsuz sonuçlar (admin değil / yetkisiz grup) daha kısa süre tutulur
+AUTH_CACHE_NEGATIVE_TTL = float(os.getenv('AUTH_CACHE_NEGATIVE_TTL', '5'))
+# Diğer süreçlerdeki değişiklikler (cache_versions) en fazla bu aralıkla (sn) kontrol edilir
+CACHE_SYNC_INTERVAL = float(os.getenv('CACHE_SYNC_INTERVAL', '2'))
+
+# Form tanımı önbelleği ayarları
+FORM_CACHE_TTL = float(os.getenv('FORM_CACHE_TTL', '300'))
+FORM_CACHE_SIZE = int(os.getenv('FORM_CACHE_SIZE', '2000'))
+
+# Bildirim dağıtıcısı ayarları (Telegram: sohbet başına ~1 mesaj/sn, global ~30 mesaj/sn)
+NOTIFY_QUEUE_SIZE = int(os.getenv('NOTIFY_QUEUE_SIZE', '1000'))
+NOTIFY_GLOBAL_RATE = float(os.getenv('NOTIFY_GLOBAL_RATE', '25'))
+NOTIFY_CHAT_INTERVAL = float(os.getenv('NOTIFY_CHAT_INTERVAL', '1.0'))
+# Süper admine giden bildirimlerin özet mesajda birleştirileceği bekleme süresi
+NOTIFY_DIGEST_WINDOW = float(os.getenv('NOTIFY_DIGEST_WINDOW', '2.0'))
+
+# Kullanıcı profili (Telegram adı) önbelleği ayarları
+PROFILE_CACHE_TTL = float(os.getenv('PROFILE_CACHE_TTL', '600'))
+PROFILE_CACHE_SIZE = int(os.getenv('PROFILE_CACHE_SIZE', '5000'))
+
+# Rapor süreç havuzu ayarları (0 işçi: raporlar thread havuzunda oluşturulur)
+REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', '2'))
+REPORT_PER_ADMIN_LIMIT = int(os.getenv('REPORT_PER_ADMIN_LIMIT', '1'))
+
 # ImgBB API için gerekli ayarlar
 IMGBB_API_KEY = os.getenv('IMGBB_API_KEY', '')
 IMGBB_UPLOAD_URL = os.getenv('IMGBB_UPLOAD_URL', '')
+# Yükleme zaman aşımı (saniye) ve akış blok boyutu (bayt)
+IMGBB_TIMEOUT = float(os.getenv('IMGBB_TIMEOUT', '60'))
+IMGBB_CHUNK_SIZE = int(os.getenv('IMGBB_CHUNK_SIZE', '65536'))
+
+# Dekont deposu: 'imgbb' veya harici servis gerektirmeyen 'filesystem'
+RECEIPT_STORE_BACKEND = os.getenv('RECEIPT_STORE_BACKEND', 'imgbb')
+RECEIPT_STORE_DIR = os.getenv('RECEIPT_STORE_DIR', 'receipts')
+# Arka plan dekont yükleme işçisi: kontrol aralığı (sn), tur başına dekont,
+# en fazla deneme ve bir denemenin başka işçilere kapalı kaldığı süre (sn)
+RECEIPT_UPLOAD_INTERVAL = float(os.getenv('RECEIPT_UPLOAD_INTERVAL', '30'))
+RECEIPT_UPLOAD_BATCH = int(os.getenv('RECEIPT_UPLOAD_BATCH', '5'))
+RECEIPT_UPLOAD_MAX_ATTEMPTS = int(os.getenv('RECEIPT_UPLOAD_MAX_ATTEMPTS', '8'))
+RECEIPT_UPLOAD_LEASE = float(os.getenv('RECEIPT_UPLOAD_LEASE', '180'))
+# Dosya sistemindeki dekontların sunulduğu adres (boşsa "dekont:<sha256>" referansı kullanılır)
+RECEIPT_PUBLIC_URL = os.getenv('RECEIPT_PUBLIC_URL', '')
 
 # Debugging için çevre değişkenlerini logla
 print(f"DEBUG - ImgBB API Anahtarı mevcut mu: {'Evet' if IMGBB_API_KEY else 'Hayır'}")
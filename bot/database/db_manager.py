@@ -1,14 +1,155 @@
 import io
+import asyncio
+import hashlib
+import hmac
 import logging
 import os
-from typing import List, Tuple, Dict
-from config import logger, SUPER_ADMIN_ID
+import time
+from contextlib import asynccontextmanager
+from typing import List, Tuple, Dict, Optional
+from config import (
+    logger, SUPER_ADMIN_ID,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_SYNC_POOL_SIZE,
+    REPORT_WORKERS, AUTH_CACHE_TTL, AUTH_CACHE_SIZE, AUTH_CACHE_NEGATIVE_TTL,
+    FORM_CACHE_TTL, FORM_CACHE_SIZE, CACHE_SYNC_INTERVAL
+)
 from datetime import datetime
 from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import SQLAlchemyError
-from openpyxl import Workbook
-from openpyxl.styles import PatternFill, Font, Alignment
+from bot.database.report_builder import build_report, run_report_job
+from bot.database.query_monitor import QueryMonitor
+from bot.database.keys import get_encryption_key, require_encryption_key, get_submission_hash_key, get_blind_index_key
+from bot.utils.report_pool import ReportPool, ReportBusyError
+from bot.utils.cache import TTLCache, MISSING
+from bot.utils.metrics import instrument_methods, DB_POOL_WAIT, FORM_SUBMISSIONS, REPORT_SIZE
+
+# Asenkron veritabanı modu (SQLAlchemy asyncio + asyncpg)
+DB_ASYNC_MODE = os.getenv('DB_ASYNC_MODE', 'true').lower() == 'true'
+
+# Aranabilir alanların kör indeksleri tutulur (anahtarlar bot/database/keys.py üzerinden)
+# Adında bu kelimelerden biri geçen alanlar için kör indeks tutulur
+BLIND_INDEX_FIELDS = [
+    keyword.strip().lower()
+    for keyword in os.getenv('BLIND_INDEX_FIELDS', 'isim soyisim,ad soyad,adı soyadı,ad ve soyad,telefon,iban,tc kimlik').split(',')
+    if keyword.strip()
+]
+
+
+def submission_digest(data: str) -> str:
+    """Form verisinin normalize edilmiş halinin anahtarlı HMAC-SHA256 özetini hesapla"""
+    # Satır içi fazla boşlukları ve satır başı/sonu boşluklarını yok say
+    normalized = '\n'.join(' '.join(line.split()) for line in data.strip().split('\n'))
+    return hmac.new(
+        get_submission_hash_key().encode('utf-8'),
+        normalized.encode('utf-8'),
+        hashlib.sha256
+    ).hexdigest()
+
+
+def _fold_text(value: str) -> str:
+    """Aramada eşleşmesi için metni normalize et (boşluk, büyük/küçük harf, i/ı/İ/I)"""
+    value = ' '.join(value.split())
+    for char in ('İ', 'I', 'ı'):
+        value = value.replace(char, 'i')
+    return value.lower()
+
+
+def blind_index(field_name: str, value: str) -> str:
+    """Alan değerinin anahtarlı kör indeksi (şifreyi çözmeden eşitlik araması için)
+
+    Alan adı özete dahil edilir; farklı alanlardaki aynı değerler eşleşmez.
+    """
+    message = f"{_fold_text(field_name)}\x00{_fold_text(value)}"
+    return hmac.new(get_blind_index_key().encode('utf-8'), message.encode('utf-8'), hashlib.sha256).hexdigest()[:32]
+
+
+def _searchable_field_indexes(fields: list) -> list:
+    """Kör indeks tutulacak alanların sıralarını bul"""
+    return [
+        i for i, field in enumerate(fields)
+        if any(keyword in field.lower() for keyword in BLIND_INDEX_FIELDS)
+    ]
+
+
+def split_submission_values(data: str, fields: list) -> dict:
+    """Gönderi metnini satır bazlı değerlere ve kör indekslere ayır
+
+    Dönen sözlük submission_values tablosuna unnest ile yazılacak dizileri içerir.
+    Alan sayısından fazla satırlar (ör. dekont adresi) da sırasıyla saklanır.
+    """
+    lines = data.split('\n')
+    searchable = set(_searchable_field_indexes(fields))
+    return {
+        "value_indexes": list(range(len(lines))),
+        "values": lines,
+        "blind_indexes": [
+            blind_index(fields[i], line) if i in searchable and line.strip() else None
+            for i, line in enumerate(lines)
+        ]
+    }
+
+
+def _async_database_url(database_url: str) -> str:
+    """PostgreSQL URL'sini asyncpg sürücüsünü kullanacak şekilde çevir"""
+    if database_url.startswith('postgres://'):
+        database_url = 'postgresql://' + database_url[len('postgres://'):]
+    return make_url(database_url).set(drivername='postgresql+asyncpg').render_as_string(hide_password=False)
+
+
+# İsim-soyisim alanını tespit etmek için anahtar kelimeler
+NAME_FIELD_KEYWORDS = ['isim soyisim', 'ad soyad', 'adı soyadı', 'ad ve soyad']
+
+
+def _detect_name_field(fields: list):
+    """İsim-soyisim alanının sırasını bul, yoksa ilk alanı kullan"""
+    for i, field in enumerate(fields):
+        if any(keyword in field.lower() for keyword in NAME_FIELD_KEYWORDS):
+            return i
+    return 0 if fields else None
+
+
+# Sonuçlanmamış (sorgulanmaya devam edilen) ve bakiyenin yükleneceği ödeme durumları
+PENDING_PAYMENT_STATUSES = ('waiting', 'confirming', 'sending', 'partially_paid')
+PAID_PAYMENT_STATUSES = ('confirmed', 'finished')
+# Süresi içinde ödenmeyen 'waiting' ödemelerin yerel durumu; geç ödeme için seyrek sorgulanmaya devam eder
+TIMED_OUT_PAYMENT_STATUS = 'timed_out'
+POLLED_PAYMENT_STATUSES = PENDING_PAYMENT_STATUSES + (TIMED_OUT_PAYMENT_STATUS,)
+POLLED_STATUSES_SQL = "(" + ", ".join(f"'{status}'" for status in POLLED_PAYMENT_STATUSES) + ")"
+
+
+def _as_bigint(value):
+    """Telegram ID'sini BIGINT parametresine çevir (asyncpg str kabul etmez)"""
+    return int(value) if value is not None else None
+
+
+def _submission_result(status: str, submission_id: int = None, balance=None) -> dict:
+    """submit_form sonucunu oluştur ve gönderim sayacını artır"""
+    FORM_SUBMISSIONS.inc(status=status)
+    return {'status': status, 'submission_id': submission_id, 'balance': balance}
+
+
+class _ThreadedConnection:
+    """Senkron bağlantıyı event loop'u bloklamadan kullanmak için sarmalayıcı.
+
+    asyncpg kurulu değilse veya DB_ASYNC_MODE kapalıysa kullanılır; sorgular
+    varsayılan thread havuzunda çalıştırılır ve AsyncConnection ile aynı
+    (await edilen) arayüzü sunar.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    async def execute(self, statement, parameters=None):
+        return await asyncio.to_thread(self._conn.execute, statement, parameters)
+
+    async def commit(self):
+        await asyncio.to_thread(self._conn.commit)
+
+    async def rollback(self):
+        await asyncio.to_thread(self._conn.rollback)
+
 
 class DatabaseManager:
     def __init__(self):
@@ -17,23 +158,165 @@ class DatabaseManager:
         if not self.database_url:
             raise ValueError("DATABASE_URL environment variable is not set")
         
+        # Bağlantı bekleme süresi istatistikleri
+        self._pool_wait_count = 0
+        self._pool_wait_total = 0.0
+        self._pool_wait_max = 0.0
+        
+        # Admin ve yetkili grup kontrolleri için önbellek (her mesajda DB'ye gitmemek için)
+        self.auth_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+        
+        # Ayrıştırılmış form tanımları, (form_name, group_id) anahtarıyla
+        self.form_cache = TTLCache(maxsize=FORM_CACHE_SIZE, ttl=FORM_CACHE_TTL)
+        
+        # Diğer süreçlerin değişikliklerini yakalamak için son görülen önbellek sürümleri
+        self._cache_versions = {}
+        self._cache_synced_at = float('-inf')
+        
+        # Raporlar CPU yoğun olduğundan ayrı süreçlerde oluşturulur
+        self.report_pool = ReportPool() if REPORT_WORKERS > 0 else None
+        
+        # Havuzların yapılandırılmış boyutları (istatistikler bunlardan raporlanır)
+        self.sync_pool_size = DB_SYNC_POOL_SIZE if DB_ASYNC_MODE else DB_POOL_SIZE
+        self.sync_max_overflow = DB_SYNC_POOL_SIZE if DB_ASYNC_MODE else DB_MAX_OVERFLOW
+        self.async_pool_size = 0
+        self.async_max_overflow = 0
+        
         try:
-            # SQLAlchemy engine oluştur
+            # SQLAlchemy engine oluştur (kurulum ve senkron metotlar için)
             self.engine = create_engine(
                 self.database_url,
                 pool_pre_ping=True,
-                pool_size=5,
-                max_overflow=10,
-                pool_timeout=30
+                pool_size=self.sync_pool_size,
+                max_overflow=self.sync_max_overflow,
+                pool_timeout=DB_POOL_TIMEOUT
             )
             self.Session = sessionmaker(bind=self.engine)
-            logger.info("Veritabanı bağlantısı başarıyla kuruldu")
+            
+            # Asenkron engine oluştur (async metotlar event loop'u bloklamasın)
+            self.async_engine = None
+            if DB_ASYNC_MODE:
+                try:
+                    from sqlalchemy.ext.asyncio import create_async_engine
+                    import asyncpg  # noqa: F401
+                    
+                    self.async_engine = create_async_engine(
+                        _async_database_url(self.database_url),
+                        pool_pre_ping=True,
+                        pool_size=DB_POOL_SIZE,
+                        max_overflow=DB_MAX_OVERFLOW,
+                        pool_timeout=DB_POOL_TIMEOUT
+                    )
+                    self.async_pool_size = DB_POOL_SIZE
+                    self.async_max_overflow = DB_MAX_OVERFLOW
+                    logger.info("Asenkron veritabanı motoru (asyncpg) etkin")
+                except ImportError:
+                    logger.warning("asyncpg bulunamadı, sorgular thread havuzunda çalıştırılacak")
+            
+            # Her SQL ifadesinin süresi ölçülür, yavaş sorgular loglanır (plan senkron engine ile alınır)
+            self.query_monitor = QueryMonitor(explain_engine=self.engine)
+            self.query_monitor.attach(self.engine)
+            if self.async_engine is not None:
+                self.query_monitor.attach(self.async_engine.sync_engine)
+            
+            logger.info(
+                f"Veritabanı bağlantısı başarıyla kuruldu "
+                f"(en fazla {self.max_connections()} bağlantı)"
+            )
             
         except Exception as e:
             logger.error(f"Veritabanı bağlantı hatası: {str(e)}")
             logger.error("Traceback:", exc_info=True)
             raise
     
+    @asynccontextmanager
+    async def connection(self):
+        """Event loop'u bloklamayan veritabanı bağlantısı"""
+        started = time.perf_counter()
+        if self.async_engine is not None:
+            async with self.async_engine.connect() as conn:
+                self._record_pool_wait(time.perf_counter() - started)
+                yield conn
+        else:
+            conn = await asyncio.to_thread(self.engine.connect)
+            self._record_pool_wait(time.perf_counter() - started)
+            try:
+                yield _ThreadedConnection(conn)
+            finally:
+                await asyncio.to_thread(conn.close)
+    
+    def _record_pool_wait(self, waited: float):
+        """Havuzdan bağlantı alma süresini kaydet"""
+        self._pool_wait_count += 1
+        self._pool_wait_total += waited
+        self._pool_wait_max = max(self._pool_wait_max, waited)
+        DB_POOL_WAIT.observe(waited)
+    
+    def max_connections(self) -> int:
+        """Bu sürecin açabileceği en fazla PostgreSQL bağlantı sayısı"""
+        return (self.sync_pool_size + self.sync_max_overflow
+                + self.async_pool_size + self.async_max_overflow)
+    
+    async def _bump_cache_version(self, conn, *names: str):
+        """Önbellek sürümlerini artır (değişikliği yapan işlemin içinde çağrılır)"""
+        for name in names:
+            await conn.execute(text("""
+                INSERT INTO cache_versions (name, version) VALUES (:name, 1)
+                ON CONFLICT (name) DO UPDATE SET version = cache_versions.version + 1
+            """), {"name": name})
+    
+    async def _sync_caches(self):
+        """Başka bir süreç yetki/form verisini değiştirdiyse ilgili önbelleği boşalt
+
+        Sürüm tablosu en fazla CACHE_SYNC_INTERVAL saniyede bir okunur.
+        """
+        now = time.monotonic()
+        if now - self._cache_synced_at < CACHE_SYNC_INTERVAL:
+            return
+        self._cache_synced_at = now
+        try:
+            async with self.connection() as conn:
+                rows = (await conn.execute(text("SELECT name, version FROM cache_versions"))).fetchall()
+        except SQLAlchemyError as e:
+            logger.error(f"Önbellek sürümü okuma hatası: {str(e)}")
+            return
+        
+        caches = {'auth': self.auth_cache, 'forms': self.form_cache}
+        for name, version in rows:
+            if name in caches and self._cache_versions.get(name, 0) != version:
+                caches[name].clear()
+                self._cache_versions[name] = version
+    
+    def get_cache_stats(self) -> dict:
+        """Yetki önbelleği istatistiklerini getir"""
+        return self.auth_cache.stats()
+    
+    def get_pool_stats(self) -> dict:
+        """Bağlantı havuzu istatistiklerini getir"""
+        pool = self.async_engine.pool if self.async_engine is not None else self.engine.pool
+        wait_count = self._pool_wait_count
+        return {
+            'pool_size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': self.async_max_overflow if self.async_engine is not None else self.sync_max_overflow,
+            'sync_checked_out': self.engine.pool.checkedout() if self.async_engine is not None else 0,
+            'max_connections': self.max_connections(),
+            'acquisitions': wait_count,
+            'avg_wait_ms': (self._pool_wait_total / wait_count * 1000) if wait_count else 0.0,
+            'max_wait_ms': self._pool_wait_max * 1000
+        }
+    
+    async def close(self):
+        """Bağlantı havuzlarını ve rapor süreç havuzunu kapat"""
+        if self.report_pool is not None:
+            self.report_pool.shutdown()
+        self.query_monitor.shutdown()
+        if self.async_engine is not None:
+            await self.async_engine.dispose()
+        await asyncio.to_thread(self.engine.dispose)
+    
     def setup_database(self):
         """Veritabanını kur"""
         try:
@@ -144,6 +427,9 @@ class DatabaseManager:
                     )
                 """))
                 
+                # Mevcut tablolar için şema güncellemeleri
+                self._apply_migrations(conn)
+                
                 conn.commit()
                 logger.info("Veritabanı kurulumu tamamlandı.")
                 print("Veritabanı kurulumu tamamlandı.")
@@ -155,6 +441,159 @@ class DatabaseManager:
             traceback.print_exc()
             return False
 
+    def _apply_migrations(self, conn):
+        """Mevcut kurulumlara eklenen sütun ve indeksleri oluştur (tekrar çalıştırılabilir)"""
+        # Mükerrer kayıt kontrolü için içerik özeti (şifreli veriyi çözmeden arama)
+        print("Form gönderileri özet sütununu oluşturuyor...")
+        conn.execute(text("""
+            ALTER TABLE form_submissions ADD COLUMN IF NOT EXISTS data_hash TEXT
+        """))
+        conn.execute(text("""
+            CREATE UNIQUE INDEX IF NOT EXISTS ux_form_submissions_data_hash
+            ON form_submissions (form_name, group_id, data_hash)
+        """))
+        
+        # Rapor ve gönderi sorguları için bileşik indeksler
+        print("Form gönderileri indekslerini oluşturuyor...")
+        conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_form_submissions_form_group_created
+            ON form_submissions (form_name, group_id, created_at)
+        """))
+        conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_form_submissions_group_created
+            ON form_submissions (group_id, created_at)
+        """))
+        
+        # Bakiye yükleme ödemeleri (tek zamanlayıcı bekleyen ödemeleri buradan sorgular)
+        print("Ödemeler tablosunu oluşturuyor...")
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS payments (
+                payment_id TEXT PRIMARY KEY,
+                admin_id BIGINT NOT NULL,
+                price_amount FLOAT,
+                price_currency TEXT,
+                pay_amount FLOAT,
+                pay_currency TEXT,
+                pay_address TEXT,
+                status TEXT,
+                check_count INTEGER DEFAULT 0,
+                next_check_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                credited_at TIMESTAMP,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+        conn.execute(text("DROP INDEX IF EXISTS ix_payments_pending_next_check"))
+        conn.execute(text(f"""
+            CREATE INDEX IF NOT EXISTS ix_payments_polled_next_check
+            ON payments (next_check_at)
+            WHERE status IN {POLLED_STATUSES_SQL}
+        """))
+        
+        # İçerik adresli dekont deposu: her dosya SHA-256 özetiyle bir kez saklanır,
+        # Telegram file_unique_id değerleri aynı kayda bağlanır
+        print("Dekont deposu tablolarını oluşturuyor...")
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS receipts (
+                sha256 TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                backend TEXT NOT NULL,
+                size_bytes BIGINT,
+                mime_type TEXT,
+                submission_id INTEGER REFERENCES form_submissions(id) ON DELETE SET NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS receipt_files (
+                file_unique_id TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL REFERENCES receipts(sha256) ON DELETE CASCADE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+        
+        # Arka planda yüklenecek dekontlar (gönderi önce geçici referansla kaydedilir)
+        print("Dekont yükleme kuyruğu tablosunu oluşturuyor...")
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS receipt_uploads (
+                id SERIAL PRIMARY KEY,
+                submission_id INTEGER NOT NULL REFERENCES form_submissions(id) ON DELETE CASCADE,
+                file_id TEXT NOT NULL,
+                file_unique_id TEXT NOT NULL,
+                mime_type TEXT,
+                placeholder TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER DEFAULT 0,
+                last_error TEXT,
+                next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+        conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_receipt_uploads_pending
+            ON receipt_uploads (next_attempt_at)
+            WHERE status = 'pending'
+        """))
+        conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_receipt_uploads_file_unique_id
+            ON receipt_uploads (file_unique_id)
+        """))
+        
+        # Alan bazlı şifreli değerler; aranabilir alanlar için kör indeks
+        print("Gönderi değerleri tablosunu oluşturuyor...")
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS submission_values (
+                submission_id INTEGER NOT NULL REFERENCES form_submissions(id) ON DELETE CASCADE,
+                field_index SMALLINT NOT NULL,
+                value BYTEA,
+                blind_index TEXT,
+                PRIMARY KEY (submission_id, field_index)
+            )
+        """))
+        conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_submission_values_blind_index
+            ON submission_values (blind_index)
+            WHERE blind_index IS NOT NULL
+        """))
+        
+        # Süreçler arası önbellek geçersizleştirme: yazan süreç sürümü artırır
+        print("Önbellek sürüm tablosunu oluşturuyor...")
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS cache_versions (
+                name TEXT PRIMARY KEY,
+                version BIGINT NOT NULL DEFAULT 0
+            )
+        """))
+        
+        # Bot persistence (PostgresPersistence): anahtar bazında kullanıcı/sohbet verisi ve konuşmalar
+        print("Persistence tablolarını oluşturuyor...")
+        for scope, column in (('user', 'user_id'), ('chat', 'chat_id')):
+            conn.execute(text(f"""
+                CREATE TABLE IF NOT EXISTS persistence_{scope}_data (
+                    {column} BIGINT PRIMARY KEY,
+                    data BYTEA NOT NULL,
+                    version BIGINT NOT NULL DEFAULT 1,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """))
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS persistence_singletons (
+                name TEXT PRIMARY KEY,
+                data BYTEA NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS persistence_conversations (
+                name TEXT NOT NULL,
+                key TEXT NOT NULL,
+                state BYTEA NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (name, key)
+            )
+        """))
+
     def get_groups(self, user_id=None):
         """Grupları getir"""
         try:
@@ -190,8 +629,8 @@ class DatabaseManager:
                 FROM groups
                 WHERE group_id = :group_id
             """
-            with self.engine.connect() as conn:
-                result = conn.execute(text(query), {"group_id": group_id})
+            async with self.connection() as conn:
+                result = await conn.execute(text(query), {"group_id": group_id})
                 group = result.fetchone()
                 if group:
                     return {
@@ -206,30 +645,32 @@ class DatabaseManager:
     async def add_admin(self, user_id: str, admin_name: str = None, added_by: str = None) -> bool:
         """Admin ekle"""
         try:
-            with self.engine.connect() as conn:
-                result = conn.execute(text("""
+            async with self.connection() as conn:
+                result = await conn.execute(text("""
                     INSERT INTO group_admins (user_id, added_by, admin_name)
                     VALUES (:user_id, :added_by, :admin_name)
                     ON CONFLICT (user_id) DO UPDATE
                     SET admin_name = EXCLUDED.admin_name
                 """), {
-                    "user_id": user_id,
-                    "added_by": added_by,
+                    "user_id": _as_bigint(user_id),
+                    "added_by": _as_bigint(added_by),
                     "admin_name": admin_name
                 })
                 
-                conn.commit()
+                await self._bump_cache_version(conn, 'auth')
+                await conn.commit()
+                self.auth_cache.invalidate(('admin', _as_bigint(user_id)))
                 return True
-        except SQLAlchemyError as e:
+        except (SQLAlchemyError, ValueError) as e:
             logger.error(f"Admin ekleme DB hatası: {str(e)}")
             return False
 
     async def remove_admin(self, user_id: int) -> bool:
         """Admin sil"""
         try:
-            with self.engine.connect() as conn:
+            async with self.connection() as conn:
                 # Önce admin_groups tablosundan ilişkileri sil
-                conn.execute(
+                await conn.execute(
                     text("""
                     DELETE FROM admin_groups
                     WHERE admin_id = :user_id
@@ -238,7 +679,7 @@ class DatabaseManager:
                 )
                 
                 # Sonra admini sil
-                conn.execute(
+                await conn.execute(
                     text("""
                     DELETE FROM group_admins
                     WHERE user_id = :user_id
@@ -246,7 +687,9 @@ class DatabaseManager:
                     {"user_id": user_id}
                 )
                 
-                conn.commit()
+                await self._bump_cache_version(conn, 'auth')
+                await conn.commit()
+                self.auth_cache.invalidate(('admin', _as_bigint(user_id)))
                 return True
         except Exception as e:
             logger.error(f"Admin silme DB hatası: {str(e)}")
@@ -254,10 +697,10 @@ class DatabaseManager:
 
     async def get_all_admins(self) -> list:
         try:
-            with self.engine.connect() as conn:
+            async with self.connection() as conn:
                 # Telegram API'den admin isimlerini alamayız, bu yüzden veritabanında saklamamız gerekiyor
                 # Şimdilik sadece ID'leri döndürüyoruz
-                result = conn.execute(text("""
+                result = await conn.execute(text("""
                     SELECT ga.user_id, ac.credits, ga.admin_name
                     FROM group_admins ga
                     LEFT JOIN admin_credits ac ON ac.admin_id = ga.user_id
@@ -277,108 +720,274 @@ class DatabaseManager:
             logger.error(f"Admin listeleme DB hatası: {str(e)}")
             return []
 
-    async def Bakiye_ekle(self, admin_id: str, miktar: float) -> bool:
-        """Admine Bakiye ekle"""
+    async def bakiye_yukle(self, admin_id: str, miktar: float) -> float:
+        """Admine Bakiye ekle ve yeni bakiyeyi döndür
+
+        Ekleme tek bir INSERT ... ON CONFLICT ile veritabanında yapılır; aynı
+        admine eş zamanlı yüklemeler birbirinin üzerine yazmaz. Admin yoksa
+        None döner.
+        """
         try:
-            with self.engine.connect() as conn:
-                # Önce admin_id'nin var olup olmadığını kontrol et
-                admin_check = conn.execute(text("""
-                    SELECT COUNT(*) FROM group_admins 
-                    WHERE user_id = :admin_id
-                """), {"admin_id": admin_id}).scalar()
-                
-                if admin_check == 0:
-                    logger.error(f"Admin bulunamadı: {admin_id}")
-                    return False
-                
-                # Mevcut bakiyeyi al
-                cursor = conn.execute(text("""
-                    SELECT credits 
-                    FROM admin_credits 
-                    WHERE admin_id = :admin_id
-                """), {"admin_id": admin_id})
-                
-                result = cursor.fetchone()
-                current_balance = result[0] if result else 0
-                
-                # Yeni bakiyeyi hesapla ve güncelle
-                new_balance = current_balance + miktar
-                conn.execute(text("""
+            async with self.connection() as conn:
+                result = await conn.execute(text("""
                     INSERT INTO admin_credits (admin_id, credits, updated_at)
-                    VALUES (:admin_id, :new_balance, CURRENT_TIMESTAMP)
-                    ON CONFLICT (admin_id) DO UPDATE 
-                    SET credits = :new_balance, updated_at = CURRENT_TIMESTAMP
-                """), {"admin_id": admin_id, "new_balance": new_balance})
-                
-                conn.commit()
-                return True
-        except SQLAlchemyError as e:
+                    SELECT :admin_id, :miktar, CURRENT_TIMESTAMP
+                    WHERE EXISTS (
+                        SELECT 1 FROM group_admins WHERE user_id = :admin_id
+                    )
+                    ON CONFLICT (admin_id) DO UPDATE
+                    SET credits = admin_credits.credits + EXCLUDED.credits,
+                        updated_at = CURRENT_TIMESTAMP
+                    RETURNING credits
+                """), {"admin_id": _as_bigint(admin_id), "miktar": miktar})
+                new_balance = result.scalar()
+                await conn.commit()
+                
+                if new_balance is None:
+                    logger.error(f"Admin bulunamadı: {admin_id}")
+                return new_balance
+        except (SQLAlchemyError, ValueError) as e:
             logger.error(f"Bakiye ekleme DB hatası: {str(e)}")
+            return None
+
+    async def bakiye_dus(self, admin_id: str, miktar: float) -> Optional[float]:
+        """Adminden Bakiye düş ve yeni bakiyeyi döndür
+
+        Koşullu tek UPDATE satırı kilitler; bakiye yetersizse hiçbir satır
+        güncellenmez ve None döner. Veritabanı hatası yetersiz bakiyeyle
+        karışmasın diye loglanıp yeniden fırlatılır.
+        """
+        try:
+            async with self.connection() as conn:
+                result = await conn.execute(text("""
+                    UPDATE admin_credits
+                    SET credits = credits - :miktar, updated_at = CURRENT_TIMESTAMP
+                    WHERE admin_id = :admin_id AND credits >= :miktar
+                    RETURNING credits
+                """), {"admin_id": _as_bigint(admin_id), "miktar": miktar})
+                new_balance = result.scalar()
+                await conn.commit()
+                return new_balance
+        except (SQLAlchemyError, ValueError) as e:
+            logger.error(f"Bakiye silme DB hatası: {str(e)}")
+            raise
+
+    async def record_payment(self, payment_id, admin_id, price_amount=None, price_currency=None,
+                             pay_amount=None, pay_currency=None, pay_address=None,
+                             status: str = 'waiting') -> bool:
+        """Ödemeyi kaydet (zaten varsa dokunma)"""
+        try:
+            async with self.connection() as conn:
+                await conn.execute(text("""
+                    INSERT INTO payments (payment_id, admin_id, price_amount, price_currency,
+                                          pay_amount, pay_currency, pay_address, status)
+                    VALUES (:payment_id, :admin_id, :price_amount, :price_currency,
+                            :pay_amount, :pay_currency, :pay_address, :status)
+                    ON CONFLICT (payment_id) DO NOTHING
+                """), {
+                    "payment_id": str(payment_id),
+                    "admin_id": _as_bigint(admin_id),
+                    "price_amount": float(price_amount) if price_amount is not None else None,
+                    "price_currency": price_currency,
+                    "pay_amount": float(pay_amount) if pay_amount is not None else None,
+                    "pay_currency": pay_currency,
+                    "pay_address": pay_address,
+                    "status": status
+                })
+                await conn.commit()
+                return True
+        except (SQLAlchemyError, ValueError) as e:
+            logger.error(f"Ödeme kaydetme DB hatası: {str(e)}")
             return False
 
-    async def Bakiye_sil(self, admin_id: str, miktar: float) -> bool:
-        """Adminden Bakiye sil"""
+    async def get_payment(self, payment_id) -> dict:
+        """Kayıtlı ödemeyi getir"""
         try:
-            with self.engine.connect() as conn:
-                # Mevcut bakiyeyi al
-                cursor = conn.execute(text("""
-                    SELECT credits 
-                    FROM admin_credits 
-                    WHERE admin_id = :admin_id
-                """), {"admin_id": admin_id})
-                
-                result = cursor.fetchone()
-                if not result:
-                    return False
-                
-                current_balance = result[0]
-                if current_balance < miktar:
-                    return False
-                
-                # Yeni bakiyeyi hesapla ve güncelle
-                new_balance = current_balance - miktar
-                conn.execute(text("""
-                    UPDATE admin_credits 
-                    SET credits = :new_balance, updated_at = CURRENT_TIMESTAMP
-                    WHERE admin_id = :admin_id
-                """), {"admin_id": admin_id, "new_balance": new_balance})
-                
-                conn.commit()
+            async with self.connection() as conn:
+                row = (await conn.execute(text("""
+                    SELECT payment_id, admin_id, price_amount, price_currency, status, credited_at, created_at
+                    FROM payments
+                    WHERE payment_id = :payment_id
+                """), {"payment_id": str(payment_id)})).fetchone()
+                return dict(row._mapping) if row else None
+        except SQLAlchemyError as e:
+            logger.error(f"Ödeme getirme DB hatası: {str(e)}")
+            return None
+
+    async def get_due_payments(self, limit: int) -> list:
+        """Sorgulama zamanı gelmiş bekleyen ödemeleri getir"""
+        try:
+            async with self.connection() as conn:
+                result = await conn.execute(text(f"""
+                    SELECT payment_id, admin_id, status, check_count,
+                           EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - created_at) AS age_seconds
+                    FROM payments
+                    WHERE status IN {POLLED_STATUSES_SQL}
+                    AND next_check_at <= CURRENT_TIMESTAMP
+                    ORDER BY next_check_at
+                    LIMIT :limit
+                """), {"limit": limit})
+                return [dict(row._mapping) for row in result.fetchall()]
+        except SQLAlchemyError as e:
+            logger.error(f"Bekleyen ödemeleri getirme DB hatası: {str(e)}")
+            return []
+
+    async def schedule_payment_check(self, payment_id, delay_seconds: float) -> bool:
+        """Ödemenin bir sonraki sorgulama zamanını ayarla"""
+        try:
+            async with self.connection() as conn:
+                await conn.execute(text("""
+                    UPDATE payments
+                    SET next_check_at = CURRENT_TIMESTAMP + make_interval(secs => :delay),
+                        check_count = check_count + 1
+                    WHERE payment_id = :payment_id
+                """), {"payment_id": str(payment_id), "delay": float(delay_seconds)})
+                await conn.commit()
                 return True
         except SQLAlchemyError as e:
-            logger.error(f"Bakiye silme DB hatası: {str(e)}")
+            logger.error(f"Ödeme sorgu zamanı ayarlama DB hatası: {str(e)}")
             return False
 
+    async def expire_payments(self, expiry_minutes: int, hard_cap_hours: float, timed_out_delay: float) -> list:
+        """Süresi dolan ödemelerin durumunu güncelle ve değişenleri döndür
+
+        Yalnızca 'waiting' durumundaki (henüz ödeme gelmemiş) ödemeler
+        expiry_minutes sonra 'timed_out' olur ve timed_out_delay saniyede bir
+        sorgulanmaya devam eder; geç gelen ödeme yine bakiyeye yüklenir.
+        Zincirde ilerleyen ödemeler (confirming, sending, partially_paid)
+        NowPayments son durumu bildirene kadar sorgulanır; yalnızca
+        hard_cap_hours sonra 'expired' yapılıp sorgulama bırakılır.
+        Dönen kayıtlarda önceki durum previous_status, yenisi status alanındadır.
+        """
+        try:
+            async with self.connection() as conn:
+                timed_out = (await conn.execute(text(f"""
+                    UPDATE payments p
+                    SET status = '{TIMED_OUT_PAYMENT_STATUS}',
+                        next_check_at = CURRENT_TIMESTAMP + make_interval(secs => :delay),
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE p.status = 'waiting'
+                    AND p.created_at < CURRENT_TIMESTAMP - make_interval(mins => :minutes)
+                    RETURNING p.payment_id, p.admin_id, 'waiting' AS previous_status, p.status
+                """), {"minutes": int(expiry_minutes), "delay": float(timed_out_delay)})).fetchall()
+                expired = (await conn.execute(text(f"""
+                    UPDATE payments p
+                    SET status = 'expired', updated_at = CURRENT_TIMESTAMP
+                    FROM (
+                        SELECT payment_id, status AS previous_status FROM payments
+                        WHERE status IN {POLLED_STATUSES_SQL}
+                        AND created_at < CURRENT_TIMESTAMP - make_interval(secs => :hard_cap)
+                        FOR UPDATE
+                    ) old
+                    WHERE p.payment_id = old.payment_id
+                    RETURNING p.payment_id, p.admin_id, old.previous_status, p.status
+                """), {"hard_cap": float(hard_cap_hours) * 3600})).fetchall()
+                await conn.commit()
+                return [dict(row._mapping) for row in timed_out + expired]
+        except SQLAlchemyError as e:
+            logger.error(f"Ödeme süresi doldurma DB hatası: {str(e)}")
+            return []
+
+    async def apply_payment_status(self, payment_id, status: str, tl_per_credit: float = 10.0) -> dict:
+        """Ödeme durum değişikliğini tek işlemde uygula, ödendiyse bakiyeyi bir kez yükle
+
+        Durum aynıysa hiçbir şey yapılmaz (changed=False); böylece IPN ve
+        zamanlayıcı aynı değişikliği iki kez işlemez. Yerelde süresi dolmuş
+        ('timed_out' / 'expired') ödemeler de sonradan gelen ödendi durumuyla
+        güncellenip yüklenir; 'timed_out' kayıt 'waiting' durumuna geri dönmez. Bakiye, credited_at
+        boşken aynı işlemde işaretlenip yüklenir. Ödeyen kullanıcı admin değilse
+        aynı işlemde admin yapılır (promoted=True); yükleme yapılmazsa admin de
+        eklenmez.
+        """
+        outcome = {'found': False, 'changed': False, 'credited': False, 'promoted': False, 'error': False,
+                   'admin_id': None, 'price_amount': None, 'usage_rights': None, 'balance': None}
+        try:
+            async with self.connection() as conn:
+                row = (await conn.execute(text("""
+                    UPDATE payments
+                    SET status = :status, updated_at = CURRENT_TIMESTAMP
+                    WHERE payment_id = :payment_id
+                    AND status IS DISTINCT FROM :status
+                    AND status IS DISTINCT FROM 'finished'
+                    AND NOT (status = :timed_out AND :status = 'waiting')
+                    RETURNING admin_id, price_amount, credited_at
+                """), {"payment_id": str(payment_id), "status": status, "timed_out": TIMED_OUT_PAYMENT_STATUS})).fetchone()
+                
+                if row is None:
+                    outcome['found'] = (await conn.execute(text("""
+                        SELECT 1 FROM payments WHERE payment_id = :payment_id
+                    """), {"payment_id": str(payment_id)})).scalar() is not None
+                    await conn.rollback()
+                    return outcome
+                
+                outcome.update(found=True, changed=True, admin_id=row[0], price_amount=row[1])
+                
+                if status in PAID_PAYMENT_STATUSES and row[2] is None:
+                    usage_rights = (row[1] or 0) / tl_per_credit
+                    # Ödeme yapan kullanıcı admin değilse admin yap (bakiye admin kaydına bağlıdır)
+                    promoted = (await conn.execute(text("""
+                        INSERT INTO group_admins (user_id, added_by)
+                        VALUES (:admin_id, :admin_id)
+                        ON CONFLICT (user_id) DO NOTHING
+                        RETURNING user_id
+                    """), {"admin_id": row[0]})).scalar() is not None
+                    if promoted:
+                        await self._bump_cache_version(conn, 'auth')
+                    
+                    balance = (await conn.execute(text("""
+                        INSERT INTO admin_credits (admin_id, credits, updated_at)
+                        VALUES (:admin_id, :miktar, CURRENT_TIMESTAMP)
+                        ON CONFLICT (admin_id) DO UPDATE
+                        SET credits = admin_credits.credits + EXCLUDED.credits,
+                            updated_at = CURRENT_TIMESTAMP
+                        RETURNING credits
+                    """), {"admin_id": row[0], "miktar": usage_rights})).scalar()
+                    
+                    await conn.execute(text("""
+                        UPDATE payments SET credited_at = CURRENT_TIMESTAMP
+                        WHERE payment_id = :payment_id
+                    """), {"payment_id": str(payment_id)})
+                    outcome.update(credited=True, promoted=promoted, usage_rights=usage_rights, balance=balance)
+                
+                await conn.commit()
+                if outcome['promoted']:
+                    self.auth_cache.invalidate(('admin', row[0]))
+                return outcome
+        except (SQLAlchemyError, ValueError) as e:
+            logger.error(f"Ödeme durumu güncelleme DB hatası: {str(e)}")
+            outcome.update(changed=False, error=True)
+            return outcome
+
     async def bakiye_getir(self, admin_id: str) -> float:
         """Admin bakiyesini getir"""
         try:
-            with self.engine.connect() as conn:
-                cursor = conn.execute(text("""
+            async with self.connection() as conn:
+                cursor = await conn.execute(text("""
                     SELECT credits 
                     FROM admin_credits 
                     WHERE admin_id = :admin_id
-                """), {"admin_id": admin_id})
+                """), {"admin_id": _as_bigint(admin_id)})
                 
                 result = cursor.fetchone()
                 return result[0] if result else 0
-        except SQLAlchemyError as e:
+        except (SQLAlchemyError, ValueError) as e:
             logger.error(f"Bakiye getirme DB hatası: {str(e)}")
             return 0
 
     async def get_forms(self, user_id: int = None) -> list:
         try:
-            with self.engine.connect() as conn:
+            async with self.connection() as conn:
                 # Eğer user_id verilmişse, sadece o adminin formlarını getir
                 if user_id:
-                    cursor = conn.execute(text("""
+                    cursor = await conn.execute(text("""
                         SELECT form_name, fields 
                         FROM forms 
                         WHERE created_by = :user_id
                         ORDER BY form_name
-                    """), {"user_id": user_id})
+                    """), {"user_id": _as_bigint(user_id)})
                 # Super admin için tüm formları getir
                 elif user_id == SUPER_ADMIN_ID:
-                    cursor = conn.execute(text("""
+                    cursor = await conn.execute(text("""
                         SELECT form_name, fields 
                         FROM forms
                         ORDER BY form_name
@@ -394,36 +1003,49 @@ class DatabaseManager:
             return []
 
     async def is_admin(self, user_id: int) -> bool:
-        """Kullanıcının admin olup olmadığını kontrol et"""
+        """Kullanıcının admin olup olmadığını kontrol et (önbellekli)"""
         try:
-            with self.engine.connect() as conn:
-                cursor = conn.execute(text("""
+            await self._sync_caches()
+            cache_key = ('admin', _as_bigint(user_id))
+            cached = self.auth_cache.get(cache_key)
+            if cached is not MISSING:
+                return cached
+            
+            async with self.connection() as conn:
+                cursor = await conn.execute(text("""
                     SELECT COUNT(*) FROM group_admins 
                     WHERE user_id = :user_id
-                """), {"user_id": user_id})
+                """), {"user_id": cache_key[1]})
                 count = cursor.scalar()
-                return count > 0
-        except SQLAlchemyError as e:
+            
+            self.auth_cache.set(cache_key, count > 0, ttl=None if count > 0 else AUTH_CACHE_NEGATIVE_TTL)
+            return count > 0
+        except (SQLAlchemyError, ValueError) as e:
             logger.error(f"Admin kontrolü DB hatası: {str(e)}")
             return False
 
-    async def is_group_admin(self, user_id: int) -> bool:
+    async def get_admin_name(self, user_id: int) -> str:
+        """Adminin kayıtlı adını getir (admin değilse None)"""
         try:
-            with self.engine.connect() as conn:
-                cursor = conn.execute(text("""
-                    SELECT COUNT(*) FROM group_admins 
+            async with self.connection() as conn:
+                cursor = await conn.execute(text("""
+                    SELECT admin_name FROM group_admins 
                     WHERE user_id = :user_id
-                """), {"user_id": user_id})
-                count = cursor.fetchone()[0]
-                return count > 0
-        except SQLAlchemyError as e:
-            logger.error(f"Grup admin kontrolü DB hatası: {str(e)}")
-            return False
+                """), {"user_id": _as_bigint(user_id)})
+                row = cursor.fetchone()
+                return row[0] if row and row[0] else None
+        except (SQLAlchemyError, ValueError) as e:
+            logger.error(f"Admin adı getirme DB hatası: {str(e)}")
+            return None
+
+    async def is_group_admin(self, user_id: int) -> bool:
+        """Kullanıcı grup admini mi (is_admin ile aynı önbelleği kullanır)"""
+        return await self.is_admin(user_id)
 
     async def get_admin_groups(self, user_id: int) -> list:
         try:
-            with self.engine.connect() as conn:
-                cursor = conn.execute(text("""
+            async with self.connection() as conn:
+                cursor = await conn.execute(text("""
                     SELECT g.group_id, g.group_name 
                     FROM group_admins ga 
                     JOIN groups g ON ga.group_id = g.group_id 
@@ -435,6 +1057,54 @@ class DatabaseManager:
             logger.error(f"Admin grupları getirme DB hatası: {str(e)}")
             return []
 
+    async def get_form_definition(self, form_name: str, group_id: int = None) -> dict:
+        """Ayrıştırılmış form tanımını getir (önbellekli)
+
+        Aynı isimde birden fazla form varsa verilen gruba ait olan tercih edilir.
+        Dönen sözlük alan listesini, dekont bayrağını, form sahibini ve
+        isim-soyisim alanının sırasını içerir.
+        """
+        await self._sync_caches()
+        cache_key = (form_name, group_id)
+        cached = self.form_cache.get(cache_key)
+        if cached is not MISSING:
+            return cached
+        
+        try:
+            async with self.connection() as conn:
+                result = await conn.execute(text("""
+                    SELECT form_name, group_id, fields, created_by
+                    FROM forms
+                    WHERE form_name = :form_name
+                    ORDER BY (group_id = :group_id) DESC NULLS LAST, created_at
+                    LIMIT 1
+                """), {"form_name": form_name, "group_id": group_id})
+                row = result.fetchone()
+        except SQLAlchemyError as e:
+            logger.error(f"Form tanımı getirme DB hatası: {str(e)}")
+            return None
+        
+        definition = None
+        if row:
+            fields = row[2].split(',') if row[2] else []
+            definition = {
+                'form_name': row[0],
+                'group_id': row[1],
+                'fields': fields,
+                'created_by': row[3],
+                # Son alanda "dekont" varsa görsel istenir
+                'has_dekont': bool(fields) and "dekont" in fields[-1].lower(),
+                'name_field_index': _detect_name_field(fields),
+                'searchable_field_indexes': _searchable_field_indexes(fields)
+            }
+        
+        self.form_cache.set(cache_key, definition)
+        return definition
+
+    def _invalidate_form(self, form_name: str):
+        """Formun önbellekteki tüm tanımlarını sil"""
+        self.form_cache.invalidate_where(lambda key: key[0] == form_name)
+
     async def get_form(self, form_name, admin_id=None):
         """Form bilgilerini getir"""
         try:
@@ -455,8 +1125,8 @@ class DatabaseManager:
                 params = {"form_name": form_name}
             
             # Sorguyu çalıştır
-            with self.engine.connect() as conn:
-                result = conn.execute(query, params)
+            async with self.connection() as conn:
+                result = await conn.execute(query, params)
                 row = result.fetchone()
                 
             if row:
@@ -472,255 +1142,371 @@ class DatabaseManager:
             logger.error(f"Form bilgisi getirme hatası: {str(e)}")
             return None
 
-    async def check_duplicate_submission(self, form_name: str, group_id: int, data: str) -> bool:
-        """Form verisinin daha önce kaydedilip kaydedilmediğini kontrol et"""
+    async def submit_form(self, form_name: str, group_id: int, user_id: int, chat_id: int,
+                          data: str, cost: float = 1.0, receipt_sha256: str = None,
+                          receipt_upload: dict = None) -> dict:
+        """Form gönderimini tek işlemde yap: form kontrolü, mükerrer kontrolü, bakiye düşme ve kayıt
+
+        Form, mükerrer, bakiye ve kayıt adımları tek bir CTE sorgusunda çalışır;
+        bakiye ancak kayıt eklendiğinde düşer. Dekont bağlama ve yükleme kuyruğu
+        (_attach_receipt) aynı işlemde, kayıt eklendikten sonra yapılır.
+        Dönen sözlükteki status değeri 'ok', 'form_not_found', 'duplicate',
+        'insufficient_credits' veya 'error' olur.
+        """
+        encryption_key = get_encryption_key()
+        if not encryption_key:
+            logger.error("POSTGRES_ENCRYPTION_KEY bulunamadı!")
+            return _submission_result('error')
+        
+        # Alan bazlı değerler ve kör indeksler (form tanımı önbellekten)
+        form_definition = await self.get_form_definition(form_name, group_id)
+        values = split_submission_values(data, form_definition['fields'] if form_definition else [])
+        
         try:
-            # .env dosyasından şifreleme anahtarını al
-            encryption_key = os.environ.get("POSTGRES_ENCRYPTION_KEY", "default_key_for_development")
-            
-            with self.engine.connect() as conn:
-                # Önce form ve grup ID'sinin var olduğunu kontrol et
-                check_query = text("""
-                    SELECT COUNT(*) FROM forms 
-                    WHERE form_name = :form_name AND group_id = :group_id
-                """)
-                check_result = conn.execute(check_query, {
+            async with self.connection() as conn:
+                result = await conn.execute(text("""
+                    WITH form AS (
+                        SELECT created_by FROM forms
+                        WHERE form_name = :form_name AND group_id = :group_id
+                    ),
+                    dup AS (
+                        SELECT 1 FROM form_submissions
+                        WHERE form_name = :form_name
+                        AND group_id = :group_id
+                        AND data_hash = :data_hash
+                    ),
+                    charge AS (
+                        UPDATE admin_credits
+                        SET credits = credits - :cost, updated_at = CURRENT_TIMESTAMP
+                        WHERE admin_id = (SELECT created_by FROM form)
+                        AND credits >= :cost
+                        AND NOT EXISTS (SELECT 1 FROM dup)
+                        RETURNING credits
+                    ),
+                    ins AS (
+                        INSERT INTO form_submissions (form_name, group_id, user_id, chat_id, data_hash)
+                        SELECT cast(:form_name as text), cast(:group_id as bigint),
+                               cast(:user_id as bigint), cast(:chat_id as bigint),
+                               cast(:data_hash as text)
+                        FROM charge
+                        ON CONFLICT (form_name, group_id, data_hash) DO NOTHING
+                        RETURNING id
+                    ),
+                    vals AS (
+                        INSERT INTO submission_values (submission_id, field_index, value, blind_index)
+                        SELECT ins.id, v.field_index,
+                               pgp_sym_encrypt(v.value, cast(:encryption_key as text)), v.blind_index
+                        FROM ins, unnest(cast(:value_indexes as integer[]), cast(:values as text[]),
+                                         cast(:blind_indexes as text[])) AS v(field_index, value, blind_index)
+                    )
+                    SELECT EXISTS (SELECT 1 FROM form),
+                           EXISTS (SELECT 1 FROM dup),
+                           (SELECT credits FROM charge),
+                           (SELECT id FROM ins)
+                """), {
                     "form_name": form_name,
-                    "group_id": group_id
+                    "group_id": _as_bigint(group_id),
+                    "user_id": _as_bigint(user_id),
+                    "chat_id": _as_bigint(chat_id),
+                    "data_hash": submission_digest(data),
+                    "encryption_key": encryption_key,
+                    "cost": cost,
+                    **values
                 })
-                
-                if check_result.scalar() == 0:
-                    logger.error(f"Form bulunamadı: {form_name}, group_id: {group_id}")
-                    return False
-                
-                # Şifre çözme işleminde güvenli parametreli sorgu kullan
-                # cast fonksiyonu ile tip dönüşümlerini güvenli şekilde yap
-                query = text("""
-                    SELECT COUNT(*) 
-                    FROM form_submissions 
-                    WHERE form_name = :form_name 
-                    AND group_id = :group_id 
-                    AND cast(pgp_sym_decrypt(cast(data as bytea), cast(:encryption_key as text)) as text) = :data
-                """)
-                
-                result = conn.execute(query, {
+                form_exists, is_duplicate, balance, submission_id = result.fetchone()
+                
+                if submission_id is None:
+                    # Eşzamanlı mükerrer gönderide bakiye düşmüş olabilir, geri al
+                    await conn.rollback()
+                    if not form_exists:
+                        logger.error(f"Form bulunamadı: {form_name}, group_id: {group_id}")
+                        status = 'form_not_found'
+                    elif is_duplicate or balance is not None:
+                        status = 'duplicate'
+                    else:
+                        status = 'insufficient_credits'
+                    return _submission_result(status)
+                
+                await self._attach_receipt(conn, submission_id, receipt_sha256, receipt_upload)
+                await conn.commit()
+                return _submission_result('ok', submission_id, balance)
+        except (SQLAlchemyError, ValueError) as e:
+            logger.error(f"Form gönderim DB hatası: {str(e)}")
+            return _submission_result('error')
+
+    async def _attach_receipt(self, conn, submission_id: int, receipt_sha256: str = None,
+                              receipt_upload: dict = None):
+        """Gönderinin dekontunu bağla veya yüklenmek üzere kuyruğa ekle (çağıranın işleminde)
+
+        receipt_sha256 verilirse dekont, henüz bir gönderiye bağlı değilse bu kayda bağlanır.
+        receipt_upload (file_id, file_unique_id, mime_type, placeholder) verilirse dekont
+        arka planda yüklenmek üzere kuyruğa eklenir.
+        """
+        if receipt_sha256:
+            await conn.execute(text("""
+                UPDATE receipts SET submission_id = :submission_id
+                WHERE sha256 = :sha256 AND submission_id IS NULL
+            """), {"submission_id": submission_id, "sha256": receipt_sha256})
+        if receipt_upload and receipt_upload.get("file_id"):
+            await conn.execute(text("""
+                INSERT INTO receipt_uploads (submission_id, file_id, file_unique_id, mime_type, placeholder)
+                VALUES (:submission_id, :file_id, :file_unique_id, :mime_type, :placeholder)
+            """), {
+                "submission_id": submission_id,
+                "file_id": receipt_upload.get("file_id"),
+                "file_unique_id": receipt_upload.get("file_unique_id"),
+                "mime_type": receipt_upload.get("mime_type"),
+                "placeholder": receipt_upload.get("placeholder")
+            })
+
+    async def get_receipt_by_file(self, file_unique_id: str) -> dict:
+        """Telegram file_unique_id ile kayıtlı dekontu getir"""
+        try:
+            async with self.connection() as conn:
+                row = (await conn.execute(text("""
+                    SELECT r.sha256, r.url, r.backend, r.size_bytes, r.submission_id
+                    FROM receipt_files f
+                    JOIN receipts r ON r.sha256 = f.sha256
+                    WHERE f.file_unique_id = :file_unique_id
+                """), {"file_unique_id": file_unique_id})).fetchone()
+                return dict(row._mapping) if row else None
+        except SQLAlchemyError as e:
+            logger.error(f"Dekont getirme DB hatası: {str(e)}")
+            return None
+
+    async def save_receipt(self, sha256: str, url: str, backend: str, file_unique_id: str = None,
+                           size_bytes: int = None, mime_type: str = None) -> dict:
+        """Dekontu kaydet; aynı içerik zaten varsa mevcut kaydı döndür
+
+        Dönen sözlükte 'created' yeni kayıt eklenip eklenmediğini gösterir.
+        """
+        try:
+            async with self.connection() as conn:
+                created = (await conn.execute(text("""
+                    INSERT INTO receipts (sha256, url, backend, size_bytes, mime_type)
+                    VALUES (:sha256, :url, :backend, :size_bytes, :mime_type)
+                    ON CONFLICT (sha256) DO NOTHING
+                    RETURNING sha256
+                """), {
+                    "sha256": sha256,
+                    "url": url,
+                    "backend": backend,
+                    "size_bytes": size_bytes,
+                    "mime_type": mime_type
+                })).fetchone() is not None
+                
+                if file_unique_id:
+                    await conn.execute(text("""
+                        INSERT INTO receipt_files (file_unique_id, sha256)
+                        VALUES (:file_unique_id, :sha256)
+                        ON CONFLICT (file_unique_id) DO NOTHING
+                    """), {"file_unique_id": file_unique_id, "sha256": sha256})
+                
+                row = (await conn.execute(text("""
+                    SELECT sha256, url, backend, size_bytes, submission_id
+                    FROM receipts
+                    WHERE sha256 = :sha256
+                """), {"sha256": sha256})).fetchone()
+                await conn.commit()
+                return dict(row._mapping, created=created)
+        except SQLAlchemyError as e:
+            logger.error(f"Dekont kaydetme DB hatası: {str(e)}")
+            return None
+
+    async def get_pending_receipt_upload(self, file_unique_id: str) -> int:
+        """Dosya yükleme kuyruğunda bekliyorsa bağlı olduğu gönderi ID'sini döndür"""
+        try:
+            async with self.connection() as conn:
+                return (await conn.execute(text("""
+                    SELECT submission_id FROM receipt_uploads
+                    WHERE file_unique_id = :file_unique_id AND status = 'pending'
+                    LIMIT 1
+                """), {"file_unique_id": file_unique_id})).scalar()
+        except SQLAlchemyError as e:
+            logger.error(f"Bekleyen dekont kontrolü DB hatası: {str(e)}")
+            return None
+
+    async def claim_receipt_uploads(self, limit: int, lease_seconds: float) -> list:
+        """Zamanı gelen dekont yüklemelerini al ve lease süresince başka işçilere kapat"""
+        try:
+            async with self.connection() as conn:
+                result = await conn.execute(text("""
+                    UPDATE receipt_uploads
+                    SET next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => :lease),
+                        attempts = attempts + 1,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE id IN (
+                        SELECT id FROM receipt_uploads
+                        WHERE status = 'pending'
+                        AND next_attempt_at <= CURRENT_TIMESTAMP
+                        ORDER BY next_attempt_at
+                        LIMIT :limit
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING id, submission_id, file_id, file_unique_id, mime_type, placeholder, attempts
+                """), {"limit": limit, "lease": float(lease_seconds)})
+                uploads = [dict(row._mapping) for row in result.fetchall()]
+                await conn.commit()
+                return uploads
+        except SQLAlchemyError as e:
+            logger.error(f"Dekont yükleme kuyruğu DB hatası: {str(e)}")
+            return []
+
+    async def complete_receipt_upload(self, upload_id: int, receipt_sha256: str, url: str) -> bool:
+        """Gönderideki geçici dekont referansını gerçek adresle değiştir ve yüklemeyi tamamla
+
+        Geçici referans her zaman gönderinin son satırıdır; yalnızca bu gönderinin
+        alan değerleri çözülür. Alan değerleri henüz doldurulmamış eski kayıtlarda
+        tüm veri (data) güncellenir.
+        """
+        encryption_key = get_encryption_key()
+        if not encryption_key:
+            logger.error("POSTGRES_ENCRYPTION_KEY bulunamadı!")
+            return False
+        
+        try:
+            async with self.connection() as conn:
+                row = (await conn.execute(text("""
+                    SELECT fs.id, fs.form_name, fs.group_id, ru.placeholder,
+                           (SELECT array_agg(cast(pgp_sym_decrypt(v.value, cast(:encryption_key as text)) as text)
+                                             ORDER BY v.field_index)
+                            FROM submission_values v
+                            WHERE v.submission_id = fs.id),
+                           CASE WHEN fs.data IS NOT NULL
+                                THEN cast(pgp_sym_decrypt(cast(fs.data as bytea), cast(:encryption_key as text)) as text)
+                           END
+                    FROM receipt_uploads ru
+                    JOIN form_submissions fs ON fs.id = ru.submission_id
+                    WHERE ru.id = :upload_id AND ru.status = 'pending'
+                    FOR UPDATE OF fs, ru
+                """), {"upload_id": upload_id, "encryption_key": encryption_key})).fetchone()
+                if row is None:
+                    # Gönderi silinmiş veya yükleme başka bir işçi tarafından tamamlanmış
+                    return True
+                
+                submission_id, form_name, group_id, placeholder, values, legacy_data = row
+                lines = list(values) if values else (legacy_data or "").split('\n')
+                # Geçici referans her zaman verinin son satırıdır
+                line_index = max((index for index, line in enumerate(lines) if placeholder in line), default=None)
+                if line_index is not None:
+                    lines[line_index] = lines[line_index].replace(placeholder, url)
+                new_data = '\n'.join(lines)
+                
+                # Aynı içerikli başka bir gönderi varsa özet değiştirilmez (benzersiz indeks)
+                await conn.execute(text("""
+                    UPDATE form_submissions fs
+                    SET data = CASE WHEN fs.data IS NULL THEN NULL
+                                    ELSE pgp_sym_encrypt(cast(:data as text), cast(:encryption_key as text)) END,
+                        data_hash = CASE WHEN EXISTS (
+                            SELECT 1 FROM form_submissions other
+                            WHERE other.form_name = :form_name
+                            AND other.group_id = :group_id
+                            AND other.data_hash = :data_hash
+                        ) THEN fs.data_hash ELSE :data_hash END
+                    WHERE fs.id = :submission_id
+                """), {
+                    "data": new_data,
+                    "encryption_key": encryption_key,
+                    "data_hash": submission_digest(new_data),
                     "form_name": form_name,
                     "group_id": group_id,
-                    "data": data,
-                    "encryption_key": encryption_key
+                    "submission_id": submission_id
                 })
-                
-                count = result.scalar()
-                return count > 0
-        except SQLAlchemyError as e:
-            logger.error(f"Mükerrer kayıt kontrolü DB hatası: {str(e)}")
+                if values and line_index is not None:
+                    await conn.execute(text("""
+                        UPDATE submission_values
+                        SET value = pgp_sym_encrypt(cast(:value as text), cast(:encryption_key as text))
+                        WHERE submission_id = :submission_id AND field_index = :line_index
+                    """), {
+                        "value": lines[line_index],
+                        "encryption_key": encryption_key,
+                        "submission_id": submission_id,
+                        "line_index": line_index
+                    })
+                await conn.execute(text("""
+                    UPDATE receipts SET submission_id = :submission_id
+                    WHERE sha256 = :sha256 AND submission_id IS NULL
+                """), {"submission_id": submission_id, "sha256": receipt_sha256})
+                await conn.execute(text("""
+                    UPDATE receipt_uploads
+                    SET status = 'done', last_error = NULL, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = :upload_id
+                """), {"upload_id": upload_id})
+                await conn.commit()
+                return True
+        except (SQLAlchemyError, ValueError) as e:
+            logger.error(f"Dekont yükleme tamamlama DB hatası: {str(e)}")
             return False
 
-    async def save_form_data(self, form_name: str, group_id: int, user_id: int, chat_id: int, data: str) -> int:
-        """Form verisini kaydet ve submission_id'yi döndür"""
+    async def fail_receipt_upload(self, upload_id: int, error: str, delay_seconds: float, give_up: bool = False) -> bool:
+        """Başarısız dekont yüklemesini tekrar denemek üzere ertele (give_up ise 'failed' yap)"""
         try:
-            # .env dosyasından şifreleme anahtarını al (.env ve GitHub secrets'a eklenmesi gerekli)
-            encryption_key = os.environ.get("POSTGRES_ENCRYPTION_KEY")
-            
-            # Şifreleme anahtarı kontrolü
-            if not encryption_key:
-                logger.error("POSTGRES_ENCRYPTION_KEY bulunamadı!")
-                return None
-            
-            with self.engine.connect() as conn:
-                # Önce form ve grup ID'sinin var olduğunu kontrol et
-                check_query = text("""
-                    SELECT COUNT(*) FROM forms 
-                    WHERE form_name = :form_name AND group_id = :group_id
-                """)
-                check_result = conn.execute(check_query, {
-                    "form_name": form_name,
-                    "group_id": group_id
-                })
-                
-                if check_result.scalar() == 0:
-                    logger.error(f"Form bulunamadı: {form_name}, group_id: {group_id}")
-                    return None
-                
-                # Şifreleme işleminde güvenli parametreli sorgu kullan
-                # cast fonksiyonu ile tip dönüşümlerini güvenli şekilde yap
-                query = text("""
-                    INSERT INTO form_submissions (form_name, group_id, user_id, chat_id, data)
-                    VALUES (:form_name, :group_id, :user_id, :chat_id, 
-                            pgp_sym_encrypt(cast(:data as text), cast(:encryption_key as text)))
-                    RETURNING id
-                """)
-                
-                result = conn.execute(query, {
-                    "form_name": form_name,
-                    "group_id": group_id,
-                    "user_id": user_id,
-                    "chat_id": chat_id,
-                    "data": data,
-                    "encryption_key": encryption_key
+            async with self.connection() as conn:
+                await conn.execute(text("""
+                    UPDATE receipt_uploads
+                    SET status = CASE WHEN :give_up THEN 'failed' ELSE status END,
+                        last_error = :error,
+                        next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => :delay),
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE id = :upload_id AND status = 'pending'
+                """), {
+                    "upload_id": upload_id,
+                    "error": (error or "")[:500],
+                    "delay": float(delay_seconds),
+                    "give_up": give_up
                 })
-                
-                conn.commit()
-                submission_id = result.scalar()
-                return submission_id
+                await conn.commit()
+                return True
         except SQLAlchemyError as e:
-            logger.error(f"Form verisi kaydetme DB hatası: {str(e)}")
-            return None
+            logger.error(f"Dekont yükleme erteleme DB hatası: {str(e)}")
+            return False
 
     async def generate_report(self, form_name: str, admin_id: int = None, 
                              start_date: datetime = None, end_date: datetime = None, is_super_admin: bool = False) -> io.BytesIO:
-        """Form verilerinden Excel raporu oluştur"""
+        """Form verilerinden Excel raporu oluştur
+
+        Admin eşzamanlı rapor sınırındaysa ReportBusyError fırlatır.
+        """
         try:
-            # .env dosyasından şifreleme anahtarını al
-            encryption_key = os.environ.get("POSTGRES_ENCRYPTION_KEY", "default_key_for_development")
-            
-            with self.engine.connect() as conn:
-                # Form şablonunu al
-                if is_super_admin:
-                    # Süper admin tüm formları görebilir
-                    cursor = conn.execute(text("""
-                        SELECT fields FROM forms 
-                        WHERE form_name = :form_name
-                    """), {"form_name": form_name})
-                else:
-                    # Normal admin sadece kendi formlarını görebilir
-                    cursor = conn.execute(text("""
-                        SELECT fields FROM forms 
-                        WHERE form_name = :form_name AND created_by = :admin_id
-                    """), {"form_name": form_name, "admin_id": admin_id})
-                
-                form = cursor.fetchone()
-                if not form:
-                    logger.error(f"Form bulunamadı: {form_name}")
-                    return None
-                
-                fields = form[0].split(',')
-                
-                # Verileri al - parametreli sorgu kullan
-                base_query = """
-                    SELECT cast(pgp_sym_decrypt(cast(fs.data as bytea), cast(:encryption_key as text)) as text), 
-                           fs.created_at, fs.id
-                    FROM form_submissions fs
-                """
-                
-                params = {"encryption_key": encryption_key, "form_name": form_name}
-                
-                if is_super_admin:
-                    # Süper admin tüm verileri görebilir
-                    query = base_query + " WHERE fs.form_name = :form_name"
-                else:
-                    # Normal admin sadece kendi formlarının verilerini görebilir
-                    query = base_query + """
-                        JOIN forms f ON fs.form_name = f.form_name
-                        WHERE fs.form_name = :form_name AND f.created_by = :admin_id
-                    """
-                    params["admin_id"] = admin_id
-                
-                # Tarih filtrelemesi
-                if not start_date and not end_date:
-                    today = datetime.now().strftime('%Y-%m-%d')
-                    query += " AND DATE(fs.created_at) = :today"
-                    params["today"] = today
-                elif start_date and end_date:
-                    query += " AND fs.created_at BETWEEN :start_date AND :end_date"
-                    params["start_date"] = start_date.strftime('%Y-%m-%d 00:00:00')
-                    params["end_date"] = end_date.strftime('%Y-%m-%d 23:59:59')
-                
-                query += " ORDER BY fs.id ASC"
-                cursor = conn.execute(text(query), params)
-                submissions = cursor.fetchall()
-                
-                if not submissions:
-                    logger.error("Veri bulunamadı")
-                    return None
-                
-                # Excel dosyası oluştur
-                wb = Workbook()
-                ws = wb.active
-                ws.title = form_name
-                
-                # Stil tanımlamaları
-                header_fill = PatternFill(start_color='1A237E', end_color='1A237E', fill_type='solid')  # Koyu lacivert başlık
-                header_font = Font(bold=True, color='FFFFFF')  # Beyaz yazı
-                center_align = Alignment(horizontal='center')
-                
-                # Satır renkleri (daha yoğun pastel tonlar)
-                row_colors = [
-                    'E3EEFF',  # Yoğun açık mavi
-                    'FFE6E3',  # Yoğun açık somon
-                    'E3FFEB',  # Yoğun açık mint
-                    'FFF0E3',  # Yoğun açık şeftali
-                ]
-                
-                # Başlıkları ekle
-                headers = ['Form No'] + fields + ['Tarih']
-                for col, header in enumerate(headers, 1):
-                    cell = ws.cell(row=1, column=col, value=header)
-                    cell.fill = header_fill
-                    cell.font = header_font
-                    cell.alignment = center_align
-                
-                # Verileri ekle
-                for row_idx, submission in enumerate(submissions, 2):
-                    data = submission[0].split('\n')
-                    created_at = submission[1]
-                    form_id = submission[2]
-                    
-                    # Satır arkaplan rengi
-                    row_color = row_colors[(row_idx-2) % len(row_colors)]
-                    row_fill = PatternFill(start_color=row_color, end_color=row_color, fill_type='solid')
-                    
-                    # Form numarası
-                    cell = ws.cell(row=row_idx, column=1, value=form_id)
-                    cell.fill = row_fill
-                    cell.alignment = center_align
-                    
-                    # Form verileri
-                    for col_idx, value in enumerate(data, 2):
-                        cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                        cell.fill = row_fill
-                    
-                    # Tarih
-                    cell = ws.cell(row=row_idx, column=len(headers), value=created_at)
-                    cell.fill = row_fill
-                    cell.alignment = center_align
-                
-                # Sütun genişliklerini ayarla
-                for col in ws.columns:
-                    max_length = 0
-                    column = col[0].column_letter
-                    
-                    for cell in col:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    
-                    if column == 'A':  # Form No
-                        ws.column_dimensions[column].width = 8
-                    elif column == ws.cell(row=1, column=len(headers)).column_letter:  # Tarih
-                        ws.column_dimensions[column].width = 19
-                    else:
-                        adjusted_width = min(max(max_length + 2, 10), 50)
-                        ws.column_dimensions[column].width = adjusted_width
-                
-                # Excel dosyasını kaydet
-                excel_file = io.BytesIO()
-                wb.save(excel_file)
-                excel_file.seek(0)
-                
-                return excel_file
-                
+            # Rapor işçi süreçte oluşturulur, event loop sadece sonucu bekler
+            if self.report_pool is not None:
+                data = await self.report_pool.run(
+                    admin_id, run_report_job,
+                    self.database_url, form_name, admin_id, start_date, end_date, is_super_admin
+                )
+                report = io.BytesIO(data) if data else None
+            else:
+                # Süreç havuzu kapalıysa thread havuzunda oluştur
+                report = await asyncio.to_thread(
+                    self._generate_report_sync,
+                    form_name, admin_id, start_date, end_date, is_super_admin
+                )
+            if report is not None:
+                REPORT_SIZE.observe(report.getbuffer().nbytes)
+            return report
+        except ReportBusyError:
+            raise
         except Exception as e:
             logger.error(f"Rapor oluşturma hatası: {str(e)}")
             return None
 
+    def _generate_report_sync(self, form_name, admin_id, start_date, end_date, is_super_admin):
+        """Raporu senkron bağlantı üzerinden akıtarak oluştur"""
+        with self.engine.connect() as conn:
+            return build_report(
+                conn,
+                form_name=form_name,
+                admin_id=admin_id,
+                start_date=start_date,
+                end_date=end_date,
+                is_super_admin=is_super_admin
+            )
+
     async def add_group(self, group_id: int, group_name: str, admin_id: int = None) -> bool:
         try:
-            with self.engine.connect() as conn:
+            async with self.connection() as conn:
                 # Grubu ekle
-                conn.execute(text("""
+                await conn.execute(text("""
                     INSERT INTO groups (group_id, group_name)
                     VALUES (:group_id, :group_name)
                     ON CONFLICT (group_id) DO UPDATE 
@@ -729,13 +1515,15 @@ class DatabaseManager:
 
                 # Eğer admin_id verilmişse ve süper admin değilse, admin-grup ilişkisini ekle
                 if admin_id and admin_id != SUPER_ADMIN_ID:
-                    conn.execute(text("""
+                    await conn.execute(text("""
                         INSERT INTO admin_groups (admin_id, group_id)
                         VALUES (:admin_id, :group_id)
                         ON CONFLICT DO NOTHING
                     """), {"admin_id": admin_id, "group_id": group_id})
                 
-                conn.commit()
+                await self._bump_cache_version(conn, 'auth')
+                await conn.commit()
+                self.auth_cache.invalidate(('group', group_id))
                 return True
         except SQLAlchemyError as e:
             logger.error(f"Grup ekleme DB hatası: {str(e)}")
@@ -743,24 +1531,25 @@ class DatabaseManager:
 
     async def remove_group(self, group_id: int, admin_id: int = None) -> bool:
         try:
-            with self.engine.connect() as conn:
+            async with self.connection() as conn:
                 # Süper admin tüm grupları silebilir
                 if admin_id == SUPER_ADMIN_ID:
                     # Önce admin-grup ilişkilerini sil
-                    conn.execute(text("""
+                    await conn.execute(text("""
                         DELETE FROM admin_groups
                         WHERE group_id = :group_id
                     """), {"group_id": group_id})
                     
-                    # Sonra grubu sil
-                    result = conn.execute(text("""
+                    # Sonra grubu sil (formları da silinir)
+                    removed_forms = await self._group_form_names(conn, group_id)
+                    result = await conn.execute(text("""
                         DELETE FROM groups
                         WHERE group_id = :group_id
                     """), {"group_id": group_id})
                 else:
                     # Normal admin sadece kendi grubunu silebilir
                     # Önce admin-grup ilişkisini kontrol et
-                    cursor = conn.execute(text("""
+                    cursor = await conn.execute(text("""
                         SELECT COUNT(*) FROM admin_groups
                         WHERE admin_id = :admin_id AND group_id = :group_id
                     """), {"admin_id": admin_id, "group_id": group_id})
@@ -769,19 +1558,20 @@ class DatabaseManager:
                         return False
                     
                     # Admin-grup ilişkisini sil
-                    conn.execute(text("""
+                    await conn.execute(text("""
                         DELETE FROM admin_groups
                         WHERE admin_id = :admin_id AND group_id = :group_id
                     """), {"admin_id": admin_id, "group_id": group_id})
                     
                     # Başka admin yoksa grubu da sil
-                    cursor = conn.execute(text("""
+                    cursor = await conn.execute(text("""
                         SELECT COUNT(*) FROM admin_groups
                         WHERE group_id = :group_id
                     """), {"group_id": group_id})
                     
                     if cursor.scalar() == 0:
-                        result = conn.execute(text("""
+                        removed_forms = await self._group_form_names(conn, group_id)
+                        result = await conn.execute(text("""
                             DELETE FROM groups
                             WHERE group_id = :group_id
                         """), {"group_id": group_id})
@@ -789,16 +1579,28 @@ class DatabaseManager:
                         # Başka adminler varsa grubu silme
                         return True
                 
-                conn.commit()
+                await self._bump_cache_version(conn, 'auth', 'forms')
+                await conn.commit()
+                self.auth_cache.invalidate(('group', group_id))
+                for form_name in removed_forms:
+                    self._invalidate_form(form_name)
                 return True
         except SQLAlchemyError as e:
             logger.error(f"Grup silme DB hatası: {str(e)}")
             return False
 
+    async def _group_form_names(self, conn, group_id: int) -> list:
+        """Grubun formlarının isimleri (grup silinince önbellekten düşürülür)"""
+        result = await conn.execute(text("""
+            SELECT form_name FROM forms
+            WHERE group_id = :group_id
+        """), {"group_id": group_id})
+        return [row[0] for row in result.fetchall()]
+
     async def get_group_name(self, group_id: int) -> str:
         try:
-            with self.engine.connect() as conn:
-                result = conn.execute(text("""
+            async with self.connection() as conn:
+                result = await conn.execute(text("""
                     SELECT group_name 
                     FROM groups 
                     WHERE group_id = :group_id
@@ -810,21 +1612,66 @@ class DatabaseManager:
             logger.error(f"Grup adı getirme DB hatası: {str(e)}")
             return None
 
-    async def get_form_submissions(self, form_name: str, group_id: int = None) -> list:
+    async def get_form_submissions(self, form_name: str, group_id: int = None,
+                                   field: str = None, value: str = None,
+                                   admin_id: int = None, limit: int = None,
+                                   field_count: int = None) -> list:
+        """Formun gönderilerini getir
+
+        field ve value verilirse yalnızca o alanın kör indeksi eşleşen gönderiler
+        indeks üzerinden bulunur ve sadece bu gönderilerin alan değerleri çözülür
+        ('values'); field_count verilirse yalnızca ilk field_count alan çözülür.
+        admin_id verilirse yalnızca o adminin formları aranır.
+        """
         try:
-            with self.engine.connect() as conn:
-                query = text("""
-                    SELECT fs.id, fs.user_id, fs.chat_id, fs.data, fs.created_at
-                    FROM form_submissions fs
-                    WHERE fs.form_name = :form_name
-                """)
-                
+            async with self.connection() as conn:
                 params = {"form_name": form_name}
+                
+                if field is not None:
+                    encryption_key = get_encryption_key()
+                    if not encryption_key:
+                        logger.error("POSTGRES_ENCRYPTION_KEY bulunamadı!")
+                        return []
+                    
+                    # Kör indeks alan adını içerir; farklı gruplardaki aynı adlı alanlar da eşleşir
+                    query = text("""
+                        SELECT fs.id, fs.user_id, fs.chat_id, fs.created_at, fs.group_id,
+                               (SELECT array_agg(cast(pgp_sym_decrypt(sv.value, cast(:encryption_key as text)) as text)
+                                                 ORDER BY sv.field_index)
+                                FROM submission_values sv
+                                WHERE sv.submission_id = fs.id
+                                AND (cast(:field_count as integer) IS NULL OR sv.field_index < cast(:field_count as integer))
+                               ) AS values
+                        FROM submission_values v
+                        JOIN form_submissions fs ON fs.id = v.submission_id
+                        JOIN forms f ON f.form_name = fs.form_name AND f.group_id = fs.group_id
+                        WHERE v.blind_index = :blind_index
+                        AND fs.form_name = :form_name
+                    """)
+                    params["blind_index"] = blind_index(field, value or "")
+                    params["encryption_key"] = encryption_key
+                    params["field_count"] = field_count
+                else:
+                    query = text("""
+                        SELECT fs.id, fs.user_id, fs.chat_id, fs.created_at, fs.group_id, NULL AS values
+                        FROM form_submissions fs
+                        JOIN forms f ON f.form_name = fs.form_name AND f.group_id = fs.group_id
+                        WHERE fs.form_name = :form_name
+                    """)
+                
                 if group_id is not None:
                     query = text(query.text + " AND fs.group_id = :group_id")
                     params["group_id"] = group_id
+                if admin_id is not None:
+                    query = text(query.text + " AND f.created_by = :admin_id")
+                    params["admin_id"] = _as_bigint(admin_id)
+                
+                query = text(query.text + " ORDER BY fs.id DESC")
+                if limit is not None:
+                    query = text(query.text + " LIMIT :limit")
+                    params["limit"] = limit
                 
-                result = conn.execute(query, params)
+                result = await conn.execute(query, params)
                 submissions = result.fetchall()
                 
                 return [
@@ -832,8 +1679,9 @@ class DatabaseManager:
                         'id': sub[0],
                         'user_id': sub[1],
                         'chat_id': sub[2],
-                        'data': sub[3],
-                        'created_at': sub[4]
+                        'created_at': sub[3],
+                        'group_id': sub[4],
+                        'values': list(sub[5]) if sub[5] is not None else None
                     }
                     for sub in submissions
                 ]
@@ -843,12 +1691,12 @@ class DatabaseManager:
 
     async def delete_form(self, form_name: str, group_id: int) -> bool:
         try:
-            with self.engine.connect() as conn:
+            async with self.connection() as conn:
                 # Önce form bilgilerini al
-                form_info = conn.execute(text("""
+                form_info = (await conn.execute(text("""
                     SELECT group_id FROM forms
                     WHERE form_name = :form_name
-                """), {"form_name": form_name}).fetchone()
+                """), {"form_name": form_name})).fetchone()
                 
                 if not form_info:
                     logger.error(f"Form bulunamadı: {form_name}")
@@ -858,18 +1706,20 @@ class DatabaseManager:
                 actual_group_id = form_info[0]
                 
                 # Önce form gönderilerini sil
-                conn.execute(text("""
+                await conn.execute(text("""
                     DELETE FROM form_submissions
                     WHERE form_name = :form_name AND group_id = :group_id
                 """), {"form_name": form_name, "group_id": actual_group_id})
                 
                 # Sonra formu sil
-                result = conn.execute(text("""
+                result = await conn.execute(text("""
                     DELETE FROM forms
                     WHERE form_name = :form_name AND group_id = :group_id
                 """), {"form_name": form_name, "group_id": actual_group_id})
                 
-                conn.commit()
+                await self._bump_cache_version(conn, 'forms')
+                await conn.commit()
+                self._invalidate_form(form_name)
                 return result.rowcount > 0
         except SQLAlchemyError as e:
             logger.error(f"Form silme DB hatası: {str(e)}")
@@ -877,31 +1727,39 @@ class DatabaseManager:
 
     async def delete_submission(self, submission_id: int) -> bool:
         try:
-            with self.engine.connect() as conn:
-                result = conn.execute(text("""
+            async with self.connection() as conn:
+                result = await conn.execute(text("""
                     DELETE FROM form_submissions
                     WHERE id = :submission_id
                 """), {"submission_id": submission_id})
                 
-                conn.commit()
+                await conn.commit()
                 return result.rowcount > 0
         except SQLAlchemyError as e:
             logger.error(f"Form gönderisi silme DB hatası: {str(e)}")
             return False
 
     async def is_authorized_group(self, group_id: int) -> bool:
-        """Grup yetkili bir admin tarafından eklenmiş mi kontrol et"""
+        """Grup yetkili bir admin tarafından eklenmiş mi kontrol et (önbellekli)"""
         try:
-            with self.engine.connect() as conn:
+            await self._sync_caches()
+            cache_key = ('group', group_id)
+            cached = self.auth_cache.get(cache_key)
+            if cached is not MISSING:
+                return cached
+            
+            async with self.connection() as conn:
                 # Önce groups tablosunda var mı kontrol et
-                result = conn.execute(text("""
+                result = await conn.execute(text("""
                     SELECT EXISTS (
                         SELECT 1 FROM groups 
                         WHERE group_id = :group_id
                     )
                 """), {"group_id": group_id})
-                
-                return result.scalar()
+                is_authorized = bool(result.scalar())
+            
+            self.auth_cache.set(cache_key, is_authorized, ttl=None if is_authorized else AUTH_CACHE_NEGATIVE_TTL)
+            return is_authorized
         except SQLAlchemyError as e:
             logger.error(f"Grup yetki kontrolü DB hatası: {str(e)}")
             return False
@@ -909,8 +1767,8 @@ class DatabaseManager:
     async def get_group_admins(self, group_id: int) -> list:
         """Grubun adminlerini getir"""
         try:
-            with self.engine.connect() as conn:
-                result = conn.execute(text("""
+            async with self.connection() as conn:
+                result = await conn.execute(text("""
                     SELECT ga.user_id
                     FROM group_admins ga
                     INNER JOIN admin_groups ag ON ga.user_id = ag.admin_id
@@ -942,11 +1800,11 @@ class DatabaseManager:
             """)
             
             # Sorguyu çalıştır
-            with self.engine.connect() as conn:
+            async with self.connection() as conn:
                 # Eğer chat_id verilmişse onu kullan, yoksa user_id'yi kullan
                 group_id = chat_id if chat_id is not None else user_id
                 
-                result = conn.execute(
+                result = await conn.execute(
                     query,
                     {
                         "form_name": form_name,
@@ -956,14 +1814,145 @@ class DatabaseManager:
                     }
                 )
                 returned_form_name = result.scalar()
-                conn.commit()
-                
+                await self._bump_cache_version(conn, 'forms')
+                await conn.commit()
+            
+            self._invalidate_form(form_name)
             return returned_form_name is not None
             
         except Exception as e:
             logger.error(f"Form ekleme hatası: {str(e)}")
             return False
 
+    def backfill_submission_hashes(self, batch_size: int = 500) -> dict:
+        """Özeti olmayan eski gönderiler için data_hash sütununu doldur (tek seferlik)"""
+        encryption_key = require_encryption_key()
+        updated = 0
+        duplicates = 0
+        last_id = 0
+        
+        while True:
+            with self.engine.connect() as conn:
+                # Veri alan bazında saklanmışsa değerlerden birleştirilir
+                rows = conn.execute(text("""
+                    SELECT id, form_name, group_id,
+                           COALESCE(
+                               cast(pgp_sym_decrypt(cast(data as bytea), cast(:encryption_key as text)) as text),
+                               (SELECT string_agg(cast(pgp_sym_decrypt(v.value, cast(:encryption_key as text)) as text),
+                                                  E'\n' ORDER BY v.field_index)
+                                FROM submission_values v
+                                WHERE v.submission_id = form_submissions.id)
+                           )
+                    FROM form_submissions
+                    WHERE data_hash IS NULL AND id > :last_id
+                    ORDER BY id
+                    LIMIT :batch_size
+                """), {
+                    "encryption_key": encryption_key,
+                    "last_id": last_id,
+                    "batch_size": batch_size
+                }).fetchall()
+                
+                if not rows:
+                    break
+                
+                for submission_id, form_name, group_id, data in rows:
+                    # Aynı içerik daha önce özetlendiyse bu kayıt mükerrerdir, özetsiz bırakılır
+                    result = conn.execute(text("""
+                        UPDATE form_submissions fs
+                        SET data_hash = :data_hash
+                        WHERE fs.id = :id
+                        AND NOT EXISTS (
+                            SELECT 1 FROM form_submissions other
+                            WHERE other.form_name = :form_name
+                            AND other.group_id = :group_id
+                            AND other.data_hash = :data_hash
+                        )
+                    """), {
+                        "id": submission_id,
+                        "form_name": form_name,
+                        "group_id": group_id,
+                        "data_hash": submission_digest(data or "")
+                    })
+                    if result.rowcount:
+                        updated += 1
+                    else:
+                        duplicates += 1
+                
+                conn.commit()
+                last_id = rows[-1][0]
+                logger.info(f"Özet doldurma: {updated} güncellendi, {duplicates} mükerrer (son id: {last_id})")
+        
+        return {'updated': updated, 'duplicates': duplicates}
+
+    def backfill_submission_values(self, batch_size: int = 500) -> dict:
+        """Eski gönderilerin verisini alan bazlı değerlere taşı (tek seferlik)
+
+        Alan değeri olmayan gönderiler için submission_values doldurulur; değerleri
+        yazılan (veya önceden çift yazılmış) gönderilerin tüm veriyi tutan data
+        sütunu boşaltılır, böylece her alan tek kez şifreli saklanır.
+        """
+        encryption_key = require_encryption_key()
+        updated = 0
+        last_id = 0
+        
+        while True:
+            with self.engine.connect() as conn:
+                rows = conn.execute(text("""
+                    SELECT fs.id, f.fields,
+                           cast(pgp_sym_decrypt(cast(fs.data as bytea), cast(:encryption_key as text)) as text)
+                    FROM form_submissions fs
+                    JOIN forms f ON f.form_name = fs.form_name AND f.group_id = fs.group_id
+                    WHERE fs.id > :last_id
+                    AND NOT EXISTS (SELECT 1 FROM submission_values v WHERE v.submission_id = fs.id)
+                    ORDER BY fs.id
+                    LIMIT :batch_size
+                """), {
+                    "encryption_key": encryption_key,
+                    "last_id": last_id,
+                    "batch_size": batch_size
+                }).fetchall()
+                
+                if not rows:
+                    break
+                
+                for submission_id, fields, data in rows:
+                    values = split_submission_values(data or "", fields.split(',') if fields else [])
+                    conn.execute(text("""
+                        INSERT INTO submission_values (submission_id, field_index, value, blind_index)
+                        SELECT :submission_id, v.field_index,
+                               pgp_sym_encrypt(v.value, cast(:encryption_key as text)), v.blind_index
+                        FROM unnest(cast(:value_indexes as integer[]), cast(:values as text[]),
+                                    cast(:blind_indexes as text[])) AS v(field_index, value, blind_index)
+                        ON CONFLICT (submission_id, field_index) DO NOTHING
+                    """), {"submission_id": submission_id, "encryption_key": encryption_key, **values})
+                    updated += 1
+                    last_id = submission_id
+                
+                conn.commit()
+                logger.info(f"Alan değeri doldurma: {updated} kayıt işlendi (son id: {last_id})")
+        
+        # Alan değerleri tamamlanmış gönderilerde tüm veri kopyasını sil
+        cleared = 0
+        while True:
+            with self.engine.connect() as conn:
+                result = conn.execute(text("""
+                    UPDATE form_submissions SET data = NULL
+                    WHERE id IN (
+                        SELECT fs.id FROM form_submissions fs
+                        WHERE fs.data IS NOT NULL
+                        AND EXISTS (SELECT 1 FROM submission_values v WHERE v.submission_id = fs.id)
+                        LIMIT :batch_size
+                    )
+                """), {"batch_size": batch_size})
+                conn.commit()
+            if not result.rowcount:
+                break
+            cleared += result.rowcount
+            logger.info(f"Tüm veri kopyası silindi: {cleared} kayıt")
+        
+        return {'updated': updated, 'cleared': cleared}
+
     def get_group_by_db_id(self, db_id):
         """DB ID ile grup bilgilerini getir"""
         try:
@@ -989,7 +1978,7 @@ class DatabaseManager:
     async def get_forms_by_group(self, group_id: int, user_id: int = None) -> List[Dict]:
         """Belirli bir gruptaki tüm formları getir"""
         try:
-            with self.engine.connect() as conn:
+            async with self.connection() as conn:
                 # Eğer user_id verilmişse ve admin ise, adminin tüm gruplarındaki formları getir
                 if user_id and await self.is_admin(user_id):
                     query = text("""
@@ -999,7 +1988,7 @@ class DatabaseManager:
                         WHERE ag.admin_id = :user_id
                         ORDER BY f.form_name
                     """)
-                    result = conn.execute(query, {"user_id": user_id})
+                    result = await conn.execute(query, {"user_id": user_id})
                 else:
                     # Normal kullanıcılar için sadece kendi adminlerinin formlarını getir
                     query = text("""
@@ -1009,7 +1998,7 @@ class DatabaseManager:
                         WHERE ag.group_id = :group_id
                         ORDER BY f.form_name
                     """)
-                    result = conn.execute(query, {"group_id": group_id})
+                    result = await conn.execute(query, {"group_id": group_id})
                 
                 forms = result.fetchall()
                 return [
@@ -1023,4 +2012,20 @@ class DatabaseManager:
                 ]
         except Exception as e:
             logger.error(f"Formları getirme hatası: {str(e)}")
-            return [] 
\ No newline at end of file
+            return []
+
+
+# Herkese açık async metotların süresi metrik olarak kaydedilir
+instrument_methods(DatabaseManager)
+
+
+# Süreç genelinde paylaşılan DatabaseManager (tek bağlantı havuzu)
+_shared_manager = None
+
+
+def get_database_manager() -> DatabaseManager:
+    """Paylaşılan DatabaseManager örneğini döndür, yoksa oluştur"""
+    global _shared_manager
+    if _shared_manager is None:
+        _shared_manager = DatabaseManager()
+    return _shared_manager
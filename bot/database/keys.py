@@ -0,0 +1,32 @@
+import os
+
+
+class MissingKeyError(RuntimeError):
+    """Gerekli şifreleme/özet anahtarı tanımlı değil"""
+
+
+def get_encryption_key() -> str:
+    """Veri şifreleme anahtarı (POSTGRES_ENCRYPTION_KEY); tanımlı değilse None
+
+    Canlı yol ve tek seferlik doldurma betikleri aynı anahtarı buradan alır;
+    varsayılan bir geliştirme anahtarına asla düşülmez.
+    """
+    return os.environ.get("POSTGRES_ENCRYPTION_KEY") or None
+
+
+def require_encryption_key() -> str:
+    """Veri şifreleme anahtarı; tanımlı değilse MissingKeyError"""
+    encryption_key = get_encryption_key()
+    if not encryption_key:
+        raise MissingKeyError("POSTGRES_ENCRYPTION_KEY bulunamadı!")
+    return encryption_key
+
+
+def get_submission_hash_key() -> str:
+    """Mükerrer kayıt özeti (HMAC) anahtarı; verilmezse şifreleme anahtarı kullanılır"""
+    return os.environ.get("SUBMISSION_HASH_KEY") or require_encryption_key()
+
+
+def get_blind_index_key() -> str:
+    """Kör indeks (HMAC) anahtarı; verilmezse özet anahtarı kullanılır"""
+    return os.environ.get("BLIND_INDEX_KEY") or get_submission_hash_key()
@@ -0,0 +1,282 @@
+import hashlib
+import json
+import pickle
+from collections import defaultdict
+from typing import Dict, Optional, Tuple
+from config import logger, PERSISTENCE_UPDATE_INTERVAL, PERSISTENCE_SHARED, CONVERSATION_TIMEOUT
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from telegram.ext import BasePersistence, PersistenceInput
+
+# Kullanıcı ve sohbet verisi tabloları: (tablo, anahtar sütunu)
+_SCOPES = {
+    'user': ('persistence_user_data', 'user_id'),
+    'chat': ('persistence_chat_data', 'chat_id'),
+}
+
+
+def _fingerprint(payload: bytes) -> bytes:
+    """Değişiklik tespiti için kısa özet"""
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+class PostgresPersistence(BasePersistence):
+    """python-telegram-bot verilerini PostgreSQL'de anahtar bazında saklayan persistence
+
+    PicklePersistence gibi her seferinde tüm veriyi tek dosyaya yazmaz:
+    yalnızca değişen kullanıcı, sohbet ve konuşma anahtarları küçük
+    işlemlerle (upsert) yazılır; içeriği değişmeyen anahtarlar atlanır.
+    Kullanıcı ve sohbet verisi başlangıçta toplu okunmaz, ilgili sohbetten ilk
+    güncelleme geldiğinde yüklenir.
+
+    `shared=True` ile birden fazla bot süreci aynı veritabanını kullanabilir:
+    her güncellemede kaydın sürümü kontrol edilir ve başka bir süreç
+    değiştirmişse yeniden yüklenir. Konuşma durumları başlangıçta okunur ve
+    değiştikçe anahtar bazında yazılır; `conversation_ttl` saniyeden eski
+    konuşmalar yüklenmez ve `compact` ile silinir. Geri yüklenen bir konuşmada
+    kullanıcı yeniden yazdığında zaman aşımını ConversationHandler
+    (conversation_timeout) yeniden başlatır.
+    """
+
+    def __init__(self, db_manager, store_data: PersistenceInput = None,
+                 update_interval: float = PERSISTENCE_UPDATE_INTERVAL, shared: bool = PERSISTENCE_SHARED,
+                 conversation_ttl: float = CONVERSATION_TIMEOUT):
+        super().__init__(store_data=store_data, update_interval=update_interval)
+        self.db = db_manager
+        self.shared = shared
+        self.conversation_ttl = conversation_ttl
+        # Yüklenmiş kayıtların sürümü ve son yazılan içeriğin özeti
+        self._versions = {'user': {}, 'chat': {}}
+        self._fingerprints = {}
+        self.stats_counters = defaultdict(int)
+
+    # --- Ortak yardımcılar ---
+
+    def _changed(self, key, payload: bytes) -> bool:
+        """İçerik son yazılandan farklı mı? (farklıysa özeti güncelle)"""
+        fingerprint = _fingerprint(payload)
+        if self._fingerprints.get(key) == fingerprint:
+            self.stats_counters['skipped'] += 1
+            return False
+        self._fingerprints[key] = fingerprint
+        return True
+
+    async def _load_scoped(self, scope: str, key_id: int, target: dict):
+        """Kullanıcı/sohbet verisini gerekirse veritabanından yükleyip sözlüğe yerleştir"""
+        versions = self._versions[scope]
+        known = versions.get(key_id)
+        if known is not None and not self.shared:
+            return
+
+        table, column = _SCOPES[scope]
+        try:
+            async with self.db.connection() as conn:
+                row = (await conn.execute(text(f"""
+                    SELECT data, version FROM {table}
+                    WHERE {column} = :key_id AND version <> :known
+                """), {"key_id": key_id, "known": known or 0})).fetchone()
+        except SQLAlchemyError as e:
+            logger.error(f"Persistence okuma DB hatası ({scope} {key_id}): {str(e)}")
+            return
+
+        if row is None:
+            # Kayıt yok veya bilinen sürümle aynı
+            versions.setdefault(key_id, 0)
+            return
+
+        payload, version = bytes(row[0]), row[1]
+        target.clear()
+        target.update(pickle.loads(payload))
+        versions[key_id] = version
+        self._fingerprints[(scope, key_id)] = _fingerprint(payload)
+        self.stats_counters['loaded'] += 1
+
+    async def _store_scoped(self, scope: str, key_id: int, data: dict):
+        """Kullanıcı/sohbet verisini (değiştiyse) tek satırlık upsert ile yaz"""
+        payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        if not self._changed((scope, key_id), payload):
+            return
+
+        table, column = _SCOPES[scope]
+        try:
+            async with self.db.connection() as conn:
+                version = (await conn.execute(text(f"""
+                    INSERT INTO {table} ({column}, data)
+                    VALUES (:key_id, :data)
+                    ON CONFLICT ({column}) DO UPDATE
+                    SET data = EXCLUDED.data,
+                        version = {table}.version + 1,
+                        updated_at = CURRENT_TIMESTAMP
+                    RETURNING version
+                """), {"key_id": key_id, "data": payload})).scalar()
+                await conn.commit()
+            self._versions[scope][key_id] = version
+            self.stats_counters['written'] += 1
+        except SQLAlchemyError as e:
+            # Bir sonraki turda tekrar denensin
+            self._fingerprints.pop((scope, key_id), None)
+            logger.error(f"Persistence yazma DB hatası ({scope} {key_id}): {str(e)}")
+
+    async def _drop_scoped(self, scope: str, key_id: int):
+        table, column = _SCOPES[scope]
+        try:
+            async with self.db.connection() as conn:
+                await conn.execute(text(f"DELETE FROM {table} WHERE {column} = :key_id"), {"key_id": key_id})
+                await conn.commit()
+        except SQLAlchemyError as e:
+            logger.error(f"Persistence silme DB hatası ({scope} {key_id}): {str(e)}")
+        self._versions[scope].pop(key_id, None)
+        self._fingerprints.pop((scope, key_id), None)
+
+    async def _get_singleton(self, name: str):
+        try:
+            async with self.db.connection() as conn:
+                payload = (await conn.execute(text("""
+                    SELECT data FROM persistence_singletons WHERE name = :name
+                """), {"name": name})).scalar()
+        except SQLAlchemyError as e:
+            logger.error(f"Persistence okuma DB hatası ({name}): {str(e)}")
+            return None
+        if payload is None:
+            return None
+        payload = bytes(payload)
+        self._fingerprints[name] = _fingerprint(payload)
+        return pickle.loads(payload)
+
+    async def _store_singleton(self, name: str, data):
+        payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        if not self._changed(name, payload):
+            return
+        try:
+            async with self.db.connection() as conn:
+                await conn.execute(text("""
+                    INSERT INTO persistence_singletons (name, data)
+                    VALUES (:name, :data)
+                    ON CONFLICT (name) DO UPDATE
+                    SET data = EXCLUDED.data, updated_at = CURRENT_TIMESTAMP
+                """), {"name": name, "data": payload})
+                await conn.commit()
+            self.stats_counters['written'] += 1
+        except SQLAlchemyError as e:
+            self._fingerprints.pop(name, None)
+            logger.error(f"Persistence yazma DB hatası ({name}): {str(e)}")
+
+    # --- Kullanıcı ve sohbet verisi (tembel yükleme) ---
+
+    async def get_user_data(self) -> Dict[int, dict]:
+        # Toplu yükleme yok; refresh_user_data ilk güncellemede yükler
+        return {}
+
+    async def get_chat_data(self) -> Dict[int, dict]:
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        await self._load_scoped('user', user_id, user_data)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        await self._load_scoped('chat', chat_id, chat_data)
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        await self._store_scoped('user', user_id, data)
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        await self._store_scoped('chat', chat_id, data)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        await self._drop_scoped('user', user_id)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        await self._drop_scoped('chat', chat_id)
+
+    # --- Bot verisi ve callback verisi ---
+
+    async def get_bot_data(self) -> dict:
+        return await self._get_singleton('bot_data') or {}
+
+    async def update_bot_data(self, data: dict) -> None:
+        await self._store_singleton('bot_data', data)
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        # Bot verisi süreç başında okunur; her güncellemede yeniden okunmaz
+        pass
+
+    async def get_callback_data(self) -> Optional[Tuple[list, dict]]:
+        return await self._get_singleton('callback_data')
+
+    async def update_callback_data(self, data: Tuple[list, dict]) -> None:
+        await self._store_singleton('callback_data', data)
+
+    # --- Konuşma durumları ---
+
+    async def get_conversations(self, name: str) -> dict:
+        try:
+            async with self.db.connection() as conn:
+                # Zaman aşımına uğramış konuşmalar geri yüklenmez
+                rows = (await conn.execute(text("""
+                    SELECT key, state FROM persistence_conversations
+                    WHERE name = :name
+                    AND (cast(:ttl as double precision) <= 0
+                         OR updated_at >= CURRENT_TIMESTAMP - make_interval(secs => cast(:ttl as double precision)))
+                """), {"name": name, "ttl": float(self.conversation_ttl or 0)})).fetchall()
+        except SQLAlchemyError as e:
+            logger.error(f"Persistence konuşma okuma DB hatası ({name}): {str(e)}")
+            return {}
+        return {tuple(json.loads(key)): pickle.loads(bytes(state)) for key, state in rows}
+
+    async def update_conversation(self, name: str, key: tuple, new_state: Optional[object]) -> None:
+        encoded_key = json.dumps(list(key))
+        try:
+            async with self.db.connection() as conn:
+                if new_state is None:
+                    await conn.execute(text("""
+                        DELETE FROM persistence_conversations WHERE name = :name AND key = :key
+                    """), {"name": name, "key": encoded_key})
+                else:
+                    await conn.execute(text("""
+                        INSERT INTO persistence_conversations (name, key, state)
+                        VALUES (:name, :key, :state)
+                        ON CONFLICT (name, key) DO UPDATE
+                        SET state = EXCLUDED.state, updated_at = CURRENT_TIMESTAMP
+                    """), {
+                        "name": name,
+                        "key": encoded_key,
+                        "state": pickle.dumps(new_state, protocol=pickle.HIGHEST_PROTOCOL)
+                    })
+                await conn.commit()
+            self.stats_counters['written'] += 1
+        except SQLAlchemyError as e:
+            logger.error(f"Persistence konuşma yazma DB hatası ({name}): {str(e)}")
+
+    async def compact(self, max_age: float) -> dict:
+        """max_age saniyedir yazılmayan kullanıcı/sohbet verisini ve eski konuşmaları sil"""
+        removed = {}
+        statements = (
+            ('user_data', "DELETE FROM persistence_user_data WHERE updated_at < CURRENT_TIMESTAMP - make_interval(secs => :max_age)", max_age),
+            ('chat_data', "DELETE FROM persistence_chat_data WHERE updated_at < CURRENT_TIMESTAMP - make_interval(secs => :max_age)", max_age),
+            ('conversations', "DELETE FROM persistence_conversations WHERE updated_at < CURRENT_TIMESTAMP - make_interval(secs => :max_age)",
+             self.conversation_ttl or max_age),
+        )
+        try:
+            async with self.db.connection() as conn:
+                for name, statement, age in statements:
+                    removed[name] = (await conn.execute(text(statement), {"max_age": float(age)})).rowcount
+                await conn.commit()
+        except SQLAlchemyError as e:
+            logger.error(f"Persistence sıkıştırma DB hatası: {str(e)}")
+            return {}
+        
+        # Silinen kayıtların sürüm/özet bilgisini de bırak (bir sonraki erişimde yeniden yüklenir)
+        if removed.get('user_data') or removed.get('chat_data'):
+            self._versions = {'user': {}, 'chat': {}}
+            self._fingerprints = {
+                key: value for key, value in self._fingerprints.items() if not isinstance(key, tuple)
+            }
+        return removed
+
+    async def flush(self) -> None:
+        # Tüm yazımlar update_* çağrılarında anında yapılır; bekleyen veri yok
+        logger.info(f"Persistence kapatılıyor: {dict(self.stats_counters)}")
+
+    def get_stats(self) -> dict:
+        """Yükleme ve yazma sayaçları"""
+        return {key: self.stats_counters[key] for key in ('loaded', 'written', 'skipped')}
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    logger, SLOW_QUERY_MS, SLOW_QUERY_EXPLAIN, SLOW_QUERY_EXPLAIN_INTERVAL, SLOW_QUERY_EXPLAIN_TIMEOUT
+)
+from sqlalchemy import event, text
+from sqlalchemy.sql.elements import TextClause
+from bot.utils.metrics import current_db_method, QUERY_LATENCY, SLOW_QUERIES
+
+# Aynı anda kuyrukta bekleyebilecek en fazla EXPLAIN işi
+MAX_PENDING_EXPLAINS = 2
+# Loglanan SQL metninin en fazla uzunluğu
+MAX_LOGGED_SQL = 500
+
+
+class QueryMonitor:
+    """SQL ifadelerinin süresini ölçen ve yavaş sorguları loglayan SQLAlchemy olay dinleyicisi
+
+    Her ifade, o sırada çalışan DatabaseManager metoduna (current_db_method)
+    atfedilerek metrik olarak kaydedilir. `threshold_ms` üzerindeki ifadeler
+    loglanır; `explain` açıksa SELECT sorgularının planı ayrı bir thread'de,
+    salt okunur bir işlemde `EXPLAIN (ANALYZE, BUFFERS)` ile alınıp loglanır.
+    Aynı sorgu için plan en fazla `explain_interval` saniyede bir alınır.
+    Parametre değerleri (şifreleme anahtarı içerebilir) hiçbir zaman loglanmaz.
+    """
+
+    def __init__(self, explain_engine=None, threshold_ms: float = SLOW_QUERY_MS,
+                 explain: bool = SLOW_QUERY_EXPLAIN, explain_interval: float = SLOW_QUERY_EXPLAIN_INTERVAL,
+                 explain_timeout: float = SLOW_QUERY_EXPLAIN_TIMEOUT):
+        self.explain_engine = explain_engine
+        self.threshold_ms = threshold_ms
+        self.explain = explain and explain_engine is not None
+        self.explain_interval = explain_interval
+        self.explain_timeout = explain_timeout
+        self._executor = None
+        self._pending = 0
+        self._explained_at = {}
+        self._lock = threading.Lock()
+        # EXPLAIN thread'inin kendi sorguları tekrar yavaş sorgu olarak işlenmez
+        self._local = threading.local()
+        self.stats_counters = defaultdict(int)
+        self.max_ms = 0.0
+
+    def attach(self, engine):
+        """Senkron engine'e (async engine için sync_engine) olay dinleyicilerini ekle"""
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_query_started', None)
+        if started is None or getattr(self._local, 'explaining', False):
+            return
+        elapsed = time.perf_counter() - started
+        method = current_db_method.get() or '-'
+        QUERY_LATENCY.observe(elapsed, method=method)
+
+        elapsed_ms = elapsed * 1000
+        self.stats_counters['queries'] += 1
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        if self.threshold_ms <= 0 or elapsed_ms < self.threshold_ms:
+            return
+
+        self.stats_counters['slow'] += 1
+        SLOW_QUERIES.inc(method=method)
+        logger.warning(f"Yavaş sorgu ({method}, {elapsed_ms:.0f} ms): {' '.join(statement.split())[:MAX_LOGGED_SQL]}")
+        if self.explain:
+            self._schedule_explain(method, context)
+
+    def _schedule_explain(self, method: str, context):
+        """Sorgu planını (örnekleyerek) arka plan thread'inde al"""
+        clause = getattr(context, 'invoked_statement', None)
+        if not isinstance(clause, TextClause) or not context.compiled_parameters:
+            return
+        sql = clause.text.strip()
+        # ANALYZE sorguyu çalıştırır; yalnızca okuma sorgularının planı alınır
+        if sql.split(None, 1)[0].upper() not in ('SELECT', 'WITH'):
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            if self._pending >= MAX_PENDING_EXPLAINS:
+                return
+            if now - self._explained_at.get(sql, float('-inf')) < self.explain_interval:
+                return
+            self._explained_at[sql] = now
+            self._pending += 1
+
+            # Sorgular birden çok thread'den (to_thread, rapor) gelir; havuz kilit altında tek kez oluşturulur
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='explain')
+            self._executor.submit(self._explain, method, sql, dict(context.compiled_parameters[0]))
+
+    def _explain(self, method: str, sql: str, params: dict):
+        self._local.explaining = True
+        try:
+            with self.explain_engine.connect() as conn:
+                # WITH sorguları veri değiştirebilir; salt okunur işlem bunu engeller
+                conn.execute(text("SET TRANSACTION READ ONLY"))
+                conn.execute(text(f"SET LOCAL statement_timeout = {int(self.explain_timeout * 1000)}"))
+                rows = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"), params).fetchall()
+                conn.rollback()
+            plan = '\n'.join(row[0] for row in rows)
+            self.stats_counters['explained'] += 1
+            logger.warning(f"Yavaş sorgu planı ({method}):\n{plan}")
+        except Exception as e:
+            logger.error(f"EXPLAIN hatası ({method}): {str(e)}")
+        finally:
+            self._local.explaining = False
+            with self._lock:
+                self._pending -= 1
+
+    def get_stats(self) -> dict:
+        """Sorgu sayısı, yavaş sorgu sayısı ve en uzun süre"""
+        return {
+            'queries': self.stats_counters['queries'],
+            'slow': self.stats_counters['slow'],
+            'explained': self.stats_counters['explained'],
+            'threshold_ms': self.threshold_ms,
+            'max_ms': self.max_ms
+        }
+
+    def shutdown(self):
+        """EXPLAIN thread'ini durdur"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
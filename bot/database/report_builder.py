@@ -0,0 +1,244 @@
+import io
+import os
+import pickle
+import tempfile
+from datetime import datetime, timedelta
+from bot.config import logger
+from bot.database.keys import require_encryption_key
+from sqlalchemy import text
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill, Font, Alignment
+from openpyxl.utils import get_column_letter
+
+# Sunucu tarafı imleçten tek seferde okunacak satır sayısı
+REPORT_CHUNK_SIZE = int(os.getenv('REPORT_CHUNK_SIZE', '1000'))
+
+# Stil tanımlamaları (tüm satırlar aynı nesneleri paylaşır)
+HEADER_FILL = PatternFill(start_color='1A237E', end_color='1A237E', fill_type='solid')  # Koyu lacivert başlık
+HEADER_FONT = Font(bold=True, color='FFFFFF')  # Beyaz yazı
+CENTER_ALIGN = Alignment(horizontal='center')
+
+# Satır renkleri (daha yoğun pastel tonlar)
+ROW_FILLS = [
+    PatternFill(start_color=color, end_color=color, fill_type='solid')
+    for color in (
+        'E3EEFF',  # Yoğun açık mavi
+        'FFE6E3',  # Yoğun açık somon
+        'E3FFEB',  # Yoğun açık mint
+        'FFF0E3',  # Yoğun açık şeftali
+    )
+]
+
+# Sabit sütun genişlikleri
+FORM_NO_WIDTH = 8
+DATE_WIDTH = 19
+
+
+def _cell(ws, value, fill=None, font=None, alignment=None):
+    """Stilli write-only hücre oluştur"""
+    cell = WriteOnlyCell(ws, value=value)
+    if fill is not None:
+        cell.fill = fill
+    if font is not None:
+        cell.font = font
+    if alignment is not None:
+        cell.alignment = alignment
+    return cell
+
+
+def _row_values(submission, field_count):
+    """Gönderiyi [Form No, alanlar..., Tarih, fazlalar...] satırına çevir"""
+    data = list(submission[0] or [])
+    values = data[:field_count] + [None] * (field_count - len(data))
+    return [submission[2]] + values + [submission[1]] + data[field_count:]
+
+
+def _track_lengths(max_lengths, rows):
+    """Satırlardaki değer uzunluklarıyla sütun başına en uzun değeri güncelle"""
+    for row in rows:
+        for idx, value in enumerate(row):
+            if value is None:
+                continue
+            length = len(str(value))
+            if idx >= len(max_lengths):
+                max_lengths.append(length)
+            elif length > max_lengths[idx]:
+                max_lengths[idx] = length
+
+
+def _column_widths(headers, max_lengths):
+    """En uzun değer uzunluklarından sütun genişliklerini hesapla"""
+    widths = [min(max(length + 2, 10), 50) for length in max_lengths]
+    widths[0] = FORM_NO_WIDTH
+    widths[len(headers) - 1] = DATE_WIDTH
+    return widths
+
+
+def _spooled_rows(spool):
+    """Geçici dosyaya yazılmış satır parçalarını sırayla geri oku"""
+    spool.seek(0)
+    while True:
+        try:
+            rows = pickle.load(spool)
+        except EOFError:
+            return
+        yield from rows
+
+
+def build_report(conn, form_name: str, admin_id: int = None,
+                 start_date: datetime = None, end_date: datetime = None,
+                 is_super_admin: bool = False, encryption_key: str = None,
+                 chunk_size: int = REPORT_CHUNK_SIZE) -> io.BytesIO:
+    """Form verilerini sunucu tarafı imleçle parça parça okuyup write-only Excel raporu oluştur
+
+    Bellek kullanımı rapor boyutundan bağımsızdır: satırlar parçalar halinde
+    okunur ve openpyxl'in write-only çalışma kitabına akıtılır. Write-only
+    sayfada sütun genişlikleri ilk satırdan önce yazılması gerektiğinden
+    parçalar önce geçici dosyaya alınır ve tüm satırların en uzun değerleri
+    hesaplanır; ardından satırlar bu dosyadan okunarak sayfaya yazılır.
+    """
+    if encryption_key is None:
+        encryption_key = require_encryption_key()
+
+    # Form şablonunu al
+    if is_super_admin:
+        # Süper admin tüm formları görebilir
+        cursor = conn.execute(text("""
+            SELECT fields FROM forms
+            WHERE form_name = :form_name
+        """), {"form_name": form_name})
+    else:
+        # Normal admin sadece kendi formlarını görebilir
+        cursor = conn.execute(text("""
+            SELECT fields FROM forms
+            WHERE form_name = :form_name AND created_by = :admin_id
+        """), {"form_name": form_name, "admin_id": admin_id})
+
+    form = cursor.fetchone()
+    if not form:
+        logger.error(f"Form bulunamadı: {form_name}")
+        return None
+
+    fields = form[0].split(',')
+
+    # Verileri al - parametreli sorgu kullan
+    # Değerler alan bazında çözülür; tüm veriyi tutan data yalnızca alan değerleri
+    # henüz doldurulmamış (backfill_hashes çalıştırılmamış) eski kayıtlarda okunur
+    base_query = """
+        SELECT CASE WHEN fs.data IS NULL THEN vals.value_list
+                    ELSE string_to_array(cast(pgp_sym_decrypt(cast(fs.data as bytea), cast(:encryption_key as text)) as text), E'\n')
+               END,
+               fs.created_at, fs.id
+        FROM form_submissions fs
+        LEFT JOIN LATERAL (
+            SELECT array_agg(cast(pgp_sym_decrypt(v.value, cast(:encryption_key as text)) as text)
+                             ORDER BY v.field_index) AS value_list
+            FROM submission_values v
+            WHERE v.submission_id = fs.id AND fs.data IS NULL
+        ) vals ON TRUE
+    """
+
+    params = {"encryption_key": encryption_key, "form_name": form_name}
+
+    if is_super_admin:
+        # Süper admin tüm verileri görebilir
+        query = base_query + " WHERE fs.form_name = :form_name"
+    else:
+        # Normal admin sadece kendi formlarının verilerini görebilir
+        query = base_query + """
+            JOIN forms f ON fs.form_name = f.form_name AND fs.group_id = f.group_id
+            WHERE fs.form_name = :form_name AND f.created_by = :admin_id
+        """
+        params["admin_id"] = admin_id
+
+    # Tarih filtrelemesi: indeks kullanılabilsin diye yarı açık aralık [başlangıç, bitiş)
+    range_start = range_end = None
+    if not start_date and not end_date:
+        range_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        range_end = range_start + timedelta(days=1)
+    elif start_date and end_date:
+        range_start = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        range_end = end_date.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    
+    if range_start is not None:
+        query += " AND fs.created_at >= :start_date AND fs.created_at < :end_date"
+        params["start_date"] = range_start
+        params["end_date"] = range_end
+
+    query += " ORDER BY fs.id ASC"
+
+    # Sunucu tarafı imleç: satırlar chunk_size'lık parçalar halinde gelir
+    result = conn.execution_options(stream_results=True, max_row_buffer=chunk_size).execute(text(query), params)
+    partitions = result.partitions(chunk_size)
+
+    headers = ['Form No'] + fields + ['Tarih']
+    field_count = len(fields)
+    max_lengths = [len(str(header)) for header in headers]
+    row_count = 0
+
+    with tempfile.TemporaryFile() as spool:
+        # İlk geçiş: satırları geçici dosyaya yaz, sütunların en uzun değerlerini izle
+        for chunk in partitions:
+            rows = [_row_values(submission, field_count) for submission in chunk]
+            _track_lengths(max_lengths, rows)
+            pickle.dump(rows, spool, protocol=pickle.HIGHEST_PROTOCOL)
+            row_count += len(rows)
+
+        if not row_count:
+            logger.error("Veri bulunamadı")
+            return None
+
+        # Excel dosyası oluştur (write-only: satırlar geçici dosyaya akıtılır)
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(title=form_name)
+
+        # Sütun genişliklerini ayarla (ilk satırdan önce yazılmalı)
+        for idx, width in enumerate(_column_widths(headers, max_lengths), 1):
+            ws.column_dimensions[get_column_letter(idx)].width = width
+
+        # Başlıkları ekle
+        ws.append([_cell(ws, header, HEADER_FILL, HEADER_FONT, CENTER_ALIGN) for header in headers])
+
+        # İkinci geçiş: satırları geçici dosyadan okuyup sayfaya yaz
+        date_index = len(headers) - 1
+        for row_index, row in enumerate(_spooled_rows(spool)):
+            row_fill = ROW_FILLS[row_index % len(ROW_FILLS)]
+            ws.append([
+                _cell(ws, value, row_fill, alignment=CENTER_ALIGN if idx in (0, date_index) else None)
+                for idx, value in enumerate(row)
+            ])
+
+        # Excel dosyasını kaydet
+        excel_file = io.BytesIO()
+        wb.save(excel_file)
+        excel_file.seek(0)
+
+    logger.info(f"Rapor oluşturuldu: {form_name}, {row_count} satır")
+    return excel_file
+
+
+# İşçi süreç başına tek bağlantılık engine (süreç ilk işte oluşturur)
+_worker_engine = None
+
+
+def run_report_job(database_url: str, form_name: str, admin_id: int = None,
+                   start_date: datetime = None, end_date: datetime = None,
+                   is_super_admin: bool = False) -> bytes:
+    """Rapor işçi sürecinde çalışan iş; raporu oluşturup dosya içeriğini döndürür"""
+    global _worker_engine
+    if _worker_engine is None:
+        from sqlalchemy import create_engine
+        _worker_engine = create_engine(database_url, pool_pre_ping=True, pool_size=1, max_overflow=0)
+
+    with _worker_engine.connect() as conn:
+        excel_file = build_report(
+            conn,
+            form_name=form_name,
+            admin_id=admin_id,
+            start_date=start_date,
+            end_date=end_date,
+            is_super_admin=is_super_admin
+        )
+
+    return excel_file.getvalue() if excel_file else None
@@ -1,4 +1,5 @@
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ConversationHandler, CallbackQueryHandler
+from telegram import Update
+from telegram.ext import Application, CommandHandler, MessageHandler, TypeHandler, filters, ConversationHandler, CallbackQueryHandler
 from .admin_handlers import AdminHandlers
 from .user_handlers import UserHandlers, WAITING_AMOUNT
 from .form_handlers import (
@@ -7,13 +8,24 @@ from .form_handlers import (
     WAITING_CONFIRMATION,
     WAITING_DEKONT
 )
-from bot.database.db_manager import DatabaseManager
+from bot.database.db_manager import DatabaseManager, get_database_manager
+from bot.utils.user_profiles import get_user_profiles
+from bot.utils.dispatcher import get_notification_dispatcher
+from bot.utils.state_janitor import StateJanitor
+from bot.utils.metrics import instrument_handlers
+from bot.config import logger, PAYMENT_POLL_INTERVAL, RECEIPT_UPLOAD_INTERVAL, CONVERSATION_TIMEOUT, COMPACTION_INTERVAL
 
-def setup_handlers(app: Application):
-    db_manager = DatabaseManager()
+def setup_handlers(app: Application, db_manager: DatabaseManager = None) -> dict:
+    # Tüm handler'lar aynı DatabaseManager'ı (ve bağlantı havuzunu) paylaşır
+    db_manager = db_manager or get_database_manager()
     admin_handlers = AdminHandlers(db_manager)
-    user_handlers = UserHandlers()
-    form_handlers = FormHandlers()
+    # Ödeme akışları Telegram isteklerinde uygulamanın bot örneğini kullanır
+    profiles = get_user_profiles()
+    profiles.bind(app.bot)
+    notifier = get_notification_dispatcher()
+    notifier.bind(app.bot)
+    user_handlers = UserHandlers(db_manager, profiles=profiles, notifier=notifier)
+    form_handlers = FormHandlers(db_manager)
 
     # Form ekleme conversation handler'ı
     form_conv_handler = ConversationHandler(
@@ -25,7 +37,9 @@ def setup_handlers(app: Application):
         },
         fallbacks=[CommandHandler('iptal', form_handlers.cancel)],
         allow_reentry=True,
-        name="form_add"
+        conversation_timeout=CONVERSATION_TIMEOUT,
+        name="form_add",
+        persistent=True
     )
 
     # Form veri girişi conversation handler'ı
@@ -51,7 +65,9 @@ def setup_handlers(app: Application):
             CommandHandler('iptal', form_handlers.cancel)
         ],
         allow_reentry=True,
-        name="form_data"
+        conversation_timeout=CONVERSATION_TIMEOUT,
+        name="form_data",
+        persistent=True
     )
 
     # Bakiye yükleme conversation handler'ı
@@ -64,9 +80,15 @@ def setup_handlers(app: Application):
         },
         fallbacks=[CommandHandler('iptal', user_handlers.cancel_load_credits)],
         allow_reentry=True,
-        name="load_credits"
+        conversation_timeout=CONVERSATION_TIMEOUT,
+        name="load_credits",
+        persistent=True
     )
 
+    # Her güncellemeden önce kullanıcı/sohbetin son görülme zamanını kaydet
+    janitor = StateJanitor()
+    app.add_handler(TypeHandler(Update, janitor.touch), group=-1)
+
     # Önce conversation handler'ları ekle
     app.add_handler(form_conv_handler)
     app.add_handler(form_data_handler)
@@ -86,6 +108,7 @@ def setup_handlers(app: Application):
     app.add_handler(CommandHandler('adminekle', admin_handlers.add_admin))
     app.add_handler(CommandHandler('adminsil', admin_handlers.remove_admin))
     app.add_handler(CommandHandler('adminler', admin_handlers.list_admins))
+    app.add_handler(CommandHandler('havuz', admin_handlers.pool_stats))
     app.add_handler(CommandHandler('gruplar', user_handlers.list_groups))
     
     # Grup yönetim komutları
@@ -97,4 +120,39 @@ def setup_handlers(app: Application):
     app.add_handler(CommandHandler('formlar', form_handlers.list_forms))
     app.add_handler(CommandHandler('formekle', form_handlers.add_application))
     app.add_handler(CommandHandler('formsil', form_handlers.delete_form))
-    app.add_handler(CommandHandler('rapor', form_handlers.get_report)) 
\ No newline at end of file
+    app.add_handler(CommandHandler('rapor', form_handlers.get_report))
+    app.add_handler(CommandHandler('ara', form_handlers.search_submissions))
+
+    # Tüm handler'ların çalışma süresi /metrics üzerinden izlenir
+    instrument_handlers(app)
+
+    # Bekleyen tüm ödemeleri tek bir zamanlayıcı sorgular
+    if app.job_queue:
+        app.job_queue.run_repeating(
+            user_handlers.poll_pending_payments,
+            interval=PAYMENT_POLL_INTERVAL,
+            first=PAYMENT_POLL_INTERVAL,
+            name="payment_poller"
+        )
+        # Dokunulmayan user_data/chat_data ve eski konuşmaları temizler
+        app.job_queue.run_repeating(
+            janitor.compact,
+            interval=COMPACTION_INTERVAL,
+            first=COMPACTION_INTERVAL,
+            name="state_compaction"
+        )
+        # Kuyrukta kalan / başarısız dekont yüklemelerini tekrar dener
+        app.job_queue.run_repeating(
+            form_handlers.process_receipt_uploads,
+            interval=RECEIPT_UPLOAD_INTERVAL,
+            first=RECEIPT_UPLOAD_INTERVAL,
+            name="receipt_uploader"
+        )
+    else:
+        logger.warning("JobQueue bulunamadı, bekleyen ödemeler yalnızca IPN ile güncellenecek ve dekontlar yüklenmeyecek")
+
+    return {
+        'admin': admin_handlers,
+        'user': user_handlers,
+        'form': form_handlers
+    }
@@ -1,8 +1,12 @@
 from telegram import Update
 from telegram.ext import ContextTypes
+from sqlalchemy.exc import SQLAlchemyError
 from bot.config import SUPER_ADMIN_ID, logger
 from bot.database.db_manager import DatabaseManager
 from bot.utils.decorators import super_admin_required
+from bot.utils.dispatcher import get_notification_dispatcher
+from bot.utils.imgbb import get_imgbb_uploader
+from bot.utils.loop_monitor import get_loop_monitor
 
 class AdminHandlers:
     def __init__(self, db_manager: DatabaseManager):
@@ -51,12 +55,9 @@ class AdminHandlers:
             usage_rights = miktar_tl / 10.0
             
             # Bakiye ekle
-            success = await self.db.Bakiye_ekle(admin_id, usage_rights)
+            current_balance = await self.db.bakiye_yukle(admin_id, usage_rights)
             
-            if success:
-                # Güncel bakiyeyi al
-                current_balance = await self.db.bakiye_getir(admin_id)
-                
+            if current_balance is not None:
                 await update.message.reply_text(
                     f"✅ Admin bakiyesi güncellendi!\n\n"
                     f"👤 Admin ID: {admin_id}\n"
@@ -109,24 +110,14 @@ class AdminHandlers:
                 await update.message.reply_text(f"⛔️ {admin_id} ID'li bir admin bulunamadı!")
                 return
             
-            # Mevcut bakiyeyi kontrol et
-            current_balance = await self.db.bakiye_getir(admin_id)
-            if current_balance < usage_rights:
-                await update.message.reply_text(
-                    f"⛔️ Yetersiz kullanım hakkı!\n\n"
-                    f"👤 Admin ID: {admin_id}\n"
-                    f"💰 Mevcut Kullanım Hakkı: {current_balance}\n"
-                    f"💸 Silinmek İstenen: {usage_rights}"
-                )
+            # Bakiye sil (yetersizse hiçbir şey değişmez, DB hatası fırlatılır)
+            try:
+                new_balance = await self.db.bakiye_dus(admin_id, usage_rights)
+            except (SQLAlchemyError, ValueError):
+                await update.message.reply_text("⛔️ Bakiye silinirken veritabanı hatası oluştu, bakiye değişmedi!")
                 return
             
-            # Bakiye sil
-            success = await self.db.Bakiye_sil(admin_id, usage_rights)
-            
-            if success:
-                # Güncel bakiyeyi al
-                new_balance = await self.db.bakiye_getir(admin_id)
-                
+            if new_balance is not None:
                 await update.message.reply_text(
                     f"✅ Admin bakiyesi güncellendi!\n\n"
                     f"👤 Admin ID: {admin_id}\n"
@@ -134,7 +125,14 @@ class AdminHandlers:
                     f"💵 Güncel Kullanım Hakkı: {new_balance}"
                 )
             else:
-                await update.message.reply_text("⛔️ Bakiye silinirken bir hata oluştu!")
+                # Yetersiz bakiye mesajı için mevcut bakiyeyi al
+                current_balance = await self.db.bakiye_getir(admin_id)
+                await update.message.reply_text(
+                    f"⛔️ Yetersiz kullanım hakkı!\n\n"
+                    f"👤 Admin ID: {admin_id}\n"
+                    f"💰 Mevcut Kullanım Hakkı: {current_balance}\n"
+                    f"💸 Silinmek İstenen: {usage_rights}"
+                )
                 
         except Exception as e:
             logger.error(f"Bakiye silme hatası: {str(e)}")
@@ -248,6 +246,50 @@ class AdminHandlers:
             logger.error(f"Admin listeleme hatası: {str(e)}")
             await update.message.reply_text("⛔️ Bir hata oluştu!")
 
+    @super_admin_required
+    async def pool_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Veritabanı bağlantı havuzu istatistiklerini göster"""
+        try:
+            stats = self.db.get_pool_stats()
+            cache_stats = self.db.get_cache_stats()
+            notify_stats = get_notification_dispatcher().get_stats()
+            upload_stats = get_imgbb_uploader().get_stats()
+            query_stats = self.db.query_monitor.get_stats()
+            loop_stats = get_loop_monitor().get_stats()
+            
+            await update.message.reply_text(
+                f"🗄 Veritabanı Bağlantı Havuzu\n\n"
+                f"📦 Havuz Boyutu: {stats['pool_size']}\n"
+                f"🔌 Kullanımda: {stats['checked_out']}\n"
+                f"💤 Boşta: {stats['checked_in']}\n"
+                f"➕ Taşma: {stats['overflow']}/{stats['max_overflow']}\n"
+                f"🔁 Senkron Kullanımda: {stats['sync_checked_out']}\n"
+                f"🔢 En Fazla Bağlantı: {stats['max_connections']}\n\n"
+                f"⏱ Bağlantı Alma: {stats['acquisitions']} kez\n"
+                f"⏳ Ortalama Bekleme: {stats['avg_wait_ms']:.1f} ms\n"
+                f"⌛️ En Uzun Bekleme: {stats['max_wait_ms']:.1f} ms\n\n"
+                f"🧮 SQL Sorgusu: {query_stats['queries']} | En Uzun: {query_stats['max_ms']:.0f} ms\n"
+                f"🐌 Yavaş Sorgu (>{query_stats['threshold_ms']:.0f} ms): {query_stats['slow']} "
+                f"| Plan: {query_stats['explained']}\n\n"
+                f"🔄 Event Loop Gecikmesi: ort. {loop_stats['avg_lag_ms']:.1f} ms | En Uzun: {loop_stats['max_lag_ms']:.0f} ms\n"
+                f"🚧 Gecikme Uyarısı: {loop_stats['lagged']} | Bloklanma: {loop_stats['blocked']}\n\n"
+                f"🔐 Yetki Önbelleği: {cache_stats['size']}/{cache_stats['maxsize']} kayıt\n"
+                f"🎯 İsabet: {cache_stats['hits']} | Iska: {cache_stats['misses']} "
+                f"(%{cache_stats['hit_rate']:.1f})\n\n"
+                f"📨 Bildirim Kuyruğu: {notify_stats['queue_depth']}/{notify_stats['queue_size']}\n"
+                f"✅ Gönderilen: {notify_stats['sent']} | ⛔️ Başarısız: {notify_stats['failed']}\n"
+                f"🧾 Özet Mesaj: {notify_stats['digests']} ({notify_stats['merged']} birleştirme)\n"
+                f"🐢 Hız Sınırı Beklemesi: {notify_stats['throttled']} | 429: {notify_stats['retry_after']}\n\n"
+                f"🧾 Dekont Yükleme: {upload_stats['uploads']} | ⛔️ Başarısız: {upload_stats['failures']}\n"
+                f"📤 Devam Eden: {upload_stats['in_flight']} (en fazla {upload_stats['peak_in_flight']})\n"
+                f"⏱ Ortalama Süre: {upload_stats['avg_ms']:.0f} ms | En Uzun: {upload_stats['max_ms']:.0f} ms\n"
+                f"📦 Ortalama Boyut: {upload_stats['avg_bytes'] / 1024:.0f} KB | En Büyük: {upload_stats['max_bytes'] / 1024:.0f} KB"
+            )
+            
+        except Exception as e:
+            logger.error(f"Havuz istatistikleri hatası: {str(e)}")
+            await update.message.reply_text("⛔️ Bir hata oluştu!")
+
     @super_admin_required
     async def admin_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Admin komut işlemleri
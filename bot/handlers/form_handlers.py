@@ -1,15 +1,17 @@
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
-from bot.config import logger, SUPER_ADMIN_ID, IMGBB_API_KEY, IMGBB_UPLOAD_URL
+from bot.config import (
+    logger, SUPER_ADMIN_ID, IMGBB_API_KEY,
+    RECEIPT_UPLOAD_INTERVAL, RECEIPT_UPLOAD_BATCH, RECEIPT_UPLOAD_MAX_ATTEMPTS, RECEIPT_UPLOAD_LEASE
+)
 from bot.database.db_manager import DatabaseManager
 from bot.utils.decorators import super_admin_required, admin_required
+from bot.utils.report_pool import ReportBusyError
+from bot.utils.imgbb import ImgBBUploader, get_imgbb_uploader
+from bot.utils.receipt_store import ReceiptStore
 from functools import wraps
-from sqlalchemy import text
 from datetime import datetime
-import aiohttp
-import base64
-from io import BytesIO
-import json
+import asyncio
 
 def authorized_group_required(func):
     """Komutun sadece yetkili gruplarda çalışmasını sağlayan dekoratör"""
@@ -52,13 +54,25 @@ WAITING_FORM_FIELDS = 1
 WAITING_CONFIRMATION = 2
 WAITING_DEKONT = 3
 
+# Sabit form gönderim ücreti (1 kullanım hakkı)
+FORM_SUBMISSION_COST = 1.0
+
+# Dekont arka planda yüklenirken gönderiye yazılan geçici referansın öneki
+RECEIPT_PENDING_PREFIX = "dekont:bekliyor:"
+
+# /ara komutunun gösterdiği en fazla sonuç sayısı
+SEARCH_RESULT_LIMIT = 10
+
 class FormHandlers:
     """Form işlemleri için handler sınıfı"""
     
-    def __init__(self):
+    def __init__(self, db_manager: DatabaseManager, uploader: ImgBBUploader = None, receipts: ReceiptStore = None):
         """Initialize the FormHandlers class"""
-        self.db = DatabaseManager()
-        self.engine = self.db.engine
+        self.db = db_manager
+        # Dekontlar paylaşılan oturum üzerinden akış halinde yüklenir
+        self.uploader = uploader or get_imgbb_uploader()
+        # İçerik adresli dekont deposu (aynı dekont bir kez saklanır)
+        self.receipts = receipts or ReceiptStore(db_manager, uploader=self.uploader)
 
     @authorized_group_required
     @admin_required
@@ -252,8 +266,8 @@ class FormHandlers:
             group_id = update.effective_chat.id
             user_id = update.effective_user.id
             
-            # Formun bilgilerini al
-            form = await self.db.get_form(form_name)
+            # Formun bilgilerini al (önbellekten)
+            form = await self.db.get_form_definition(form_name, group_id)
             
             if not form:
                 await update.message.reply_text(
@@ -262,12 +276,8 @@ class FormHandlers:
                 )
                 return
 
-            # Form alanlarını kontrol et, son alanda "dekont" var mı?
-            fields = form['fields']
-            has_dekont = False
-            if fields and len(fields) > 0:
-                last_field = fields[-1].lower()
-                has_dekont = "dekont" in last_field
+            # Son alanda "dekont" var mı?
+            has_dekont = form['has_dekont']
 
             # Eğer komutla birlikte veriler gönderildiyse
             message_text = update.message.text.strip()
@@ -336,82 +346,24 @@ class FormHandlers:
                 # Dekont yoksa normal işleme devam et
                 form_data = "\n".join(data_lines)
                 
-                # Form için doğru grup ID'sini al
-                with self.engine.connect() as conn:
-                    result = conn.execute(text("""
-                        SELECT group_id, created_by FROM forms 
-                        WHERE form_name = :form_name
-                        LIMIT 1
-                    """), {"form_name": form_name})
-                    row = result.fetchone()
-                    if row:
-                        form_group_id = row[0]
-                        form_admin_id = row[1]
-                    else:
-                        logger.error(f"Form grup ID'si bulunamadı: {form_name}")
-                        await update.message.reply_text("⛔️ Form bilgisi alınırken bir hata oluştu!")
-                        return
-                
-                # Adminin bakiyesini kontrol et
-                has_credits = await self.check_and_deduct_admin_credits(form_admin_id, update.effective_chat.id)
-                
-                # Eğer bakiye yetersizse uyarı ver ve işlemi durdur
-                if not has_credits:
-                    await update.message.reply_text(
-                        "⛔️ Bu form için yeterli kullanım hakkı bulunmuyor!\n\n"
-                        "Form sahibi adminin bakiyesi yetersiz. Lütfen admin ile iletişime geçin."
-                    )
-                    return
-                
-                # Mükerrer kayıt kontrolü
-                is_duplicate = await self.db.check_duplicate_submission(
-                    form_name=form_name,
-                    group_id=form_group_id,
-                    data=form_data
-                )
-                
-                if is_duplicate:
-                    await update.message.reply_text(
-                        "⛔️ Bu form verisi excel tablosunda mevcut!"
-                    )
-                    return
-
                 # Dekont URL'i varsa form datasına ekle
                 if context.user_data.get('dekont_url'):
                     form_data = form_data + "\n" + context.user_data.get('dekont_url')
                 
-                submission_id = await self.db.save_form_data(
+                # Bakiye düşme, mükerrer kontrolü ve kayıt tek işlemde
+                submission = await self.db.submit_form(
                     form_name=form_name,
-                    group_id=form_group_id,
+                    group_id=form['group_id'],
                     user_id=update.effective_user.id,
                     chat_id=update.effective_chat.id,
-                    data=form_data
+                    data=form_data,
+                    cost=FORM_SUBMISSION_COST
                 )
+                submission_id = submission['submission_id']
 
                 if submission_id:
-                    # Güncel admin bakiyesini al
-                    admin_balance = await self.db.bakiye_getir(form_admin_id)
-                    
                     # İsim soyisim bilgisini bul
-                    name_surname = None
-                    data_lines = form_data.split('\n')
-                    
-                    # Form alanlarını al
-                    form_info = await self.db.get_form(form_name)
-                    if form_info and form_info['fields']:
-                        fields = form_info['fields']
-                        
-                        # İsim Soyisim, Ad Soyad, Adı Soyadı gibi alanları ara
-                        name_field_keywords = ['isim soyisim', 'ad soyad', 'adı soyadı', 'ad ve soyad']
-                        
-                        for i, field in enumerate(fields):
-                            if i < len(data_lines) and any(keyword in field.lower() for keyword in name_field_keywords):
-                                name_surname = data_lines[i]
-                                break
-                        
-                        # Eğer bulunamadıysa ve verinin ilk satırı genellikle isim-soyisim ise
-                        if not name_surname and len(data_lines) > 0:
-                            name_surname = data_lines[0]  # İlk satırı isim-soyisim olarak kullan
+                    name_surname = self._name_surname(form, form_data)
                     
                     # Başarı mesajını hazırla
                     success_message = f"✅ #{submission_id} Numaralı {form_name.capitalize()} Hesabı Excele işlendi. ✅\n"
@@ -433,7 +385,7 @@ class FormHandlers:
                     
                     await update.message.reply_text(success_message)
                 else:
-                    await update.message.reply_text("⛔️ Veriler kaydedilirken bir hata oluştu!")
+                    await self._reply_submission_failure(update, submission['status'])
                 
                 return
 
@@ -465,25 +417,30 @@ class FormHandlers:
             await update.message.reply_text("⛔️ Bir hata oluştu!")
             return ConversationHandler.END
 
-    async def check_and_deduct_admin_credits(self, admin_id: int, chat_id: int) -> bool:
-        """Admin bakiyesini kontrol et ve form gönderimi için Bakiye düş"""
-        try:
-            # Sabit form gönderim ücreti (1 kullanım hakkı)
-            FORM_SUBMISSION_COST = 1.0
-            
-            # Admin bakiyesini kontrol et
-            admin_balance = await self.db.bakiye_getir(admin_id)
-            
-            # Bakiye yetersizse False döndür
-            if admin_balance < FORM_SUBMISSION_COST:
-                return False
-                
-            # Bakiye yeterliyse Bakiyeyi düş
-            success = await self.db.Bakiye_sil(admin_id, FORM_SUBMISSION_COST)
-            return success
-        except Exception as e:
-            logger.error(f"Bakiye kontrolü hatası: {str(e)}")
-            return False 
+    @staticmethod
+    def _name_surname(form: dict, form_data: str):
+        """Form verisinden isim-soyisim satırını al"""
+        data_lines = form_data.split('\n')
+        index = form.get('name_field_index')
+        if index is not None and index < len(data_lines):
+            return data_lines[index]
+        return data_lines[0] if data_lines else None
+
+    async def _reply_submission_failure(self, update: Update, status: str):
+        """Başarısız form gönderimi için kullanıcıya uygun mesajı gönder"""
+        if status == 'insufficient_credits':
+            await update.message.reply_text(
+                "⛔️ Bu form için yeterli kullanım hakkı bulunmuyor!\n\n"
+                "Form sahibi adminin bakiyesi yetersiz. Lütfen admin ile iletişime geçin."
+            )
+        elif status == 'duplicate':
+            await update.message.reply_text(
+                "⛔️ Bu form verisi excel tablosunda mevcut!"
+            )
+        elif status == 'form_not_found':
+            await update.message.reply_text("⛔️ Form bilgisi alınırken bir hata oluştu!")
+        else:
+            await update.message.reply_text("⛔️ Veriler kaydedilirken bir hata oluştu!")
 
     @admin_required
     async def delete_form(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -578,9 +535,6 @@ class FormHandlers:
                     start_date = datetime.strptime(args[1], "%d.%m.%Y")
                     end_date = datetime.strptime(args[2], "%d.%m.%Y")
                     
-                    # Bitiş tarihi için saat 23:59:59'a ayarla
-                    end_date = end_date.replace(hour=23, minute=59, second=59)
-                    
                     logger.info(f"Tarih aralığı belirlendi: {start_date} - {end_date}")
                 except ValueError:
                     await update.message.reply_text(
@@ -590,14 +544,37 @@ class FormHandlers:
                     )
                     return
             
-            # Rapor oluştur
-            excel_file = await self.db.generate_report(
-                form_name=form_name,
-                admin_id=user_id,
-                start_date=start_date,
-                end_date=end_date,
-                is_super_admin=is_super_admin
-            )
+            # Önceki rapor hâlâ hazırlanıyorsa yeni iş başlatma
+            if self.db.report_pool is not None and self.db.report_pool.is_busy(user_id):
+                await update.message.reply_text(
+                    "⏳ Önceki raporunuz hâlâ hazırlanıyor. Lütfen tamamlanmasını bekleyin."
+                )
+                return
+            
+            # Hazırlanıyor mesajı
+            processing_message = await update.message.reply_text("⏳ Rapor hazırlanıyor, lütfen bekleyin...")
+            
+            # Rapor oluştur (işçi süreçte, diğer sohbetleri bekletmeden)
+            try:
+                excel_file = await self.db.generate_report(
+                    form_name=form_name,
+                    admin_id=user_id,
+                    start_date=start_date,
+                    end_date=end_date,
+                    is_super_admin=is_super_admin
+                )
+            except ReportBusyError:
+                await processing_message.delete()
+                await update.message.reply_text(
+                    "⏳ Önceki raporunuz hâlâ hazırlanıyor. Lütfen tamamlanmasını bekleyin."
+                )
+                return
+            
+            # Hazırlanıyor mesajını sil
+            try:
+                await processing_message.delete()
+            except Exception as e:
+                logger.warning(f"Rapor bekleme mesajı silinemedi: {str(e)}")
             
             if excel_file:
                 # Tarih bilgisi varsa dosya adına ekle
@@ -647,73 +624,110 @@ class FormHandlers:
             logger.error(f"Rapor oluşturma hatası: {str(e)}")
             await update.message.reply_text("⛔️ Bir hata oluştu!")
 
-    async def upload_image_to_imgbb(self, photo_file):
-        """ImgBB API'sine görsel yükle ve URL'i döndür"""
+    @authorized_group_required
+    @admin_required
+    async def search_submissions(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Formun aranabilir bir alanında değer ara"""
         try:
-            # Fotoğrafı indir
-            photo_data = await photo_file.download_as_bytearray()
+            args = context.args
+            if not args or len(args) < 3:
+                await update.message.reply_text(
+                    "⛔️ Hatalı format!\n\n"
+                    "📝 Doğru Kullanım:\n"
+                    "/ara form_adi alan değer\n\n"
+                    "Örnek:\n"
+                    "/ara yahoo isim Ahmet Yılmaz"
+                )
+                return
             
-            # Base64 kodlaması yap
-            base64_image = base64.b64encode(photo_data).decode('utf-8')
+            form_name = args[0].lower()
+            field_query = args[1]
+            value = " ".join(args[2:])
+            user_id = update.effective_user.id
+            is_super_admin = user_id == SUPER_ADMIN_ID
             
-            # API anahtarının tanımlı olup olmadığını kontrol et
-            if not IMGBB_API_KEY:
-                logger.error("ImgBB API anahtarı bulunamadı!")
-                return None
+            form = await self.db.get_form_definition(form_name, update.effective_chat.id)
+            if not form or (not is_super_admin and form['created_by'] != user_id):
+                await update.message.reply_text(f"⛔️ '{form_name}' formu bulunamadı!")
+                return
             
-            if not IMGBB_UPLOAD_URL:
-                logger.error("ImgBB API URL'i bulunamadı!")
-                return None
-                
-            logger.info(f"ImgBB yükleme başlatılıyor. Resim boyutu: {len(photo_data)} byte")
+            # Alan adı kısmi yazılabilir ("isim" → "İsim Soyisim"), yalnızca kör indeksli alanlar aranır
+            searchable = [form['fields'][i] for i in form['searchable_field_indexes']]
+            matches = [field for field in searchable if field_query.lower() in field.lower()]
+            if not matches:
+                await update.message.reply_text(
+                    f"⛔️ '{field_query}' alanında arama yapılamıyor!\n\n"
+                    "🔎 Aranabilir alanlar:\n" +
+                    ("\n".join(f"• {field}" for field in searchable) if searchable else "• Bu formda aranabilir alan yok")
+                )
+                return
+            field = matches[0]
+            
+            submissions = await self.db.get_form_submissions(
+                form_name,
+                field=field,
+                value=value,
+                admin_id=None if is_super_admin else user_id,
+                limit=SEARCH_RESULT_LIMIT,
+                field_count=len(form['fields'])
+            )
+            if not submissions:
+                await update.message.reply_text(f"🔎 '{field}' alanında '{value}' için kayıt bulunamadı.")
+                return
+            
+            lines = [f"🔎 {form_name.capitalize()} • {field}: {value}\n"]
+            for submission in submissions:
+                lines.append(f"#{submission['id']} • {submission['created_at'].strftime('%d.%m.%Y %H:%M')}")
+                for label, item in zip(form['fields'], submission['values'] or []):
+                    lines.append(f"{label}: {item}")
+                lines.append("")
+            if len(submissions) == SEARCH_RESULT_LIMIT:
+                lines.append(f"ℹ️ İlk {SEARCH_RESULT_LIMIT} sonuç gösteriliyor.")
+            
+            # Telegram mesaj sınırı
+            await update.message.reply_text("\n".join(lines).strip()[:4096])
             
-            # ImgBB API'sine gönder
-            async with aiohttp.ClientSession() as session:
-                # API anahtarını URL parametresi olarak ekle (dokümantasyonda gösterildiği gibi)
-                api_url = f"{IMGBB_UPLOAD_URL}?key={IMGBB_API_KEY}"
-                
-                # Dokümantasyonda belirtildiği gibi form verisini hazırla
-                form_data = aiohttp.FormData()
-                form_data.add_field('image', base64_image)
-                
-                logger.info(f"ImgBB API'ye istek gönderiliyor. URL: {api_url[:30]}...")
-                
-                # Dokümantasyona göre POST isteği gönder
-                async with session.post(api_url, data=form_data) as response:
-                    status_code = response.status
-                    logger.info(f"ImgBB API cevap kodu: {status_code}")
-                    
-                    # Yanıt içeriğini oku
-                    response_text = await response.text()
-                    logger.info(f"ImgBB API yanıt uzunluğu: {len(response_text)} karakter")
-                    
-                    if status_code != 200:
-                        logger.error(f"ImgBB API hatası: {status_code}, Yanıt: {response_text[:200]}...")
-                        return None
-                    
-                    # Yanıtı JSON'a çevir
-                    try:
-                        data = json.loads(response_text)
-                    except Exception as json_error:
-                        logger.error(f"ImgBB API JSON ayrıştırma hatası: {str(json_error)}")
-                        logger.error(f"Yanıt metni: {response_text[:200]}...")
-                        return None
-                    
-                    # Başarı durumunu kontrol et
-                    if not data.get('success'):
-                        logger.error(f"ImgBB API başarısız yanıt: {data}")
-                        return None
-                    
-                    # URL'i döndür (dokümantasyonda belirtildiği gibi)
-                    image_url = data['data']['url']
-                    logger.info(f"ImgBB yükleme başarılı: {image_url[:30]}...")
-                    return image_url
-                    
         except Exception as e:
-            logger.error(f"Görsel yükleme hatası: {str(e)}")
-            import traceback
-            logger.error(traceback.format_exc())
-            return None
+            logger.error(f"Arama hatası: {str(e)}")
+            await update.message.reply_text("⛔️ Bir hata oluştu!")
+
+    async def process_receipt_uploads(self, context: ContextTypes.DEFAULT_TYPE):
+        """Kuyruktaki dekontları yükle ve gönderilerdeki geçici referansı güncelle"""
+        try:
+            uploads = await self.db.claim_receipt_uploads(RECEIPT_UPLOAD_BATCH, RECEIPT_UPLOAD_LEASE)
+            if not uploads:
+                return
+            
+            await asyncio.gather(*(self._process_receipt_upload(context.bot, upload) for upload in uploads))
+        except Exception as e:
+            logger.error(f"Dekont yükleme işçisi hatası: {str(e)}")
+
+    async def _process_receipt_upload(self, bot, upload: dict):
+        """Tek bir dekontu depola; başarısız olursa artan aralıklarla tekrar dene"""
+        upload_id = upload["id"]
+        try:
+            # Aynı dosya bu arada başka bir gönderiyle yüklenmiş olabilir
+            receipt = await self.receipts.lookup(upload["file_unique_id"])
+            if not receipt:
+                # Dosya yolu bir saat geçerlidir, her denemede file_id ile yeniden alınır
+                photo_file = await bot.get_file(upload["file_id"])
+                logger.info(f"Dekont depolanıyor ({self.receipts.backend}). Dosya boyutu: {photo_file.file_size} byte")
+                receipt = await self.receipts.put(photo_file, upload["file_unique_id"], upload["mime_type"])
+            
+            if receipt and await self.db.complete_receipt_upload(upload_id, receipt["sha256"], receipt["url"]):
+                logger.info(f"Dekont yüklendi: #{upload['submission_id']} ({upload['attempts']}. deneme)")
+                return
+            error = "Dekont kaydedilemedi"
+        except Exception as e:
+            error = str(e)
+        
+        give_up = upload["attempts"] >= RECEIPT_UPLOAD_MAX_ATTEMPTS
+        delay = min(RECEIPT_UPLOAD_INTERVAL * (2 ** (upload["attempts"] - 1)), 3600)
+        if give_up:
+            logger.error(f"Dekont yüklenemedi, denemeler bitti: #{upload['submission_id']}: {error}")
+        else:
+            logger.warning(f"Dekont yüklenemedi ({upload['attempts']}. deneme), {delay:.0f} sn sonra tekrar denenecek: {error}")
+        await self.db.fail_receipt_upload(upload_id, error, delay, give_up)
 
     async def handle_dekont(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Dekont görüntüsünü işle"""
@@ -724,9 +738,11 @@ class FormHandlers:
             
             # Fotoğraf veya doküman kontrolü
             photo = None
+            mime_type = None
             if update.message.photo:
                 # En büyük boyutlu fotoğrafı al
                 photo = update.message.photo[-1]
+                mime_type = "image/jpeg"
             elif update.message.document:
                 # Doküman formatını kontrol et (jpg, png, pdf)
                 mime_type = update.message.document.mime_type
@@ -747,45 +763,43 @@ class FormHandlers:
                 )
                 return WAITING_DEKONT
             
-            # Yükleniyor mesajı
-            processing_message = await update.message.reply_text("⏳ Dekont görüntüsü yükleniyor...")
+            # Aynı dosya daha önce gönderildiyse indirme/yükleme yapmadan kaydı kullan
+            receipt = await self.receipts.lookup(photo.file_unique_id)
+            if receipt:
+                used_by = receipt['submission_id']
+            else:
+                used_by = await self.db.get_pending_receipt_upload(photo.file_unique_id)
             
-            try:
-                # Fotoğrafı ImgBB'ye yükle
-                photo_file = await photo.get_file()
-                
+            # Aynı dekont başka bir kayıtta kullanılmışsa kabul etme
+            if used_by:
+                await update.message.reply_text(
+                    f"⛔️ Bu dekont daha önce #{used_by} numaralı kayıtta kullanılmış!\n\n"
+                    "💳 Lütfen bu işleme ait dekontu gönderin.\n\n"
+                    "🚫 İşlemi iptal etmek için 'iptal' yazmanız yeterlidir."
+                )
+                return WAITING_DEKONT
+            
+            receipt_upload = None
+            if receipt:
+                image_url = receipt['url']
+            else:
                 # API anahtarını kontrol et
-                if not IMGBB_API_KEY:
+                if self.receipts.backend == 'imgbb' and not IMGBB_API_KEY:
                     logger.error("ImgBB API anahtarı eksik veya boş!")
                     await update.message.reply_text(
                         "⛔️ Dekont yüklenemiyor: API yapılandırma hatası!\n\n"
                         "🚫 İşlemi iptal etmek için 'iptal' yazmanız yeterlidir."
                     )
-                    # Yükleme mesajını sil
-                    await processing_message.delete()
                     return WAITING_DEKONT
                 
-                # Fotoğrafı ImgBB'ye yükle
-                image_url = await self.upload_image_to_imgbb(photo_file)
-                
-                # Yükleme mesajını sil
-                await processing_message.delete()
-                
-                if not image_url:
-                    await update.message.reply_text(
-                        "⛔️ Dekont görüntüsü yüklenirken bir hata oluştu. Lütfen tekrar deneyin.\n\n"
-                        "🚫 İşlemi iptal etmek için 'iptal' yazmanız yeterlidir."
-                    )
-                    return WAITING_DEKONT
-            
-            except Exception as e:
-                logger.error(f"Dekont yükleme hatası: {str(e)}")
-                await processing_message.delete()
-                await update.message.reply_text(
-                    "⛔️ Dekont görüntüsü işlenirken bir hata oluştu. Lütfen tekrar deneyin.\n\n"
-                    "🚫 İşlemi iptal etmek için 'iptal' yazmanız yeterlidir."
-                )
-                return WAITING_DEKONT
+                # Gönderi geçici referansla hemen kaydedilir, dekont arka planda yüklenir
+                image_url = f"{RECEIPT_PENDING_PREFIX}{photo.file_unique_id}"
+                receipt_upload = {
+                    "file_id": photo.file_id,
+                    "file_unique_id": photo.file_unique_id,
+                    "mime_type": mime_type,
+                    "placeholder": image_url
+                }
             
             # URL'i context'e kaydet
             context.user_data['dekont_url'] = image_url
@@ -800,81 +814,55 @@ class FormHandlers:
                 context.user_data.clear()
                 return ConversationHandler.END
             
-            # Form için admin ID'sini al
-            with self.engine.connect() as conn:
-                result = conn.execute(text("""
-                    SELECT created_by FROM forms 
-                    WHERE form_name = :form_name
-                    LIMIT 1
-                """), {"form_name": form_name})
-                row = result.fetchone()
-                if row:
-                    form_admin_id = row[0]
-                else:
-                    logger.error(f"Form admin ID'si bulunamadı: {form_name}")
-                    await update.message.reply_text("⛔️ Form bilgisi alınırken bir hata oluştu!")
-                    context.user_data.clear()
-                    return ConversationHandler.END
-                
-            # Adminin bakiyesini kontrol et
-            has_credits = await self.check_and_deduct_admin_credits(form_admin_id, update.effective_chat.id)
-            
-            # Eğer bakiye yetersizse uyarı ver ve işlemi durdur
-            if not has_credits:
-                await update.message.reply_text(
-                    "⛔️ Bu form için yeterli kullanım hakkı bulunmuyor!\n\n"
-                    "Form sahibi adminin bakiyesi yetersiz. Lütfen admin ile iletişime geçin."
-                )
+            # Form tanımını al (önbellekten)
+            form = await self.db.get_form_definition(form_name, form_group_id)
+            if not form:
+                logger.error(f"Form admin ID'si bulunamadı: {form_name}")
+                await update.message.reply_text("⛔️ Form bilgisi alınırken bir hata oluştu!")
                 context.user_data.clear()
                 return ConversationHandler.END
             
             # Form datasına dekont URL'ini ekle
             form_data_with_url = form_data + "\n" + image_url
             
-            # Mükerrer kayıt kontrolü
-            is_duplicate = await self.db.check_duplicate_submission(
-                form_name=form_name,
-                group_id=form_group_id,
-                data=form_data_with_url
-            )
-            
-            if is_duplicate:
-                await update.message.reply_text(
-                    "⛔️ Bu form verisi excel tablosunda mevcut!"
-                )
-                context.user_data.clear()
-                return ConversationHandler.END
-            
-            # Form verisini kaydet
-            submission_id = await self.db.save_form_data(
+            # Bakiye düşme, mükerrer kontrolü ve kayıt tek işlemde
+            submission = await self.db.submit_form(
                 form_name=form_name,
-                group_id=form_group_id,
+                group_id=form['group_id'],
                 user_id=update.effective_user.id,
                 chat_id=update.effective_chat.id,
-                data=form_data_with_url
+                data=form_data_with_url,
+                cost=FORM_SUBMISSION_COST,
+                receipt_sha256=receipt['sha256'] if receipt else None,
+                receipt_upload=receipt_upload
             )
+            submission_id = submission['submission_id']
+            
+            if submission_id and receipt_upload and context.job_queue:
+                # Yüklemeyi bir sonraki periyodu beklemeden başlat
+                context.job_queue.run_once(self.process_receipt_uploads, 0)
             
             if submission_id:
                 # Başarı mesajını hazırla
                 success_message = f"✅ #{submission_id} Numaralı {form_name.capitalize()} Hesabı Excele işlendi. ✅\n"
                 
                 # İsim soyisim bilgisini bul
-                name_surname = None
-                data_lines = form_data.split('\n')
-                if data_lines and len(data_lines) > 0:
-                    name_surname = data_lines[0]  # İlk satırı isim-soyisim olarak kullan
+                name_surname = self._name_surname(form, form_data)
                 
                 # İsim-Soyisim bilgisi varsa ekle
                 if name_surname:
                     success_message += f"{name_surname}\n"
                 
-                success_message += "📸 Dekont görüntüsü başarıyla eklendi.\n\n"
+                if receipt_upload:
+                    success_message += "📸 Dekont görüntüsü alındı, arka planda yükleniyor.\n\n"
+                else:
+                    success_message += "📸 Dekont görüntüsü başarıyla eklendi.\n\n"
                 success_message += "📝 Yeni veri girişi için:\n"
                 success_message += f"/form {form_name}"
                 
                 await update.message.reply_text(success_message)
             else:
-                await update.message.reply_text("⛔️ Veriler kaydedilirken bir hata oluştu!")
+                await self._reply_submission_failure(update, submission['status'])
             
             # Context'i temizle
             context.user_data.clear()
@@ -1,19 +1,28 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
-from bot.config import logger, SUPER_ADMIN_ID, NOWPAYMENTS_API_KEY, NOTIFICATION_BOT_TOKEN, TOKEN
-from bot.database.db_manager import DatabaseManager
+from bot.config import (
+    logger, SUPER_ADMIN_ID, NOTIFICATION_BOT_TOKEN, BOT_MODE, WEBHOOK_URL, NOWPAYMENTS_IPN_PATH,
+    PAYMENT_POLL_INTERVAL, PAYMENT_POLL_MAX_INTERVAL, PAYMENT_BACKOFF_STEP, PAYMENT_POLL_BATCH,
+    PAYMENT_EXPIRY_MINUTES, PAYMENT_TIMED_OUT_POLL_INTERVAL, PAYMENT_HARD_EXPIRY_HOURS
+)
+from bot.database.db_manager import DatabaseManager, PAID_PAYMENT_STATUSES, TIMED_OUT_PAYMENT_STATUS
 from bot.utils.decorators import super_admin_required, admin_required
 from bot.utils.notification import send_payment_notification
+from bot.utils.nowpayments import NowPaymentsClient, NowPaymentsError, get_nowpayments_client
+from bot.utils.user_profiles import UserProfileCache, get_user_profiles
+from bot.utils.dispatcher import NotificationDispatcher, get_notification_dispatcher
 from datetime import datetime
+import asyncio
 from functools import wraps
-import requests
 import json
 import os
-from sqlalchemy import text
 
 # Conversation states
 WAITING_AMOUNT = 1
 
+# 10 TL = 1 kullanım hakkı
+TL_PER_CREDIT = 10.0
+
 def authorized_group_required(func):
     """Komutun sadece yetkili gruplarda çalışmasını sağlayan dekoratör"""
     @wraps(func)
@@ -42,8 +51,14 @@ def authorized_group_required(func):
     return wrapper
 
 class UserHandlers:
-    def __init__(self):
-        self.db = DatabaseManager()  # DBManager -> DatabaseManager
+    def __init__(self, db_manager: DatabaseManager, payments_client: NowPaymentsClient = None,
+                 profiles: UserProfileCache = None, notifier: NotificationDispatcher = None):
+        self.db = db_manager
+        self.payments = payments_client or get_nowpayments_client()
+        # Telegram kullanıcı adları önbelleği; uygulamanın bot örneğini de taşır
+        self.profiles = profiles or get_user_profiles()
+        # Kullanıcıya giden bildirimler hız sınırlı kuyruk üzerinden gönderilir
+        self.notifier = notifier or get_notification_dispatcher()
         self.payment_check_job = None
     
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -89,6 +104,7 @@ class UserHandlers:
 📄 /form - Form verisi gir
 ❌ /formsil - Form sil
 📈 /rapor - Form verilerini Excel olarak al
+🔎 /ara - Form kayıtlarında ara
 
 💰 Bakiye İşlemleri:
 💵 /bakiye - Mevcut bakiyeyi gösterir
@@ -109,7 +125,8 @@ class UserHandlers:
 🚫 /adminsil - Admin yetkisi kaldırır
 📋 /adminler - Tüm adminleri listeler
 ➕ /bakiyeekle - Admine bakiye ekler
-➖ /bakiyesil - Adminden bakiye siler"""
+➖ /bakiyesil - Adminden bakiye siler
+🗄 /havuz - Veritabanı bağlantı havuzunu gösterir"""
 
             help_text += "\n\n❓ Komutlara tıkladığızda bot detaylı kullanım bilgisi verecektir."
             help_text += "\n\n⚠️ Önemli: Bot'u gruplara eklerken, tüm komutların düzgün çalışabilmesi için bota yönetici yetkisi verilmelidir."
@@ -377,57 +394,10 @@ class UserHandlers:
     async def get_nowpayments_address(self, amount, admin_id, currency="TRY"):
         """NowPayments API'sinden TRC20 USDT adresi al"""
         try:
-            # API endpoint
-            url = "https://api.nowpayments.io/v1/payment"
-            
-            # Admin bilgilerini değişkenlere tanımla
-            admin_name = "İsimsiz Kullanıcı"
-            admin_username = "Bilinmiyor"
-            
-            try:
-                # Kullanıcının admin olup olmadığını kontrol et
-                is_admin = await self.db.is_admin(str(admin_id))
-                
-                # Kullanıcı admin ise veritabanından bilgilerini al
-                if is_admin:
-                    # Veritabanından admin adını al
-                    with self.db.engine.connect() as conn:
-                        result = conn.execute(text("""
-                            SELECT admin_name FROM group_admins 
-                            WHERE user_id = :user_id
-                        """), {"user_id": admin_id})
-                        admin_data = result.fetchone()
-                        if admin_data and admin_data[0]:
-                            admin_name = admin_data[0]
-                
-                # Telegram API'den kullanıcı adını almaya çalış
-                try:
-                    from telegram import Bot
-                    
-                    # Bot oluştur
-                    bot = Bot(token=TOKEN)
-                    
-                    # Kullanıcı bilgilerini al
-                    user = await bot.get_chat(admin_id)
-                    
-                    # Kullanıcı adını al (varsa)
-                    if user.username:
-                        admin_username = user.username
-                    else:
-                        # Kullanıcı adı yoksa, adını kullan
-                        admin_username = user.first_name
-                        if user.last_name:
-                            admin_username += f" {user.last_name}"
-                    
-                    # Veritabanından alınamadıysa (admin değilse), Telegram'dan aldığımız ismi kullan
-                    if admin_name == "İsimsiz Kullanıcı":
-                        admin_name = admin_username
-                    
-                    logger.info(f"Kullanıcı bilgileri Telegram API'den alındı: {admin_username}")
-                except Exception as e:
-                    logger.error(f"Telegram API'den kullanıcı bilgileri alma hatası: {str(e)}")
-            except Exception as e:
-                logger.error(f"Kullanıcı bilgisi alma hatası: {str(e)}")
+            # Admin adı ve kullanıcı adı (Telegram kısmı önbellekten)
+            profile = await self.profiles.resolve(admin_id, self.db)
+            admin_name = profile["admin_name"]
+            admin_username = profile["admin_username"]
             
             # API isteği için gerekli parametreler
             payload = {
@@ -438,52 +408,58 @@ class UserHandlers:
                 "order_description": f"bakiye_{admin_id}"  # Admin ID'yi order_description'a ekle
             }
             
-            # API isteği için gerekli headers
-            headers = {
-                "x-api-key": NOWPAYMENTS_API_KEY,
-                "Content-Type": "application/json"
-            }
-            
-            # API isteği gönder
-            response = requests.post(url, json=payload, headers=headers)
+            # Webhook modunda ödeme durumu IPN ile bize bildirilir
+            if BOT_MODE == 'webhook' and WEBHOOK_URL:
+                payload["ipn_callback_url"] = f"{WEBHOOK_URL}{NOWPAYMENTS_IPN_PATH}"
             
-            # Yanıtı kontrol et (201 Created da başarılı bir yanıttır)
-            if response.status_code == 200 or response.status_code == 201:
-                data = response.json()
-                logger.info(f"NowPayments API yanıtı: {data}")
-                
-                # Ödeme oluşturulduğunda bildirim gönder (hata olsa bile devam et)
-                try:
-                    payment_data = {
-                        "payment_status": "waiting",
-                        "payment_id": data.get("payment_id"),
-                        "price_amount": amount,
-                        "price_currency": currency,
-                        "pay_amount": data.get("pay_amount"),
-                        "pay_currency": data.get("pay_currency", "USDTTRC20"),
-                        "order_description": f"bakiye_{admin_id}",
-                        "admin_id": admin_id,
-                        "admin_name": admin_name,
-                        "admin_username": admin_username
-                    }
-                    await send_payment_notification(payment_data)
-                except Exception as e:
-                    logger.error(f"Bildirim gönderme hatası (önemsiz): {str(e)}")
-                
-                # Ödeme bilgilerini döndür
+            # API isteği gönder (zaman aşımı, tekrar deneme ve devre kesici istemcide)
+            try:
+                data = await self.payments.create_payment(payload)
+            except NowPaymentsError as e:
+                logger.error(f"NowPayments API hatası: {str(e)}")
                 return {
-                    "success": True,
-                    "pay_address": data.get("pay_address"),
+                    "success": False,
+                    "error": f"API Hatası: {e.status}" if e.status else "Ödeme servisine şu anda ulaşılamıyor"
+                }
+            
+            logger.info(f"NowPayments API yanıtı: {data}")
+            
+            # Ödemeyi kaydet; durumu tek zamanlayıcı (ve webhook modunda IPN) takip eder
+            await self.db.record_payment(
+                data.get("payment_id"), admin_id,
+                price_amount=amount,
+                price_currency=currency,
+                pay_amount=data.get("pay_amount"),
+                pay_currency=data.get("pay_currency", "USDTTRC20"),
+                pay_address=data.get("pay_address")
+            )
+            
+            # Ödeme oluşturulduğunda bildirim gönder (hata olsa bile devam et)
+            try:
+                payment_data = {
+                    "payment_status": "waiting",
                     "payment_id": data.get("payment_id"),
+                    "price_amount": amount,
+                    "price_currency": currency,
                     "pay_amount": data.get("pay_amount"),
-                    "pay_currency": data.get("pay_currency", "USDTTRC20")
-                }
-            else:
-                logger.error(f"NowPayments API hatası: {response.status_code} - {response.text}")
-                return {
-                    "success": False,
-                    "error": f"API Hatası: {response.status_code}"
+                    "pay_currency": data.get("pay_currency", "USDTTRC20"),
+                    "order_description": f"bakiye_{admin_id}",
+                    "admin_id": admin_id,
+                    "admin_name": admin_name,
+                    "admin_username": admin_username
                 }
+                await send_payment_notification(payment_data, db=self.db, profiles=self.profiles)
+            except Exception as e:
+                logger.error(f"Bildirim gönderme hatası (önemsiz): {str(e)}")
+            
+            # Ödeme bilgilerini döndür
+            return {
+                "success": True,
+                "pay_address": data.get("pay_address"),
+                "payment_id": data.get("payment_id"),
+                "pay_amount": data.get("pay_amount"),
+                "pay_currency": data.get("pay_currency", "USDTTRC20")
+            }
             
         except Exception as e:
             logger.error(f"NowPayments API hatası: {str(e)}")
@@ -548,16 +524,6 @@ class UserHandlers:
                     parse_mode="Markdown"
                 )
                 
-                # Ödeme bilgilerini kullanıcı verilerine kaydet
-                context.user_data["payment_info"] = {
-                    "amount_tl": amount,
-                    "amount_usdt": payment_info["pay_amount"],
-                    "payment_id": payment_info["payment_id"],
-                    "pay_address": payment_info["pay_address"],
-                    "admin_id": user.id,
-                    "start_time": datetime.now().timestamp()
-                }
-                
                 return ConversationHandler.END
             else:
                 await update.message.reply_text(
@@ -572,24 +538,6 @@ class UserHandlers:
             await update.message.reply_text("⛔️ Bir hata oluştu!")
             return ConversationHandler.END
     
-    async def check_payment_status_job(self, context: ContextTypes.DEFAULT_TYPE):
-        """Ödeme durumunu kontrol etmek için zamanlayıcı işi"""
-        try:
-            # Ödeme bilgilerini al
-            job_data = context.job.data
-            payment_id = job_data.get("payment_id")
-            admin_id = job_data.get("admin_id")
-            
-            # Ödeme durumunu kontrol et
-            result = await self.check_payment_status(payment_id, admin_id)
-            
-            # Eğer ödeme tamamlandıysa, zamanlayıcıyı durdur
-            if result:
-                context.job.schedule_removal()
-                
-        except Exception as e:
-            logger.error(f"Ödeme durumu kontrol işi hatası: {str(e)}")
-
     async def cancel_load_credits(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Bakiye yükleme işlemini iptal et"""
         await update.message.reply_text("❌ Bakiye yükleme işlemi iptal edildi.")
@@ -597,277 +545,165 @@ class UserHandlers:
 
     async def process_nowpayments_ipn(self, payment_data):
         """NowPayments IPN callback'ini işle"""
+        # Ödeme verilerini logla
+        logger.info(f"NowPayments IPN bildirimi alındı: {payment_data}")
+        return await self.handle_payment_update(payment_data)
+
+    async def handle_payment_update(self, payment_data, admin_id=None):
+        """Ödeme durum değişikliğini işle (IPN ve zamanlayıcı ortak yolu)
+
+        Aynı durum ikinci kez geldiğinde hiçbir şey yapılmaz; bakiye
+        payments tablosu üzerinden ödeme başına yalnızca bir kez yüklenir.
+        """
         try:
-            # Ödeme verilerini logla
-            logger.info(f"NowPayments IPN bildirimi alındı: {payment_data}")
-            
-            # Ödeme durumunu kontrol et
             payment_status = payment_data.get("payment_status")
             payment_id = payment_data.get("payment_id")
+            if not payment_id or not payment_status:
+                logger.error(f"Eksik ödeme verisi: {payment_data}")
+                return False
             
             # Admin ID'yi al
-            admin_id = None
-            order_description = payment_data.get("order_description", "")
-            if order_description and order_description.startswith("bakiye_"):
-                try:
-                    admin_id = order_description.split("_")[1]
-                except (IndexError, ValueError):
-                    admin_id = None
-                    logger.error(f"Admin ID alınamadı: {order_description}")
+            if not admin_id:
+                order_description = payment_data.get("order_description") or ""
+                if order_description.startswith("bakiye_"):
+                    try:
+                        admin_id = order_description.split("_")[1]
+                    except (IndexError, ValueError):
+                        admin_id = None
+            
+            record = await self.db.get_payment(payment_id)
+            if record:
+                admin_id = record["admin_id"]
+            elif admin_id:
+                # Tabloda olmayan ödeme (ör. eski sürümde oluşturulmuş), önce kaydet
+                await self.db.record_payment(
+                    payment_id, admin_id,
+                    price_amount=payment_data.get("price_amount"),
+                    price_currency=payment_data.get("price_currency"),
+                    pay_amount=payment_data.get("pay_amount"),
+                    pay_currency=payment_data.get("pay_currency"),
+                    pay_address=payment_data.get("pay_address"),
+                    status=None
+                )
+            else:
+                logger.error(f"Admin ID bulunamadı, ödeme işlenemedi: {payment_id}")
+                return False
             
-            # Kullanıcı bilgilerini tanımla
-            admin_name = "İsimsiz Kullanıcı"
-            admin_username = "Bilinmiyor"
+            # Durum değişikliği, gerekirse admin yapma ve bakiye yüklemesi tek işlemde
+            outcome = await self.db.apply_payment_status(payment_id, payment_status, TL_PER_CREDIT)
+            if outcome['error']:
+                logger.error(f"Ödeme durumu işlenemedi: {payment_id} ({payment_status})")
+                return False
+            if not outcome['changed']:
+                logger.info(f"Ödeme durumu değişmedi, atlanıyor: {payment_id} ({payment_status})")
+                return True
             
-            if admin_id:
-                try:
-                    # Önce kullanıcının admin olup olmadığını kontrol et
-                    user_is_admin = await self.db.is_admin(str(admin_id))
-                    
-                    # Telegram API'den kullanıcı bilgilerini al
-                    try:
-                        from telegram import Bot
-                        bot = Bot(token=TOKEN)
-                        user = await bot.get_chat(admin_id)
-                        
-                        # Kullanıcı adını al (varsa)
-                        if user.username:
-                            admin_username = user.username
-                        else:
-                            # Kullanıcı adı yoksa, adını kullan
-                            admin_username = user.first_name
-                            if user.last_name:
-                                admin_username += f" {user.last_name}"
-                        
-                        # Telegram'dan alınan ismi varsayılan olarak kullan 
-                        admin_name = admin_username
-                                
-                        # Kullanıcı admin değilse, ve ödeme başarılıysa admin yap
-                        if not user_is_admin and (payment_status == "confirmed" or payment_status == "finished"):
-                            # Kullanıcıyı admin olarak ekle (parametrelerin doğru sırasına dikkat et)
-                            is_success = await self.db.add_admin(admin_id, admin_username, admin_id)
-                            if not is_success:
-                                logger.error(f"Admin ekleme hatası: Admin ID: {admin_id}")
-                            else:
-                                logger.info(f"Kullanıcı başarıyla admin yapıldı: {admin_id} ({admin_username})")
-                                
-                        # Kullanıcı admin ise veritabanından adını güncelle    
-                        elif user_is_admin:
-                            # Veritabanından admin adını al
-                            with self.db.engine.connect() as conn:
-                                result = conn.execute(text("""
-                                    SELECT admin_name FROM group_admins 
-                                    WHERE user_id = :user_id
-                                """), {"user_id": admin_id})
-                                admin_data = result.fetchone()
-                                if admin_data and admin_data[0]:
-                                    admin_name = admin_data[0]
-                                    
-                        logger.info(f"Kullanıcı bilgileri Telegram API'den alındı: {admin_username}")
-                    except Exception as e:
-                        logger.error(f"Telegram API'den kullanıcı bilgileri alma hatası: {str(e)}")
-                    
-                except Exception as e:
-                    logger.error(f"Kullanıcı bilgisi alma hatası: {str(e)}")
-            
-            # Admin bilgilerini ekle
-            if admin_id:
-                payment_data["admin_id"] = admin_id
-                payment_data["admin_name"] = admin_name
-                payment_data["admin_username"] = admin_username
+            admin_name = admin_username = None
+            if outcome['credited']:
+                # Admin adı ve kullanıcı adı (Telegram kısmı önbellekten)
+                profile = await self.profiles.resolve(admin_id, self.db)
+                admin_name = profile["admin_name"]
+                admin_username = profile["admin_username"]
+                if outcome['promoted']:
+                    # Ödeme ile admin yapılan kullanıcının adını kaydet
+                    if not await self.db.add_admin(admin_id, admin_username, admin_id):
+                        logger.error(f"Admin adı kaydedilemedi: Admin ID: {admin_id}")
+                    logger.info(f"Kullanıcı ödeme ile admin yapıldı: {admin_id} ({admin_username})")
             
             # Sadece süper admine bildirim gönder (hata olsa bile devam et)
             try:
-                await send_payment_notification(payment_data)
+                await send_payment_notification(dict(
+                    payment_data,
+                    admin_id=admin_id,
+                    admin_name=admin_name,
+                    admin_username=admin_username
+                ), db=self.db, profiles=self.profiles)
             except Exception as e:
                 logger.error(f"Bildirim gönderme hatası (önemsiz): {str(e)}")
             
-            if payment_status == "confirmed" or payment_status == "finished":
-                # Ödeme tamamlandı, bakiyeyi güncelle
-                if admin_id:
-                    amount_tl = float(payment_data.get("price_amount"))  # Doğrudan TL miktarını al
-                    
-                    # TL miktarını kullanım hakkına çevir (10 TL = 1 kullanım hakkı)
-                    usage_rights = amount_tl / 10.0
-                    
-                    # Bakiyeyi güncelle
-                    success = await self.db.Bakiye_ekle(admin_id, usage_rights)
-                    
-                    if success:
-                        logger.info(f"Bakiye başarıyla güncellendi: Admin ID: {admin_id}, Admin: {admin_name}, Miktar: {amount_tl}₺, Kullanım Hakkı: {usage_rights}")
-                        
-                        # Kullanıcıya ödeme onaylandı bilgisi gönder
-                        try:
-                            from telegram import Bot
-                            
-                            # Bot oluştur
-                            bot = Bot(token=TOKEN)
-                            
-                            # Kullanıcıya bildirim gönder
-                            await bot.send_message(
-                                chat_id=admin_id,
-                                text=(
-                                    f"✅ Ödemeniz onaylandı ve hesabınıza yüklendi!\n\n"
-                                    f"💰 Yüklenen Tutar: {amount_tl}₺\n"
-                                    f"🔢 Eklenen Kullanım Hakkı: {usage_rights}\n\n"
-                                    f"🚀 Artık OttoExcel Bot'un tüm özelliklerini kullanabilirsiniz!\n\n"
-                                    f"📋 Kullanabileceğiniz tüm komutları görmek için /yardim yazabilirsiniz.\n\n"
-                                    f"🙏 OttoExcel Bot'u tercih ettiğiniz için teşekkür ederiz!"
-                                )
-                            )
-                            logger.info(f"Ödeme onay bildirimi kullanıcıya gönderildi: {admin_id}")
-                        except Exception as e:
-                            logger.error(f"Kullanıcıya bildirim gönderilirken hata oluştu: {str(e)}")
-                        
-                        return True
-                    else:
-                        logger.error(f"Bakiye güncellenirken hata oluştu: Admin ID: {admin_id}, Admin: {admin_name}, Miktar: {amount_tl}₺, Kullanım Hakkı: {usage_rights}")
-                        return False
-                else:
-                    logger.error("Admin ID bulunamadı, bakiye güncellenemedi")
-                    return False
-            else:
+            if outcome['credited']:
+                amount_tl = outcome['price_amount']
+                usage_rights = outcome['usage_rights']
+                logger.info(f"Bakiye başarıyla güncellendi: Admin ID: {admin_id}, Admin: {admin_name}, Miktar: {amount_tl}₺, Kullanım Hakkı: {usage_rights}")
+                
+                # Kullanıcıya ödeme onaylandı bilgisi gönder
+                self.notifier.notify(
+                    admin_id,
+                    (
+                        f"✅ Ödemeniz onaylandı ve hesabınıza yüklendi!\n\n"
+                        f"💰 Yüklenen Tutar: {amount_tl}₺\n"
+                        f"🔢 Eklenen Kullanım Hakkı: {usage_rights}\n\n"
+                        f"🚀 Artık OttoExcel Bot'un tüm özelliklerini kullanabilirsiniz!\n\n"
+                        f"📋 Kullanabileceğiniz tüm komutları görmek için /yardim yazabilirsiniz.\n\n"
+                        f"🙏 OttoExcel Bot'u tercih ettiğiniz için teşekkür ederiz!"
+                    )
+                )
+                logger.info(f"Ödeme onay bildirimi kuyruğa alındı: {admin_id}")
+            elif payment_status not in PAID_PAYMENT_STATUSES:
                 logger.info(f"Ödeme henüz tamamlanmadı. Durum: {payment_status}")
-                return True
+            
+            return True
                 
         except Exception as e:
-            logger.error(f"IPN işleme hatası: {str(e)}")
+            logger.error(f"Ödeme durumu işleme hatası: {str(e)}")
             return False
 
     async def check_payment_status(self, payment_id, admin_id):
-        """Ödeme durumunu kontrol et"""
+        """Ödeme durumunu NowPayments'tan sorgula ve işle"""
         try:
-            # API endpoint
-            url = f"https://api.nowpayments.io/v1/payment/{payment_id}"
-            
-            # API isteği için gerekli headers
-            headers = {
-                "x-api-key": NOWPAYMENTS_API_KEY
-            }
-            
-            # Kullanıcı bilgilerini tanımla
-            admin_name = "İsimsiz Kullanıcı"
-            admin_username = "Bilinmiyor"
-            
-            try:
-                # Kullanıcının admin olup olmadığını kontrol et
-                is_admin = await self.db.is_admin(str(admin_id))
-                
-                # Telegram API'den kullanıcı bilgilerini al
-                try:
-                    from telegram import Bot
-                    
-                    # Bot oluştur
-                    bot = Bot(token=TOKEN)
-                    
-                    # Kullanıcı bilgilerini al
-                    user = await bot.get_chat(admin_id)
-                    
-                    # Kullanıcı adını al (varsa)
-                    if user.username:
-                        admin_username = user.username
-                    else:
-                        # Kullanıcı adı yoksa, adını kullan
-                        admin_username = user.first_name
-                        if user.last_name:
-                            admin_username += f" {user.last_name}"
-                    
-                    # Telegram'dan alınan ismi varsayılan olarak kullan
-                    admin_name = admin_username
-                    
-                    # Kullanıcı admin ise veritabanından adını güncelle
-                    if is_admin:
-                        # Veritabanından admin adını al
-                        with self.db.engine.connect() as conn:
-                            result = conn.execute(text("""
-                                SELECT admin_name FROM group_admins 
-                                WHERE user_id = :user_id
-                            """), {"user_id": admin_id})
-                            admin_data = result.fetchone()
-                            if admin_data and admin_data[0]:
-                                admin_name = admin_data[0]
-                    
-                    logger.info(f"Kullanıcı bilgileri Telegram API'den alındı: {admin_username}")
-                except Exception as e:
-                    logger.error(f"Telegram API'den kullanıcı bilgileri alma hatası: {str(e)}")
-            except Exception as e:
-                logger.error(f"Kullanıcı bilgisi alma hatası: {str(e)}")
+            data = await self.payments.get_payment(payment_id)
+        except NowPaymentsError as e:
+            logger.error(f"Ödeme durumu kontrol hatası: {str(e)}")
+            return False
+        
+        logger.info(f"Ödeme durumu: {data}")
+        return await self.handle_payment_update(data, admin_id=admin_id)
+
+    def payment_poll_delay(self, age_seconds: float) -> float:
+        """Ödeme yaşına göre üstel artan sorgulama aralığı"""
+        delay = PAYMENT_POLL_INTERVAL * (2 ** int(age_seconds // PAYMENT_BACKOFF_STEP))
+        return min(delay, PAYMENT_POLL_MAX_INTERVAL)
+
+    async def poll_pending_payments(self, context: ContextTypes.DEFAULT_TYPE):
+        """Bekleyen tüm ödemeleri tek zamanlayıcıdan, gruplar halinde sorgula"""
+        try:
+            # Ödenmeyenleri seyrek sorgulamaya al, son sınırı aşanları sorgulamayı bırak
+            expired = await self.db.expire_payments(
+                PAYMENT_EXPIRY_MINUTES, PAYMENT_HARD_EXPIRY_HOURS, PAYMENT_TIMED_OUT_POLL_INTERVAL
+            )
+            for payment in expired:
+                if payment['previous_status'] in ('waiting', TIMED_OUT_PAYMENT_STATUS):
+                    logger.info(f"Ödeme süresi doldu ({payment['status']}): {payment['payment_id']} (Admin ID: {payment['admin_id']})")
+                else:
+                    # Zincirde ilerleyen ödeme son duruma ulaşmadı; elle kontrol gerekir
+                    logger.warning(f"Ödeme {payment['previous_status']} durumunda sonuçlanmadı, sorgulama bırakıldı: "
+                                   f"{payment['payment_id']} (Admin ID: {payment['admin_id']})")
             
-            # API isteği gönder
-            response = requests.get(url, headers=headers)
+            due = await self.db.get_due_payments(PAYMENT_POLL_BATCH)
+            if not due:
+                return
             
-            # Yanıtı kontrol et
-            if response.status_code == 200:
-                data = response.json()
-                logger.info(f"Ödeme durumu: {data}")
-                
-                # Ödeme durumunu al
-                payment_status = data.get("payment_status")
-                
-                # Ödeme durumu değiştiyse bildirim gönder
-                if payment_status in ["confirmed", "finished"]:
-                    # Bildirim gönder (hata olsa bile devam et)
-                    try:
-                        payment_data = {
-                            "payment_status": payment_status,
-                            "payment_id": payment_id,
-                            "price_amount": data.get("price_amount"),
-                            "price_currency": data.get("price_currency"),
-                            "pay_amount": data.get("pay_amount"),
-                            "pay_currency": data.get("pay_currency", "USDTTRC20"),
-                            "order_description": f"bakiye_{admin_id}",
-                            "admin_id": admin_id,
-                            "admin_name": admin_name,
-                            "admin_username": admin_username
-                        }
-                        await send_payment_notification(payment_data)
-                    except Exception as e:
-                        logger.error(f"Bildirim gönderme hatası (önemsiz): {str(e)}")
-                    
-                    # Bakiyeyi güncelle
-                    amount_tl = float(data.get("price_amount"))
-                    
-                    # TL miktarını kullanım hakkına çevir (10 TL = 1 kullanım hakkı)
-                    usage_rights = amount_tl / 10.0
-                    
-                    success = await self.db.Bakiye_ekle(admin_id, usage_rights)
-                    
-                    if success:
-                        logger.info(f"Bakiye başarıyla güncellendi: Admin ID: {admin_id}, Admin: {admin_name}, Miktar: {amount_tl}₺, Kullanım Hakkı: {usage_rights}")
-                        
-                        # Kullanıcıya ödeme onaylandı bilgisi gönder
-                        try:
-                            from telegram import Bot
-                            
-                            # Bot oluştur
-                            bot = Bot(token=TOKEN)
-                            
-                            # Kullanıcıya bildirim gönder
-                            await bot.send_message(
-                                chat_id=admin_id,
-                                text=(
-                                    f"✅ Ödemeniz onaylandı ve hesabınıza yüklendi!\n\n"
-                                    f"💰 Yüklenen Tutar: {amount_tl}₺\n"
-                                    f"🔢 Eklenen Kullanım Hakkı: {usage_rights}\n\n"
-                                    f"🚀 Artık OttoExcel Bot'un tüm özelliklerini kullanabilirsiniz!\n\n"
-                                    f"📋 Kullanabileceğiniz tüm komutları görmek için /yardim yazabilirsiniz.\n\n"
-                                    f"🙏 OttoExcel Bot'u tercih ettiğiniz için teşekkür ederiz!"
-                                )
-                            )
-                            logger.info(f"Ödeme onay bildirimi kullanıcıya gönderildi: {admin_id}")
-                        except Exception as e:
-                            logger.error(f"Kullanıcıya bildirim gönderilirken hata oluştu: {str(e)}")
-                        
-                        return True
-                    else:
-                        logger.error(f"Bakiye güncellenirken hata oluştu: Admin ID: {admin_id}, Admin: {admin_name}, Miktar: {amount_tl}₺, Kullanım Hakkı: {usage_rights}")
-                        return False
-                
-                return True
-            else:
-                logger.error(f"Ödeme durumu kontrol hatası: {response.status_code} - {response.text}")
-                return False
-                
+            await asyncio.gather(*(self._poll_payment(payment) for payment in due))
         except Exception as e:
-            logger.error(f"Ödeme durumu kontrol hatası: {str(e)}")
-            return False 
\ No newline at end of file
+            logger.error(f"Ödeme zamanlayıcısı hatası: {str(e)}")
+
+    async def _poll_payment(self, payment: dict):
+        """Tek bir bekleyen ödemeyi sorgula ve sonraki sorgu zamanını ayarla"""
+        payment_id = payment["payment_id"]
+        try:
+            if self.payments.breaker.state == 'open':
+                # Devre açıkken API'yi zorlamadan sonraki tura bırak
+                await self.db.schedule_payment_check(payment_id, PAYMENT_POLL_MAX_INTERVAL)
+                return
+            data = await self.payments.get_payment(payment_id)
+            await self.handle_payment_update(data, admin_id=payment["admin_id"])
+        except NowPaymentsError as e:
+            logger.error(f"Ödeme durumu kontrol hatası ({payment_id}): {str(e)}")
+        except Exception as e:
+            logger.error(f"Ödeme sorgulama hatası ({payment_id}): {str(e)}")
+        
+        if payment["status"] == TIMED_OUT_PAYMENT_STATUS:
+            delay = PAYMENT_TIMED_OUT_POLL_INTERVAL
+        else:
+            delay = self.payment_poll_delay(float(payment["age_seconds"] or 0))
+        await self.db.schedule_payment_check(payment_id, delay)
@@ -5,11 +5,18 @@ import signal
 import sys
 import traceback
 from datetime import datetime
-from telegram.ext import Application, PicklePersistence
+from telegram.ext import Application
 from telegram import Update
-from config import TOKEN, logger
+from config import TOKEN, logger, BOT_MODE, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET_TOKEN, CALLBACK_DATA_MAXSIZE, METRICS_PORT
 from handlers import setup_handlers
-from database.db_manager import DatabaseManager
+from bot.database.db_manager import get_database_manager
+from bot.database.persistence import PostgresPersistence
+from bot.utils.nowpayments import get_nowpayments_client
+from bot.utils.imgbb import get_imgbb_uploader
+from bot.utils.dispatcher import get_notification_dispatcher
+from bot.utils.webhook_server import WebhookServer
+from bot.utils.metrics import MetricsServer, bind_database
+from bot.utils.loop_monitor import get_loop_monitor
 from dotenv import load_dotenv
 
 # .env dosyasını yükle
@@ -28,6 +35,15 @@ logger = logging.getLogger(__name__)
 # Kapanma olayı
 shutdown_event = asyncio.Event()
 
+# Botun dinlediği güncelleme türleri (polling ve webhook için ortak)
+ALLOWED_UPDATES = [
+    Update.MESSAGE,
+    Update.EDITED_MESSAGE,
+    Update.CHANNEL_POST,
+    Update.EDITED_CHANNEL_POST,
+    Update.CALLBACK_QUERY
+]
+
 def signal_handler(sig, frame):
     """Sinyal yakalayıcı"""
     logger.info("Sinyal alındı, bot güvenli bir şekilde kapatılıyor...")
@@ -42,6 +58,9 @@ def signal_handler(sig, frame):
 async def main():
     """Bot başlatma fonksiyonu"""
     app = None
+    db_manager = None
+    webhook_server = None
+    metrics_server = None
     try:
         # Veritabanı bağlantısı ve kurulumu
         logger.info("Veritabanı kurulumu başlatılıyor...")
@@ -52,7 +71,7 @@ async def main():
         logger.info(f"Veritabanı URL: {db_url}")
         print(f"Veritabanı URL: {db_url}")
         
-        db_manager = DatabaseManager()
+        db_manager = get_database_manager()
         setup_success = db_manager.setup_database()
         
         if not setup_success:
@@ -66,46 +85,60 @@ async def main():
         if DEV_MODE:
             logger.info("Geliştirme modu aktif! Kod değişiklikleri için Docker volume mapping kullanılıyor.")
         
-        # Persistence'ı yapılandır
-        persistence = PicklePersistence(
-            filepath="bot_data.pickle",
-            single_file=True,
-            update_interval=60
-        )
+        # Persistence'ı yapılandır (değişen anahtarlar PostgreSQL'e yazılır)
+        persistence = PostgresPersistence(db_manager)
         
         # Bot uygulamasını oluştur
         app = Application.builder()\
             .token(os.getenv("BOT_TOKEN"))\
             .persistence(persistence)\
             .concurrent_updates(True)\
-            .arbitrary_callback_data(True)\
+            .arbitrary_callback_data(CALLBACK_DATA_MAXSIZE)\
             .build()
         
         # Handler'ları ayarla
-        setup_handlers(app)
+        handlers = setup_handlers(app, db_manager)
         
         # Botu başlat
         logger.info("Bot başlatılıyor...")
         await app.initialize()
         await app.start()
         
-        # Polling başlat
-        logger.info("Bot polling başlatılıyor...")
-        await app.updater.start_polling(
-            allowed_updates=[
-                Update.MESSAGE,
-                Update.EDITED_MESSAGE,
-                Update.CHANNEL_POST,
-                Update.EDITED_CHANNEL_POST,
-                Update.CALLBACK_QUERY
-            ],
-            drop_pending_updates=False,
-            timeout=30,
-            read_timeout=30,
-            write_timeout=30,
-            connect_timeout=30,
-            pool_timeout=30
-        )
+        # Bildirim kuyruğu işçisini başlat
+        get_notification_dispatcher().start()
+        
+        # Event loop gecikmesi ve bloklayan kod izleyicisi
+        get_loop_monitor().start()
+        
+        # İsteğe bağlı Prometheus /metrics sunucusu
+        if METRICS_PORT:
+            bind_database(db_manager)
+            metrics_server = MetricsServer()
+            await metrics_server.start()
+        
+        if BOT_MODE == 'webhook':
+            # Telegram güncellemeleri ve NowPayments IPN tek HTTP sunucusundan gelir
+            logger.info("Bot webhook modunda başlatılıyor...")
+            webhook_server = WebhookServer(app, ipn_handler=handlers['user'].process_nowpayments_ipn)
+            await webhook_server.start()
+            await app.bot.set_webhook(
+                url=f"{WEBHOOK_URL}{WEBHOOK_PATH}",
+                secret_token=WEBHOOK_SECRET_TOKEN or None,
+                allowed_updates=ALLOWED_UPDATES,
+                drop_pending_updates=False
+            )
+        else:
+            # Polling başlat
+            logger.info("Bot polling başlatılıyor...")
+            await app.updater.start_polling(
+                allowed_updates=ALLOWED_UPDATES,
+                drop_pending_updates=False,
+                timeout=30,
+                read_timeout=30,
+                write_timeout=30,
+                connect_timeout=30,
+                pool_timeout=30
+            )
         
         logger.info("🚀 Bot başarıyla başlatıldı!")
         
@@ -123,12 +156,39 @@ async def main():
         if app is not None:
             try:
                 logger.info("Bot servisleri kapatılıyor...")
-                await app.updater.stop()
+                if webhook_server is not None:
+                    await webhook_server.stop()
+                if metrics_server is not None:
+                    await metrics_server.stop()
+                if app.updater.running:
+                    await app.updater.stop()
+                await get_loop_monitor().stop()
+                # Kuyruktaki bildirimleri gönder, ardından işçiyi durdur
+                await get_notification_dispatcher().stop()
                 await app.stop()
                 # app.shutdown() metodu kaldırıldı
             except Exception as e:
                 logger.error(f"Bot kapatma hatası: {str(e)}")
         
+        # NowPayments HTTP oturumunu kapat
+        try:
+            await get_nowpayments_client().close()
+        except Exception as e:
+            logger.error(f"NowPayments istemcisi kapatma hatası: {str(e)}")
+        
+        # ImgBB HTTP oturumunu kapat
+        try:
+            await get_imgbb_uploader().close()
+        except Exception as e:
+            logger.error(f"ImgBB istemcisi kapatma hatası: {str(e)}")
+        
+        # Veritabanı bağlantı havuzlarını kapat
+        if db_manager is not None:
+            try:
+                await db_manager.close()
+            except Exception as e:
+                logger.error(f"Veritabanı kapatma hatası: {str(e)}")
+        
         logger.info("🔚 Bot başarıyla kapatıldı!")
 
 if __name__ == "__main__":
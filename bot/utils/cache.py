@@ -0,0 +1,71 @@
+import time
+from collections import OrderedDict
+
+# Önbellekte olmayan anahtarlar için işaret (False/None değerleri de önbelleğe alınabilir)
+MISSING = object()
+
+
+class TTLCache:
+    """Süreli (TTL) ve boyut sınırlı (LRU) bellek içi önbellek
+
+    Kayıtlar `ttl` saniye sonra geçersiz olur; kapasite dolduğunda en uzun
+    süredir kullanılmayan kayıt atılır. İsabet/ıska sayaçları tutulur.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=MISSING):
+        """Anahtarın değerini getir, yoksa veya süresi dolmuşsa default döndür"""
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl: float = None):
+        """Değeri önbelleğe yaz"""
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        """Tek bir anahtarı önbellekten sil"""
+        self._data.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        """Koşulu sağlayan tüm anahtarları önbellekten sil"""
+        for key in [key for key in self._data if predicate(key)]:
+            del self._data[key]
+
+    def clear(self):
+        """Önbelleği tamamen temizle"""
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """İsabet/ıska istatistiklerini getir"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / total * 100) if total else 0.0
+        }
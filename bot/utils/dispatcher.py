@@ -0,0 +1,271 @@
+import asyncio
+import time
+from collections import defaultdict, deque
+from telegram import Bot
+from telegram.error import RetryAfter, TimedOut, NetworkError, TelegramError
+from bot.config import (
+    logger, TOKEN, NOTIFICATION_BOT_TOKEN, NOTIFY_QUEUE_SIZE, NOTIFY_GLOBAL_RATE,
+    NOTIFY_CHAT_INTERVAL, NOTIFY_DIGEST_WINDOW
+)
+
+# Telegram mesaj uzunluğu sınırı
+MAX_MESSAGE_LENGTH = 4096
+# Özet mesajlarda bildirimler arasına konan ayraç
+DIGEST_SEPARATOR = "\n\n➖➖➖➖➖\n\n"
+# 429 dışındaki geçici hatalarda en fazla deneme sayısı
+MAX_ATTEMPTS = 5
+
+
+class NotificationDispatcher:
+    """Telegram bildirimlerini sohbet başına kuyruklardan, hız sınırlarına uyarak gönderen dağıtıcı
+
+    Handler'lar `notify` ile mesajı kuyruğa bırakıp hemen döner. Her sohbetin
+    (bot, sohbet, özet) kuyruğunu kendi görevi işler; böylece bir sohbetin
+    beklemesi (sohbet aralığı, 429 `retry_after`, özet penceresi) diğer
+    sohbetleri durdurmaz. Global (saniyede `global_rate` mesaj) ve sohbet başına
+    (`chat_interval` saniyede bir mesaj) sınırlara uyulur. `digest=True` ile
+    kuyruğa alınan mesajlar aynı sohbet için `digest_window` içinde birikenlerle
+    tek mesajda birleştirilir; özet olmayan mesajlar bu pencereyi beklemez.
+
+    Mesajlar ana bot ('main') veya bildirim botu ('notify') ile gönderilebilir.
+    """
+
+    def __init__(self, bot: Bot = None, maxsize: int = NOTIFY_QUEUE_SIZE,
+                 global_rate: float = NOTIFY_GLOBAL_RATE, chat_interval: float = NOTIFY_CHAT_INTERVAL,
+                 digest_window: float = NOTIFY_DIGEST_WINDOW):
+        self._bots = {'main': bot}
+        self._owned_bots = []
+        self.maxsize = maxsize
+        self.global_rate = global_rate
+        self.chat_interval = chat_interval
+        self.digest_window = digest_window
+        # (bot, chat_id, özet mi) -> bekleyen mesajlar ve onları gönderen görev
+        self._lanes = {}
+        self._lane_tasks = {}
+        self._pending = 0
+        self._idle = None
+        self._running = False
+        self._sent_times = deque()
+        self._last_chat_send = {}
+        # 429 alınan sohbetlerin tekrar gönderilebileceği an (monotonic)
+        self._chat_ready_at = {}
+        self.stats_counters = defaultdict(int)
+
+    def bind(self, bot: Bot):
+        """Uygulamanın bot örneğini ana bot olarak bağla"""
+        self._bots['main'] = bot
+
+    def _get_bot(self, name: str) -> Bot:
+        """Ad ile bot örneğini getir (ilk kullanımda oluşturulur)"""
+        bot = self._bots.get(name)
+        if bot is None:
+            bot = Bot(token=NOTIFICATION_BOT_TOKEN if name == 'notify' else TOKEN)
+            self._bots[name] = bot
+            self._owned_bots.append(bot)
+        return bot
+
+    def start(self):
+        """Dağıtıcıyı çalışan event loop üzerinde etkinleştir"""
+        if not self._running:
+            self._idle = asyncio.Event()
+            if not self._pending:
+                self._idle.set()
+            self._running = True
+            logger.info("Bildirim dağıtıcısı başlatıldı")
+
+    def notify(self, chat_id, text: str, bot: str = 'main', parse_mode: str = None, digest: bool = False) -> bool:
+        """Mesajı sohbetin kuyruğuna bırak; toplam bekleyen mesaj sınırı doluysa False döndür"""
+        self.start()
+        if self._pending >= self.maxsize:
+            self.stats_counters['dropped'] += 1
+            logger.error(f"Bildirim kuyruğu dolu, mesaj atıldı: {chat_id}")
+            return False
+
+        key = (bot, chat_id, digest and self.digest_window > 0)
+        self._lanes.setdefault(key, deque()).append({
+            'bot': bot,
+            'chat_id': chat_id,
+            'text': text,
+            'parse_mode': parse_mode,
+            'digest': digest,
+            'attempts': 0
+        })
+        self._pending += 1
+        self._idle.clear()
+        self.stats_counters['queued'] += 1
+
+        task = self._lane_tasks.get(key)
+        if task is None or task.done():
+            self._lane_tasks[key] = asyncio.get_running_loop().create_task(self._run_lane(key))
+        return True
+
+    async def _run_lane(self, key: tuple):
+        """Tek bir sohbet kuyruğundaki mesajları sırayla gönder"""
+        lane = self._lanes[key]
+        try:
+            while lane:
+                if key[2]:
+                    # Aynı sohbete gelecek diğer özet bildirimlerin birikmesini bekle (yalnızca bu sohbet bekler)
+                    await asyncio.sleep(self.digest_window)
+                    batch = list(lane)
+                    lane.clear()
+                    messages = self._merge(batch)
+                else:
+                    batch = [lane.popleft()]
+                    messages = batch
+
+                for message in messages:
+                    try:
+                        await self._send(message)
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        # Hatalı bir mesaj toplu gönderimin kalanını düşürmesin
+                        self.stats_counters['failed'] += 1
+                        logger.error(f"Bildirim dağıtıcısı hatası ({message['chat_id']}): {str(e)}")
+                self._done(len(batch))
+        finally:
+            if not lane and self._lanes.get(key) is lane:
+                del self._lanes[key]
+                self._lane_tasks.pop(key, None)
+
+    def _done(self, count: int):
+        """İşlenen mesajları bekleyenlerden düş"""
+        self._pending -= count
+        if self._pending <= 0:
+            self._pending = 0
+            self._idle.set()
+
+    def _merge(self, batch: list) -> list:
+        """Özetlenebilir mesajları sohbet başına birleştir, sırayı koru"""
+        messages = []
+        digests = {}
+        for item in batch:
+            if not item['digest']:
+                messages.append(item)
+                continue
+
+            key = (item['bot'], item['chat_id'], item['parse_mode'])
+            current = digests.get(key)
+            if current is not None and len(current['text']) + len(DIGEST_SEPARATOR) + len(item['text']) <= MAX_MESSAGE_LENGTH:
+                current['text'] += DIGEST_SEPARATOR + item['text']
+                current['count'] += 1
+                self.stats_counters['merged'] += 1
+            else:
+                current = dict(item, count=1)
+                digests[key] = current
+                messages.append(current)
+        return messages
+
+    async def _throttle(self, chat_id):
+        """Global ve sohbet başına hız sınırları için gerekiyorsa bekle"""
+        while True:
+            now = time.monotonic()
+            while self._sent_times and now - self._sent_times[0] >= 1.0:
+                self._sent_times.popleft()
+
+            wait = 0.0
+            if len(self._sent_times) >= self.global_rate:
+                wait = 1.0 - (now - self._sent_times[0])
+            last = self._last_chat_send.get(chat_id)
+            if last is not None:
+                wait = max(wait, self.chat_interval - (now - last))
+            ready_at = self._chat_ready_at.get(chat_id)
+            if ready_at is not None:
+                if ready_at <= now:
+                    del self._chat_ready_at[chat_id]
+                else:
+                    wait = max(wait, ready_at - now)
+
+            if wait <= 0:
+                self._sent_times.append(now)
+                self._last_chat_send[chat_id] = now
+                return
+            self.stats_counters['throttled'] += 1
+            await asyncio.sleep(wait)
+
+    async def _send(self, message: dict):
+        """Mesajı gönder, 429 ve geçici ağ hatalarında tekrar dene"""
+        while True:
+            await self._throttle(message['chat_id'])
+            try:
+                await self._get_bot(message['bot']).send_message(
+                    chat_id=message['chat_id'],
+                    text=message['text'],
+                    parse_mode=message['parse_mode']
+                )
+                self.stats_counters['sent'] += 1
+                if message.get('count', 1) > 1:
+                    self.stats_counters['digests'] += 1
+                return
+            except RetryAfter as e:
+                # Telegram'ın istediği kadar bekle (429)
+                retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else e.retry_after
+                self.stats_counters['retry_after'] += 1
+                logger.warning(f"Telegram hız sınırı, {retry_after} sn bekleniyor: {message['chat_id']}")
+                # Yalnızca bu sohbet bekler (_throttle), diğer sohbetlerin kuyrukları işlemeye devam eder
+                self._chat_ready_at[message['chat_id']] = time.monotonic() + retry_after
+            except (TimedOut, NetworkError) as e:
+                message['attempts'] += 1
+                if message['attempts'] >= MAX_ATTEMPTS:
+                    self.stats_counters['failed'] += 1
+                    logger.error(f"Bildirim gönderilemedi ({message['chat_id']}): {str(e)}")
+                    return
+                self.stats_counters['retried'] += 1
+                await asyncio.sleep(min(2 ** message['attempts'], 30))
+            except TelegramError as e:
+                # Kalıcı hata (ör. bot engellenmiş): tekrar denemek anlamsız
+                self.stats_counters['failed'] += 1
+                logger.error(f"Bildirim gönderilemedi ({message['chat_id']}): {str(e)}")
+                return
+
+    def get_stats(self) -> dict:
+        """Bekleyen mesaj sayısı ve gönderim sayaçları"""
+        stats = {
+            'queue_depth': self._pending,
+            'queue_size': self.maxsize,
+            'active_chats': len(self._lane_tasks),
+            'running': self._running
+        }
+        for key in ('queued', 'sent', 'failed', 'retried', 'retry_after', 'merged', 'digests', 'throttled', 'dropped'):
+            stats[key] = self.stats_counters[key]
+        return stats
+
+    async def stop(self, timeout: float = 10.0):
+        """Bekleyen mesajların gönderilmesini bekle (en fazla timeout saniye) ve görevleri durdur"""
+        if not self._running:
+            return
+        if self._pending:
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Bildirim kuyruğunda gönderilmemiş {self._pending} mesaj kaldı")
+        tasks = list(self._lane_tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._lane_tasks.clear()
+        self._lanes.clear()
+        self._pending = 0
+        self._running = False
+
+        # Dağıtıcının kendi oluşturduğu botların HTTP istemcilerini kapat
+        for bot in self._owned_bots:
+            try:
+                await bot.shutdown()
+            except Exception as e:
+                logger.error(f"Bildirim botu kapatma hatası: {str(e)}")
+        self._owned_bots.clear()
+        self._bots = {'main': self._bots.get('main')}
+
+
+# Süreç genelinde paylaşılan dağıtıcı
+_shared_dispatcher = None
+
+
+def get_notification_dispatcher() -> NotificationDispatcher:
+    """Paylaşılan NotificationDispatcher örneğini döndür (ilk çağrıda oluşturulur)"""
+    global _shared_dispatcher
+    if _shared_dispatcher is None:
+        _shared_dispatcher = NotificationDispatcher()
+    return _shared_dispatcher
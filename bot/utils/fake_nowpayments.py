@@ -0,0 +1,110 @@
+"""Çevrimdışı geliştirme ve test için sahte NowPayments API sunucusu
+
+Çalıştırma:
+    python -m bot.utils.fake_nowpayments --port 8089
+
+Ardından .env içinde NOWPAYMENTS_API_URL=http://127.0.0.1:8089/v1 ayarlanır.
+"""
+import argparse
+import asyncio
+import itertools
+from aiohttp import web
+
+
+class FakeNowPayments:
+    """NowPayments'ın /v1/payment uçlarını taklit eden aiohttp sunucusu
+
+    `fail_next` kadar sonraki istek 503 ile, `delay` saniye gecikmeyle yanıtlanır;
+    tekrar deneme, zaman aşımı ve devre kesici davranışları böylece denenebilir.
+    `set_status` ile bir ödemenin durumu değiştirilebilir.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8089):
+        self.host = host
+        self.port = port
+        self.payments = {}
+        self.fail_next = 0
+        self.delay = 0.0
+        self.requests = 0
+        self._ids = itertools.count(5000000000)
+        self._runner = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    def set_status(self, payment_id, status: str):
+        """Ödeme durumunu değiştir (ör. 'finished')"""
+        self.payments[str(payment_id)]["payment_status"] = status
+
+    async def _prelude(self):
+        """Gecikme ve hata enjeksiyonu; hata verilecekse yanıtı döndür"""
+        self.requests += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail_next > 0:
+            self.fail_next -= 1
+            return web.json_response({"message": "Service Unavailable"}, status=503)
+        return None
+
+    async def create_payment(self, request: web.Request) -> web.Response:
+        failure = await self._prelude()
+        if failure is not None:
+            return failure
+
+        body = await request.json()
+        payment_id = str(next(self._ids))
+        payment = {
+            "payment_id": payment_id,
+            "payment_status": "waiting",
+            "pay_address": f"TFake{payment_id}",
+            "price_amount": body.get("price_amount"),
+            "price_currency": body.get("price_currency"),
+            "pay_amount": round(float(body.get("price_amount") or 0) / 40.0, 2),
+            "pay_currency": body.get("pay_currency", "USDTTRC20"),
+            "order_id": body.get("order_id"),
+            "order_description": body.get("order_description")
+        }
+        self.payments[payment_id] = payment
+        return web.json_response(payment, status=201)
+
+    async def get_payment(self, request: web.Request) -> web.Response:
+        failure = await self._prelude()
+        if failure is not None:
+            return failure
+
+        payment = self.payments.get(request.match_info["payment_id"])
+        if payment is None:
+            return web.json_response({"message": "Payment not found"}, status=404)
+        return web.json_response(payment)
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/v1/payment', self.create_payment)
+        app.router.add_get('/v1/payment/{payment_id}', self.get_payment)
+        return app
+
+    async def start(self):
+        self._runner = web.AppRunner(self.make_app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sahte NowPayments API sunucusu")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    args = parser.parse_args()
+
+    fake = FakeNowPayments(args.host, args.port)
+    print(f"Sahte NowPayments API: {fake.base_url}")
+    web.run_app(fake.make_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import asyncio
+import time
+from collections import defaultdict
+from pathlib import Path
+import aiohttp
+from telegram import File
+from bot.config import logger, IMGBB_API_KEY, IMGBB_UPLOAD_URL, IMGBB_TIMEOUT, IMGBB_CHUNK_SIZE
+from bot.utils.metrics import EXTERNAL_LATENCY
+
+
+class ImgBBError(Exception):
+    """ImgBB yüklemesi başarısız olduğunda fırlatılır"""
+
+
+class ImgBBUploader:
+    """Telegram dosyalarını ImgBB'ye akış halinde yükleyen paylaşılan istemci
+
+    Dosya belleğe alınıp base64'e çevrilmez; Telegram'dan gelen parçalar
+    `chunk_size` baytlık bloklar halinde doğrudan multipart isteğine aktarılır.
+    Böylece eşzamanlı yükleme başına bellekte yalnızca birkaç blok tutulur.
+    Oturum (keep-alive bağlantıları ile) ilk yüklemede açılır ve süreç boyunca
+    yeniden kullanılır. Yükleme süresi ve boyutu `get_stats` ile izlenir.
+    """
+
+    def __init__(self, api_key: str = IMGBB_API_KEY, upload_url: str = IMGBB_UPLOAD_URL,
+                 timeout: float = IMGBB_TIMEOUT, chunk_size: int = IMGBB_CHUNK_SIZE):
+        self.api_key = api_key
+        self.upload_url = upload_url
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=min(timeout, 10))
+        self.chunk_size = chunk_size
+        self._session = None
+        self.in_flight = 0
+        self.stats_counters = defaultdict(int)
+        self.max_seconds = 0.0
+        self.total_seconds = 0.0
+        self.max_bytes = 0
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Oturumu ilk kullanımda oluştur"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=20, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def iter_chunks(self, telegram_file: File, counter: dict = None, digest=None):
+        """Telegram dosyasını parça parça oku
+
+        counter verilirse okunan bayt sayısı counter['bytes'] içinde toplanır,
+        digest (hashlib nesnesi) verilirse her parça ile güncellenir.
+        """
+        counter = counter if counter is not None else {'bytes': 0}
+        file_path = telegram_file.file_path
+        local_path = Path(file_path)
+        if not file_path.startswith(('http://', 'https://')) and local_path.is_file():
+            # Yerel Bot API sunucusu: dosya diskte, bloklar halinde oku
+            with local_path.open('rb') as handle:
+                while True:
+                    chunk = await asyncio.to_thread(handle.read, self.chunk_size)
+                    if not chunk:
+                        return
+                    counter['bytes'] += len(chunk)
+                    if digest is not None:
+                        digest.update(chunk)
+                    yield chunk
+
+        async with self._get_session().get(file_path) as response:
+            if response.status != 200:
+                # URL bot token'ını içerdiği için loglanmaz
+                raise ImgBBError(f"Telegram dosyası indirilemedi: {response.status}")
+            async for chunk in response.content.iter_chunked(self.chunk_size):
+                counter['bytes'] += len(chunk)
+                if digest is not None:
+                    digest.update(chunk)
+                yield chunk
+
+    async def upload(self, telegram_file: File, filename: str = None, digest=None) -> str:
+        """Telegram dosyasını ImgBB'ye yükle ve görsel URL'ini döndür
+
+        digest verilirse yükleme sırasında dosya özeti aynı geçişte hesaplanır.
+        """
+        if not self.api_key:
+            raise ImgBBError("ImgBB API anahtarı bulunamadı!")
+        if not self.upload_url:
+            raise ImgBBError("ImgBB API URL'i bulunamadı!")
+
+        filename = filename or Path(telegram_file.file_path or 'dekont').name or 'dekont'
+        counter = {'bytes': 0}
+        form_data = aiohttp.FormData()
+        form_data.add_field('image', self.iter_chunks(telegram_file, counter, digest),
+                            filename=filename, content_type='application/octet-stream')
+
+        self.in_flight += 1
+        self.stats_counters['peak_in_flight'] = max(self.stats_counters['peak_in_flight'], self.in_flight)
+        started = time.monotonic()
+        outcome = 'error'
+        try:
+            async with self._get_session().post(self.upload_url, params={'key': self.api_key}, data=form_data) as response:
+                response_text = await response.text()
+                if response.status != 200:
+                    raise ImgBBError(f"ImgBB API hatası: {response.status}, Yanıt: {response_text[:200]}")
+                try:
+                    data = await response.json(content_type=None)
+                except ValueError:
+                    raise ImgBBError(f"ImgBB API JSON ayrıştırma hatası: {response_text[:200]}")
+                if not data.get('success'):
+                    raise ImgBBError(f"ImgBB API başarısız yanıt: {data}")
+
+            elapsed = time.monotonic() - started
+            self.stats_counters['uploads'] += 1
+            self.stats_counters['bytes'] += counter['bytes']
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+            self.max_bytes = max(self.max_bytes, counter['bytes'])
+            logger.info(f"ImgBB yükleme başarılı: {counter['bytes']} byte, {elapsed * 1000:.0f} ms")
+            outcome = 'ok'
+            return data['data']['url']
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.stats_counters['failures'] += 1
+            raise ImgBBError(f"Bağlantı hatası: {type(e).__name__} {str(e)}")
+        except ImgBBError:
+            self.stats_counters['failures'] += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            EXTERNAL_LATENCY.observe(time.monotonic() - started, service='imgbb', operation='upload', outcome=outcome)
+
+    def get_stats(self) -> dict:
+        """Yükleme sayısı, süre ve boyut istatistikleri"""
+        uploads = self.stats_counters['uploads']
+        return {
+            'uploads': uploads,
+            'failures': self.stats_counters['failures'],
+            'in_flight': self.in_flight,
+            'peak_in_flight': self.stats_counters['peak_in_flight'],
+            'total_bytes': self.stats_counters['bytes'],
+            'avg_bytes': self.stats_counters['bytes'] / uploads if uploads else 0,
+            'max_bytes': self.max_bytes,
+            'avg_ms': self.total_seconds * 1000 / uploads if uploads else 0.0,
+            'max_ms': self.max_seconds * 1000
+        }
+
+    async def close(self):
+        """HTTP oturumunu kapat"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+# Süreç genelinde paylaşılan yükleyici
+_shared_uploader = None
+
+
+def get_imgbb_uploader() -> ImgBBUploader:
+    """Paylaşılan ImgBBUploader örneğini döndür (ilk çağrıda oluşturulur)"""
+    global _shared_uploader
+    if _shared_uploader is None:
+        _shared_uploader = ImgBBUploader()
+    return _shared_uploader
@@ -0,0 +1,117 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import defaultdict
+from bot.config import logger, LOOP_MONITOR_INTERVAL, LOOP_LAG_WARN_MS, LOOP_BLOCK_MS
+from bot.utils.metrics import LOOP_LAG, LOOP_BLOCKS
+
+
+class LoopMonitor:
+    """Event loop gecikmesini ölçen ve loop'u bloklayan kodu yakalayan izleyici
+
+    Loop üzerinde çalışan bir görev her `interval` saniyede uyanır; planlanan
+    ile gerçek uyanma arasındaki fark (zamanlama gecikmesi) metrik olarak
+    kaydedilir ve `lag_warn_ms` üzerindeyse loglanır.
+
+    `block_ms` > 0 ise ayrı bir izleme thread'i görevin uyanmalarını takip
+    eder: loop `block_ms` boyunca uyanamazsa o anda loop thread'inde çalışan
+    kodun yığın izi (stack) loglanır. Her takılma için tek kayıt yazılır.
+    """
+
+    def __init__(self, interval: float = LOOP_MONITOR_INTERVAL, lag_warn_ms: float = LOOP_LAG_WARN_MS,
+                 block_ms: float = LOOP_BLOCK_MS):
+        self.interval = interval
+        self.lag_warn_ms = lag_warn_ms
+        self.block_ms = block_ms
+        self._task = None
+        self._watchdog = None
+        self._stopping = threading.Event()
+        self._loop_thread_id = None
+        # İzleme görevinin bir sonraki beklenen uyanma zamanı (monotonic)
+        self._expected = None
+        self.stats_counters = defaultdict(int)
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+
+    def start(self):
+        """İzlemeyi çalışan event loop üzerinde başlat"""
+        if self.interval <= 0 or (self._task is not None and not self._task.done()):
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._expected = time.monotonic() + self.interval
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        if self.block_ms > 0:
+            self._stopping.clear()
+            self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+            self._watchdog.start()
+        logger.info(f"Event loop izleyicisi başlatıldı ({self.interval} sn aralık, blok eşiği {self.block_ms} ms)")
+
+    async def _run(self):
+        while True:
+            self._expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(time.monotonic() - self._expected, 0.0)
+            LOOP_LAG.observe(lag)
+            self.stats_counters['ticks'] += 1
+            self.total_lag += lag
+            self.max_lag = max(self.max_lag, lag)
+            if self.lag_warn_ms > 0 and lag * 1000 >= self.lag_warn_ms:
+                self.stats_counters['lagged'] += 1
+                logger.warning(f"Event loop gecikmesi: {lag * 1000:.0f} ms")
+
+    def _watch(self):
+        """Loop thread'inin takılmasını izle ve takılan kodun yığın izini logla"""
+        block = self.block_ms / 1000
+        check_every = min(block / 2, self.interval)
+        reported = None
+        while not self._stopping.wait(check_every):
+            expected = self._expected
+            stalled = time.monotonic() - expected
+            if stalled < block or reported == expected:
+                continue
+            # Aynı takılma (aynı beklenen uyanma) için tek kayıt
+            reported = expected
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = ''.join(traceback.format_stack(frame)) if frame is not None else '(yığın izi alınamadı)'
+            self.stats_counters['blocked'] += 1
+            LOOP_BLOCKS.inc()
+            logger.warning(f"Event loop {stalled * 1000:.0f} ms'dir bloklu, çalışan kod:\n{stack}")
+
+    def get_stats(self) -> dict:
+        """Gecikme ve bloklanma istatistikleri"""
+        ticks = self.stats_counters['ticks']
+        return {
+            'ticks': ticks,
+            'avg_lag_ms': self.total_lag * 1000 / ticks if ticks else 0.0,
+            'max_lag_ms': self.max_lag * 1000,
+            'lagged': self.stats_counters['lagged'],
+            'blocked': self.stats_counters['blocked']
+        }
+
+    async def stop(self):
+        """İzleme görevini ve thread'ini durdur"""
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join, 1.0)
+            self._watchdog = None
+
+
+# Süreç genelinde paylaşılan izleyici
+_shared_monitor = None
+
+
+def get_loop_monitor() -> LoopMonitor:
+    """Paylaşılan LoopMonitor örneğini döndür (ilk çağrıda oluşturulur)"""
+    global _shared_monitor
+    if _shared_monitor is None:
+        _shared_monitor = LoopMonitor()
+    return _shared_monitor
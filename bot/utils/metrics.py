@@ -0,0 +1,317 @@
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from aiohttp import web
+from telegram.ext import Application, ConversationHandler
+from bot.config import logger, METRICS_LISTEN, METRICS_PORT
+
+# Süre histogramlarının varsayılan kova sınırları (saniye)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Rapor boyutu kovaları (bayt)
+SIZE_BUCKETS = (10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000, 10_000_000, 50_000_000)
+
+# O anda çalışan DatabaseManager metodu (yavaş sorgu kayıtlarında kullanılır)
+current_db_method = contextvars.ContextVar('current_db_method', default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """Etiketli ölçümlerin ortak temeli"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} etiketleri hatalı: {sorted(labels)} != {sorted(self.labelnames)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """(ek ad, etiket değerleri, ek etiket, değer) dörtlüleri"""
+        with self._lock:
+            return [('', key, '', value) for key, value in self._values.items()]
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Yalnızca artan sayaç"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Anlık değer; `set_function` ile her okumada hesaplanabilir"""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._function = None
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function):
+        """Değerleri okuma anında üreten fonksiyon
+
+        Etiketsiz ölçümde sayı, etiketli ölçümde {etiket değerleri: değer} döndürmelidir.
+        """
+        self._function = function
+
+    def samples(self):
+        if self._function is None:
+            return super().samples()
+        try:
+            result = self._function()
+        except Exception as e:
+            logger.error(f"Metrik okuma hatası ({self.name}): {str(e)}")
+            return []
+        if not isinstance(result, dict):
+            result = {(): result}
+        return [('', tuple(str(part) for part in key), '', value) for key, value in result.items()]
+
+
+class Histogram(_Metric):
+    """Kovalara ayrılmış gözlemler (süre, boyut)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['buckets'][index] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, state in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, state['buckets']):
+                    cumulative += count
+                    samples.append(('_bucket', key, f'le="{_format_value(bound)}"', cumulative))
+                samples.append(('_sum', key, '', state['sum']))
+                samples.append(('_count', key, '', state['count']))
+        return samples
+
+
+class MetricsRegistry:
+    """Süreç genelindeki ölçümler ve Prometheus metin çıktısı"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metrik zaten kayıtlı: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Tüm ölçümleri Prometheus metin biçiminde döndür"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+HANDLER_LATENCY = REGISTRY.histogram(
+    'otoexcel_handler_duration_seconds', 'Telegram handler çalışma süresi', ('handler', 'outcome'))
+DB_LATENCY = REGISTRY.histogram(
+    'otoexcel_db_method_duration_seconds', 'DatabaseManager metot süresi', ('method', 'outcome'))
+DB_POOL_WAIT = REGISTRY.histogram(
+    'otoexcel_db_pool_wait_seconds', 'Havuzdan bağlantı alma bekleme süresi')
+DB_POOL_CONNECTIONS = REGISTRY.gauge(
+    'otoexcel_db_pool_connections', 'Bağlantı havuzundaki bağlantılar', ('state',))
+DB_POOL_MAX_CONNECTIONS = REGISTRY.gauge(
+    'otoexcel_db_pool_max_connections', 'Havuzun açabileceği en fazla bağlantı')
+QUERY_LATENCY = REGISTRY.histogram(
+    'otoexcel_db_query_duration_seconds', 'Tek SQL ifadesinin süresi (çağıran metoda göre)', ('method',))
+SLOW_QUERIES = REGISTRY.counter(
+    'otoexcel_db_slow_queries_total', 'Eşik süresini aşan SQL ifadeleri', ('method',))
+LOOP_LAG = REGISTRY.histogram(
+    'otoexcel_event_loop_lag_seconds', 'Event loop zamanlama gecikmesi',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+LOOP_BLOCKS = REGISTRY.counter(
+    'otoexcel_event_loop_blocks_total', 'Event loop eşik süresinden uzun bloklandı')
+EXTERNAL_LATENCY = REGISTRY.histogram(
+    'otoexcel_external_request_duration_seconds', 'Harici servis çağrı süresi (tekrar denemeler dahil)',
+    ('service', 'operation', 'outcome'))
+FORM_SUBMISSIONS = REGISTRY.counter(
+    'otoexcel_form_submissions_total', 'Form gönderimleri (status: ok, duplicate, insufficient_credits, ...)',
+    ('status',))
+REPORT_SIZE = REGISTRY.histogram(
+    'otoexcel_report_size_bytes', 'Oluşturulan Excel raporlarının boyutu', buckets=SIZE_BUCKETS)
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels):
+    """Bloğun süresini histograma yaz; histogramda 'outcome' etiketi varsa ok/error olarak işaretle"""
+    started = time.perf_counter()
+    outcome = 'ok'
+    try:
+        yield
+    except BaseException:
+        outcome = 'error'
+        raise
+    finally:
+        if 'outcome' in histogram.labelnames:
+            labels['outcome'] = outcome
+        histogram.observe(time.perf_counter() - started, **labels)
+
+
+def timed_handler(callback, name: str = None):
+    """Handler callback'ini süre ölçümüyle sar"""
+    name = name or getattr(callback, '__name__', 'handler')
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        with timed(HANDLER_LATENCY, handler=name):
+            return await callback(update, context)
+
+    wrapper._metrics_wrapped = True
+    return wrapper
+
+
+def instrument_handlers(app: Application):
+    """Uygulamaya eklenmiş tüm handler'ları (konuşmalar dahil) süre ölçümüyle sar"""
+    def instrument(handler):
+        if isinstance(handler, ConversationHandler):
+            nested = list(handler.entry_points) + list(handler.fallbacks)
+            for state_handlers in handler.states.values():
+                nested.extend(state_handlers)
+            for item in nested:
+                instrument(item)
+        elif not getattr(handler.callback, '_metrics_wrapped', False):
+            handler.callback = timed_handler(handler.callback)
+
+    for handlers in app.handlers.values():
+        for handler in handlers:
+            instrument(handler)
+
+
+def instrument_methods(cls):
+    """Sınıfın herkese açık async metotlarını süre ölçümüyle sar
+
+    Metot adı `current_db_method` bağlam değişkenine de yazılır.
+    """
+    for name, function in list(vars(cls).items()):
+        if name.startswith('_') or not inspect.iscoroutinefunction(function):
+            continue
+
+        def wrap(function, name):
+            @functools.wraps(function)
+            async def wrapper(*args, **kwargs):
+                token = current_db_method.set(name)
+                try:
+                    with timed(DB_LATENCY, method=name):
+                        return await function(*args, **kwargs)
+                finally:
+                    current_db_method.reset(token)
+            return wrapper
+
+        setattr(cls, name, wrap(function, name))
+    return cls
+
+
+def bind_database(db_manager):
+    """Bağlantı havuzu göstergelerini DatabaseManager'a bağla"""
+    def connections():
+        stats = db_manager.get_pool_stats()
+        return {
+            ('checked_out',): stats['checked_out'],
+            ('checked_in',): stats['checked_in'],
+            ('overflow',): stats['overflow'],
+            ('sync_checked_out',): stats['sync_checked_out'],
+        }
+
+    DB_POOL_CONNECTIONS.set_function(connections)
+    DB_POOL_MAX_CONNECTIONS.set_function(db_manager.max_connections)
+
+
+class MetricsServer:
+    """Ölçümleri /metrics adresinde sunan yerel HTTP sunucusu"""
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY, host: str = METRICS_LISTEN, port: int = METRICS_PORT):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(
+            body=self.registry.render().encode('utf-8'),
+            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+        )
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Metrik sunucusu dinleniyor: {self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -1,19 +1,21 @@
-import requests
 import logging
-from sqlalchemy import text
 from bot.config import NOTIFICATION_BOT_TOKEN, SUPER_ADMIN_ID, logger
-from bot.database.db_manager import DatabaseManager
+from bot.database.db_manager import get_database_manager
+from bot.utils.user_profiles import get_user_profiles
+from bot.utils.dispatcher import get_notification_dispatcher
 
-async def send_payment_notification(payment_data, admin_id=None):
+async def send_payment_notification(payment_data, admin_id=None, db=None, profiles=None):
     """
     Ödeme bildirimi gönder
     
     Args:
         payment_data (dict): Ödeme verileri
         admin_id (int, optional): Bildirim gönderilecek admin ID'si. Eğer None ise, süper admine gönderilir.
+        db (DatabaseManager, optional): Paylaşılan veritabanı yöneticisi. Verilmezse süreç geneli örnek kullanılır.
+        profiles (UserProfileCache, optional): Kullanıcı adı önbelleği. Verilmezse süreç geneli örnek kullanılır.
     
     Returns:
-        bool: Başarılı ise True, değilse False
+        bool: Bildirim kuyruğa alındıysa True, değilse False
     """
     try:
         # Bildirim her zaman süper admine gönderilir
@@ -55,53 +57,13 @@ async def send_payment_notification(payment_data, admin_id=None):
         if payment_data.get("admin_name"):
             admin_name = payment_data.get("admin_name")
             
-        # Eğer payment_data'da yoksa ve admin_id varsa, veritabanından almayı dene
+        # Eğer payment_data'da yoksa ve admin_id varsa, önbellekli profilden al
         if admin_id and admin_name == "İsimsiz Kullanıcı":
             try:
-                # Önce Telegram API'den kullanıcı bilgilerini almayı dene
-                try:
-                    from telegram import Bot
-                    import asyncio
-                    
-                    # Bot oluştur (notification token değil, ana bot token kullan)
-                    from bot.config import TOKEN
-                    bot = Bot(token=TOKEN)
-                    
-                    # Kullanıcı bilgilerini al
-                    user = await bot.get_chat(admin_id)
-                    
-                    # Kullanıcı adını al (varsa)
-                    if user.username:
-                        admin_username = user.username
-                        admin_name = user.username  # Kullanıcı adını admin adı olarak kullan
-                    else:
-                        # Kullanıcı adı yoksa, adını kullan
-                        telegram_name = user.first_name
-                        if user.last_name:
-                            telegram_name += f" {user.last_name}"
-                        admin_name = telegram_name
-                        admin_username = telegram_name
-                    
-                    logger.info(f"Admin bilgileri Telegram API'den alındı: {admin_name} ({admin_username})")
-                except Exception as e:
-                    logger.error(f"Telegram API'den kullanıcı bilgileri alma hatası: {str(e)}")
-                    
-                    # Telegram API'den alınamazsa, veritabanından almayı dene
-                    db = DatabaseManager()
-                    # Veritabanından admin bilgilerini al
-                    with db.engine.connect() as conn:
-                        logger.info(f"Admin bilgisi sorgulanıyor: admin_id={admin_id}")
-                        result = conn.execute(text("""
-                            SELECT admin_name FROM group_admins 
-                            WHERE user_id = :user_id
-                        """), {"user_id": admin_id})
-                        admin_data = result.fetchone()
-                        logger.info(f"Veritabanı sorgu sonucu: {admin_data}")
-                        if admin_data and admin_data[0]:
-                            admin_name = admin_data[0]
-                            logger.info(f"Admin adı veritabanından alındı: {admin_name}")
-                        else:
-                            logger.warning(f"Admin adı veritabanında bulunamadı: {admin_id}")
+                profile = await (profiles or get_user_profiles()).resolve(admin_id, db or get_database_manager())
+                admin_name = profile["admin_name"]
+                admin_username = profile["admin_username"]
+                logger.info(f"Admin bilgileri alındı: {admin_name} ({admin_username})")
             except Exception as e:
                 logger.error(f"Admin bilgisi alma hatası: {str(e)}")
         
@@ -125,30 +87,13 @@ async def send_payment_notification(payment_data, admin_id=None):
             logger.warning("Bildirim botu token'ı ayarlanmamış. Bildirim gönderilemiyor.")
             return False
         
-        # Telegram API URL
-        url = f"https://api.telegram.org/bot{NOTIFICATION_BOT_TOKEN}/sendMessage"
-        
-        # API isteği için gerekli parametreler
-        payload = {
-            "chat_id": user_id,
-            "text": message,
-            "parse_mode": "Markdown"
-        }
-        
-        # API isteği gönder
-        try:
-            response = requests.post(url, json=payload)
-            
-            # Yanıtı kontrol et
-            if response.status_code == 200:
-                logger.info(f"Ödeme bildirimi gönderildi: {user_id}")
-                return True
-            else:
-                logger.error(f"Ödeme bildirimi gönderme hatası: {response.status_code} - {response.text}")
-                return False
-        except Exception as e:
-            logger.error(f"Bildirim gönderme isteği hatası: {str(e)}")
-            return False
+        # Kuyruğa bırak; gönderim, hız sınırları ve özetleme dağıtıcıda yapılır
+        queued = get_notification_dispatcher().notify(
+            user_id, message, bot='notify', parse_mode="Markdown", digest=True
+        )
+        if queued:
+            logger.info(f"Ödeme bildirimi kuyruğa alındı: {user_id}")
+        return queued
             
     except Exception as e:
         logger.error(f"Ödeme bildirimi gönderme hatası: {str(e)}")
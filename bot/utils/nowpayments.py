@@ -0,0 +1,172 @@
+import asyncio
+import random
+import time
+import aiohttp
+from bot.config import (
+    logger, NOWPAYMENTS_API_KEY, NOWPAYMENTS_API_URL, NOWPAYMENTS_TIMEOUT,
+    NOWPAYMENTS_RETRIES, NOWPAYMENTS_BREAKER_THRESHOLD, NOWPAYMENTS_BREAKER_RESET
+)
+from bot.utils.metrics import timed, EXTERNAL_LATENCY
+
+# Tekrar denenebilecek HTTP durum kodları
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class NowPaymentsError(Exception):
+    """NowPayments API isteği başarısız olduğunda fırlatılır"""
+
+    def __init__(self, message: str, status: int = None):
+        super().__init__(message)
+        self.status = status
+
+
+class CircuitOpenError(NowPaymentsError):
+    """Devre kesici açıkken yapılan isteklerde fırlatılır"""
+
+
+class CircuitBreaker:
+    """Ardışık hatalardan sonra istekleri bir süre kesen devre kesici
+
+    `failure_threshold` ardışık hatada devre açılır; `reset_timeout` saniye
+    sonra tek bir deneme isteğine izin verilir (yarı açık). Deneme başarılı
+    olursa devre kapanır, başarısız olursa yeniden açılır.
+    """
+
+    def __init__(self, failure_threshold: int = NOWPAYMENTS_BREAKER_THRESHOLD,
+                 reset_timeout: float = NOWPAYMENTS_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self) -> bool:
+        """İstek gönderilebilir mi?"""
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'half-open' and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            logger.warning(f"NowPayments devre kesici açıldı ({self.failures} ardışık hata)")
+
+
+class NowPaymentsClient:
+    """NowPayments API için paylaşılan, bağlantı havuzlu asenkron HTTP istemcisi
+
+    Oturum (keep-alive bağlantıları ile) ilk istekte açılır ve süreç boyunca
+    yeniden kullanılır. İdempotent isteklerde ağ hataları, zaman aşımları ve
+    429/5xx yanıtları üstel geri çekilme ile tekrar denenir.
+    """
+
+    def __init__(self, api_key: str = NOWPAYMENTS_API_KEY, base_url: str = NOWPAYMENTS_API_URL,
+                 timeout: float = NOWPAYMENTS_TIMEOUT, retries: int = NOWPAYMENTS_RETRIES,
+                 backoff: float = 0.5, breaker: CircuitBreaker = None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=min(timeout, 5))
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Oturumu ilk kullanımda oluştur"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=20, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                headers={"x-api-key": self.api_key or ""}
+            )
+        return self._session
+
+    async def _request(self, method: str, path: str, payload: dict = None, idempotent: bool = True) -> dict:
+        """İsteği tekrar deneme ve devre kesici ile gönder, JSON yanıtı döndür
+
+        İdempotent olmayan isteklerde (ödeme oluşturma) yalnızca bağlantı
+        kurulamama hatası (ClientConnectorError) tekrar denenir; zaman aşımı
+        ve 429/5xx yanıtlarında istek sunucuya ulaşmış olabilir ve tekrar
+        denemek ikinci bir ödeme açabilir.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError("NowPayments API geçici olarak devre dışı")
+
+        url = f"{self.base_url}{path}"
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                # Üstel geri çekilme + rastgele sapma
+                await asyncio.sleep(self.backoff * (2 ** (attempt - 1)) * (1 + random.random()))
+            try:
+                async with self._get_session().request(method, url, json=payload) as response:
+                    if response.status in (200, 201):
+                        data = await response.json(content_type=None)
+                        self.breaker.record_success()
+                        return data
+
+                    body = await response.text()
+                    last_error = NowPaymentsError(f"API Hatası: {response.status} - {body}", response.status)
+                    if response.status not in RETRY_STATUSES:
+                        # İstemci hatası: tekrar denemek anlamsız, servis ayakta sayılır
+                        self.breaker.record_success()
+                        raise last_error
+                    if not idempotent:
+                        break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = NowPaymentsError(f"Bağlantı hatası: {type(e).__name__} {str(e)}")
+                if not idempotent and not isinstance(e, aiohttp.ClientConnectorError):
+                    break
+
+            logger.warning(f"NowPayments isteği başarısız ({attempt + 1}/{self.retries + 1}): {str(last_error)}")
+
+        self.breaker.record_failure()
+        raise last_error
+
+    async def create_payment(self, payload: dict) -> dict:
+        """Yeni ödeme oluştur"""
+        with timed(EXTERNAL_LATENCY, service='nowpayments', operation='create_payment'):
+            return await self._request("POST", "/payment", payload, idempotent=False)
+
+    async def get_payment(self, payment_id) -> dict:
+        """Ödeme durumunu getir"""
+        with timed(EXTERNAL_LATENCY, service='nowpayments', operation='get_payment'):
+            return await self._request("GET", f"/payment/{payment_id}")
+
+    async def close(self):
+        """HTTP oturumunu kapat"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+# Süreç genelinde paylaşılan istemci
+_shared_client = None
+
+
+def get_nowpayments_client() -> NowPaymentsClient:
+    """Paylaşılan NowPaymentsClient örneğini döndür (ilk çağrıda oluşturulur)"""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = NowPaymentsClient()
+    return _shared_client
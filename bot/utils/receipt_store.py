@@ -0,0 +1,112 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+from telegram import File
+from bot.config import logger, RECEIPT_STORE_BACKEND, RECEIPT_STORE_DIR, RECEIPT_PUBLIC_URL
+from bot.utils.imgbb import ImgBBUploader, get_imgbb_uploader
+
+# Desteklenen depolama arka uçları
+BACKENDS = ('imgbb', 'filesystem')
+
+
+class ReceiptStore:
+    """İçerik adresli dekont deposu
+
+    Her dekont SHA-256 özetiyle bir kez saklanır. Telegram'ın file_unique_id
+    değeri özete bağlanır; aynı dosya tekrar gönderildiğinde indirme veya
+    yükleme yapılmadan mevcut referans döndürülür.
+
+    'imgbb' arka ucunda dosya ImgBB'ye akış halinde yüklenirken özet aynı
+    geçişte hesaplanır; içerik zaten kayıtlıysa mevcut URL kullanılır.
+    'filesystem' arka ucunda dosya `directory/<ilk 2 karakter>/<sha256>`
+    yoluna yazılır ve harici bir servise ihtiyaç duyulmaz.
+    """
+
+    def __init__(self, db, backend: str = RECEIPT_STORE_BACKEND, directory: str = RECEIPT_STORE_DIR,
+                 public_url: str = RECEIPT_PUBLIC_URL, uploader: ImgBBUploader = None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Geçersiz dekont deposu: {backend}")
+        self.db = db
+        self.backend = backend
+        self.directory = Path(directory)
+        self.public_url = public_url.rstrip('/')
+        self.uploader = uploader or get_imgbb_uploader()
+        self.stats_counters = defaultdict(int)
+
+    async def lookup(self, file_unique_id: str) -> dict:
+        """file_unique_id ile kayıtlı dekontu getir (yoksa None)"""
+        receipt = await self.db.get_receipt_by_file(file_unique_id)
+        if receipt:
+            self.stats_counters['file_hits'] += 1
+        return receipt
+
+    async def put(self, telegram_file: File, file_unique_id: str = None, mime_type: str = None) -> dict:
+        """Dekontu depola ve kaydı döndür
+
+        Dönen sözlükte sha256, url ve submission_id bulunur; 'created' False ise
+        aynı içerik daha önce kaydedilmiştir. Hata durumunda None döner.
+        """
+        digest = hashlib.sha256()
+        if self.backend == 'filesystem':
+            url, size = await self._write_file(telegram_file, digest)
+        else:
+            url = await self.uploader.upload(telegram_file, digest=digest)
+            size = telegram_file.file_size
+
+        receipt = await self.db.save_receipt(
+            digest.hexdigest(), url, self.backend,
+            file_unique_id=file_unique_id,
+            size_bytes=size,
+            mime_type=mime_type
+        )
+        if receipt is None:
+            return None
+
+        if receipt['created']:
+            self.stats_counters['stored'] += 1
+        else:
+            # Aynı içerik farklı bir Telegram dosyası olarak gönderilmiş
+            self.stats_counters['content_hits'] += 1
+            logger.info(f"Dekont içeriği zaten kayıtlı: {receipt['sha256'][:12]}")
+        return receipt
+
+    def _reference(self, sha256: str) -> str:
+        """Dosya sistemi kaydı için dışarıya verilen referans"""
+        if self.public_url:
+            return f"{self.public_url}/{sha256}"
+        return f"dekont:{sha256}"
+
+    async def _write_file(self, telegram_file: File, digest) -> tuple:
+        """Dosyayı geçici dosyaya akıtıp özet adıyla yerine taşı"""
+        await asyncio.to_thread(self.directory.mkdir, parents=True, exist_ok=True)
+        counter = {'bytes': 0}
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as handle:
+                async for chunk in self.uploader.iter_chunks(telegram_file, counter, digest):
+                    await asyncio.to_thread(handle.write, chunk)
+
+            sha256 = digest.hexdigest()
+            target = self.directory / sha256[:2] / sha256
+            if target.exists():
+                os.unlink(temp_path)
+            else:
+                await asyncio.to_thread(target.parent.mkdir, exist_ok=True)
+                os.replace(temp_path, target)
+            return self._reference(sha256), counter['bytes']
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    def get_stats(self) -> dict:
+        """Depolama ve tekrar kullanım sayaçları"""
+        return {
+            'backend': self.backend,
+            'stored': self.stats_counters['stored'],
+            'file_hits': self.stats_counters['file_hits'],
+            'content_hits': self.stats_counters['content_hits']
+        }
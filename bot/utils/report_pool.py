@@ -0,0 +1,62 @@
+import asyncio
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from bot.config import logger, REPORT_WORKERS, REPORT_PER_ADMIN_LIMIT
+
+
+class ReportBusyError(Exception):
+    """Admin eşzamanlı rapor sınırına ulaştığında fırlatılır"""
+
+
+class ReportPool:
+    """Excel raporlarını event loop dışında, sınırlı bir süreç havuzunda oluşturur
+
+    Her admin için aynı anda en fazla `per_admin_limit` rapor işi çalışabilir;
+    böylece tek bir yoğun kullanıcı tüm işçileri meşgul edemez.
+    """
+
+    def __init__(self, max_workers: int = REPORT_WORKERS, per_admin_limit: int = REPORT_PER_ADMIN_LIMIT):
+        self.max_workers = max_workers
+        self.per_admin_limit = per_admin_limit
+        self._executor = None
+        self._active = defaultdict(int)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Süreç havuzunu ilk kullanımda oluştur"""
+        if self._executor is None:
+            # fork yerine spawn: event loop ve thread'lerin kopyalanmasını önler
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            logger.info(f"Rapor süreç havuzu başlatıldı ({self.max_workers} işçi)")
+        return self._executor
+
+    def is_busy(self, admin_id) -> bool:
+        """Adminin rapor sınırı dolu mu?"""
+        return self._active.get(admin_id, 0) >= self.per_admin_limit
+
+    def active_jobs(self) -> int:
+        """Çalışan veya sırada bekleyen rapor işi sayısı"""
+        return sum(self._active.values())
+
+    async def run(self, admin_id, func, *args):
+        """İşi süreç havuzunda çalıştır ve sonucunu bekle"""
+        if self.is_busy(admin_id):
+            raise ReportBusyError(f"Admin {admin_id} için rapor sınırı dolu")
+
+        self._active[admin_id] += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self._active[admin_id] -= 1
+            if self._active[admin_id] <= 0:
+                del self._active[admin_id]
+
+    def shutdown(self):
+        """Süreç havuzunu kapat"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
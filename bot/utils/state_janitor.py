@@ -0,0 +1,76 @@
+import time
+from collections import defaultdict
+from telegram import Update
+from telegram.ext import ContextTypes
+from bot.config import logger, USER_DATA_TTL
+
+
+class StateJanitor:
+    """Uzun süre dokunulmayan user_data / chat_data kayıtlarını temizleyen yardımcı
+
+    `touch` her güncellemeden önce (handler grubu -1) kullanıcı ve sohbetin son
+    görülme zamanını kaydeder. `compact` periyodik olarak çalışır: `ttl`
+    saniyedir güncelleme göndermeyen kullanıcı ve sohbetlerin verisini bellekten
+    ve persistence'tan siler, ardından persistence'ın kendi temizliğini
+    çalıştırır. Böylece yarıda bırakılan /form ve /bakiyeyukle akışlarının
+    verisi süresiz birikmez.
+    """
+
+    def __init__(self, ttl: float = USER_DATA_TTL):
+        self.ttl = ttl
+        self._started = time.monotonic()
+        self._last_seen = {'user': {}, 'chat': {}}
+        self.stats_counters = defaultdict(int)
+
+    async def touch(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Güncellemenin kullanıcı ve sohbetini görüldü olarak işaretle"""
+        now = time.monotonic()
+        if update.effective_user is not None:
+            self._last_seen['user'][update.effective_user.id] = now
+        if update.effective_chat is not None:
+            self._last_seen['chat'][update.effective_chat.id] = now
+
+    def _expired(self, scope: str, key_id: int, now: float) -> bool:
+        # Süreç başladıktan beri hiç görülmeyenler (persistence'tan yüklenenler) başlangıç zamanıyla değerlendirilir
+        return now - self._last_seen[scope].get(key_id, self._started) > self.ttl
+
+    async def compact(self, context: ContextTypes.DEFAULT_TYPE):
+        """Süresi dolan kullanıcı/sohbet verisini sil ve persistence'ı sıkıştır"""
+        try:
+            application = context.application
+            now = time.monotonic()
+            dropped = {'user': 0, 'chat': 0}
+
+            for user_id in list(application.user_data):
+                if self._expired('user', user_id, now):
+                    application.drop_user_data(user_id)
+                    self._last_seen['user'].pop(user_id, None)
+                    dropped['user'] += 1
+            for chat_id in list(application.chat_data):
+                if self._expired('chat', chat_id, now):
+                    application.drop_chat_data(chat_id)
+                    self._last_seen['chat'].pop(chat_id, None)
+                    dropped['chat'] += 1
+
+            # Belleğinde veri kalmamış kimliklerin son görülme kayıtlarını da sil
+            for scope, live in (('user', application.user_data), ('chat', application.chat_data)):
+                for key_id in [key_id for key_id in self._last_seen[scope] if key_id not in live and self._expired(scope, key_id, now)]:
+                    del self._last_seen[scope][key_id]
+
+            self.stats_counters['dropped_user_data'] += dropped['user']
+            self.stats_counters['dropped_chat_data'] += dropped['chat']
+            self.stats_counters['runs'] += 1
+
+            removed = {}
+            if hasattr(application.persistence, 'compact'):
+                removed = await application.persistence.compact(self.ttl)
+
+            if dropped['user'] or dropped['chat'] or any(removed.values()):
+                logger.info(f"Durum temizliği: bellekten {dropped['user']} kullanıcı, {dropped['chat']} sohbet verisi; "
+                            f"persistence'tan {removed} kayıt silindi")
+        except Exception as e:
+            logger.error(f"Durum temizliği hatası: {str(e)}")
+
+    def get_stats(self) -> dict:
+        """Temizlik sayaçları"""
+        return {key: self.stats_counters[key] for key in ('runs', 'dropped_user_data', 'dropped_chat_data')}
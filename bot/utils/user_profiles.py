@@ -0,0 +1,89 @@
+from telegram import Bot
+from bot.config import logger, TOKEN, PROFILE_CACHE_TTL, PROFILE_CACHE_SIZE
+from bot.utils.cache import TTLCache, MISSING
+
+# Ad çözülemediğinde kullanılan varsayılan değerler
+DEFAULT_ADMIN_NAME = "İsimsiz Kullanıcı"
+DEFAULT_USERNAME = "Bilinmiyor"
+
+
+class UserProfileCache:
+    """Ödeme akışlarında kullanılan Telegram kullanıcı adı önbelleği
+
+    `get_chat` ile alınan kullanıcı adı önbelleğe alınır; aynı ödeme olayı
+    için adres oluşturma, durum kontrolü ve bildirim aynı kaydı kullanır.
+    Uygulamanın bot örneği `bind` ile bağlanır, böylece her çağrıda yeni bir
+    HTTP istemcisi kurulmaz.
+    """
+
+    def __init__(self, bot: Bot = None, maxsize: int = PROFILE_CACHE_SIZE, ttl: float = PROFILE_CACHE_TTL):
+        self._bot = bot
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def bind(self, bot: Bot):
+        """Uygulamanın bot örneğini bağla"""
+        self._bot = bot
+
+    @property
+    def bot(self) -> Bot:
+        # Uygulama dışında (ör. betiklerde) kullanılırsa tek bir yedek örnek oluştur
+        if self._bot is None:
+            self._bot = Bot(token=TOKEN)
+        return self._bot
+
+    async def telegram_name(self, user_id) -> str:
+        """Telegram kullanıcı adını (yoksa ad soyadı) döndür, alınamazsa None"""
+        cache_key = str(user_id)
+        cached = self.cache.get(cache_key)
+        if cached is not MISSING:
+            return cached
+
+        try:
+            user = await self.bot.get_chat(user_id)
+        except Exception as e:
+            # Hata önbelleğe alınmaz, sonraki çağrı yeniden dener
+            logger.error(f"Telegram API'den kullanıcı bilgileri alma hatası: {str(e)}")
+            return None
+
+        if user.username:
+            name = user.username
+        else:
+            # Kullanıcı adı yoksa, adını kullan
+            name = user.first_name
+            if user.last_name:
+                name += f" {user.last_name}"
+
+        self.cache.set(cache_key, name)
+        logger.info(f"Kullanıcı bilgileri Telegram API'den alındı: {name}")
+        return name
+
+    async def resolve(self, user_id, db=None) -> dict:
+        """Kullanıcının admin_name ve admin_username bilgilerini döndür
+
+        admin_username Telegram kullanıcı adıdır (yoksa ad soyad). admin_name
+        veritabanındaki admin adıdır; admin değilse Telegram adı kullanılır.
+        Yalnızca Telegram kısmı önbelleğe alınır, admin adı her seferinde
+        veritabanından okunur.
+        """
+        username = await self.telegram_name(user_id)
+        admin_name = await db.get_admin_name(user_id) if db is not None else None
+        return {
+            "admin_name": admin_name or username or DEFAULT_ADMIN_NAME,
+            "admin_username": username or DEFAULT_USERNAME
+        }
+
+    def invalidate(self, user_id):
+        """Kullanıcının önbellekteki kaydını sil"""
+        self.cache.invalidate(str(user_id))
+
+
+# Süreç genelinde paylaşılan önbellek
+_shared_profiles = None
+
+
+def get_user_profiles() -> UserProfileCache:
+    """Paylaşılan UserProfileCache örneğini döndür (ilk çağrıda oluşturulur)"""
+    global _shared_profiles
+    if _shared_profiles is None:
+        _shared_profiles = UserProfileCache()
+    return _shared_profiles
@@ -0,0 +1,110 @@
+import hashlib
+import hmac
+import json
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+from bot.config import (
+    logger, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET_TOKEN,
+    NOWPAYMENTS_IPN_PATH, NOWPAYMENTS_IPN_SECRET
+)
+
+
+def _normalize_numbers(value):
+    """Tam sayı değerli float'ları int'e çevir (JS JSON.stringify 1.0'ı "1" yazar)"""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, dict):
+        return {key: _normalize_numbers(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_normalize_numbers(item) for item in value]
+    return value
+
+
+def verify_ipn_signature(payload: dict, signature: str, secret: str = NOWPAYMENTS_IPN_SECRET) -> bool:
+    """NowPayments IPN imzasını doğrula
+
+    İmza, anahtarları sıralanmış ve boşluksuz JSON'un IPN gizli anahtarıyla
+    HMAC-SHA512 özetidir ve x-nowpayments-sig başlığında gelir.
+    """
+    if not secret or not signature:
+        return False
+    message = json.dumps(_normalize_numbers(payload), sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    expected = hmac.new(secret.encode(), message.encode(), hashlib.sha512).hexdigest()
+    return hmac.compare_digest(expected, signature.strip().lower())
+
+
+class WebhookServer:
+    """Telegram webhook güncellemelerini ve NowPayments IPN bildirimlerini alan HTTP sunucusu
+
+    Telegram güncellemeleri gizli token başlığı doğrulanarak uygulamanın
+    update_queue'suna bırakılır; IPN bildirimleri imzası doğrulandıktan sonra
+    `ipn_handler` ile işlenir. İşleme başarısız olursa 500 döner, böylece
+    NowPayments bildirimi tekrar gönderir.
+    """
+
+    def __init__(self, application: Application, ipn_handler=None,
+                 host: str = WEBHOOK_LISTEN, port: int = WEBHOOK_PORT):
+        self.application = application
+        self.ipn_handler = ipn_handler
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        """Telegram'dan gelen güncellemeyi kuyruğa al"""
+        if WEBHOOK_SECRET_TOKEN:
+            token = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+            if not hmac.compare_digest(token, WEBHOOK_SECRET_TOKEN):
+                logger.warning("Webhook isteği geçersiz gizli token ile reddedildi")
+                return web.Response(status=403)
+
+        try:
+            data = await request.json()
+        except json.JSONDecodeError:
+            return web.Response(status=400)
+
+        update = Update.de_json(data, self.application.bot)
+        await self.application.update_queue.put(update)
+        return web.Response()
+
+    async def handle_ipn(self, request: web.Request) -> web.Response:
+        """NowPayments IPN bildirimini doğrula ve işle"""
+        try:
+            payload = json.loads(await request.read())
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return web.Response(status=400)
+        # IPN gövdesi her zaman JSON nesnesidir (dizi, sayı vb. reddedilir)
+        if not isinstance(payload, dict):
+            return web.Response(status=400)
+
+        if not verify_ipn_signature(payload, request.headers.get('x-nowpayments-sig', '')):
+            logger.warning(f"Geçersiz IPN imzası: payment_id={payload.get('payment_id')}")
+            return web.Response(status=403)
+
+        if self.ipn_handler is None:
+            return web.Response(status=503)
+
+        success = await self.ipn_handler(payload)
+        return web.Response(status=200 if success else 500)
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.Response(text="ok")
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(WEBHOOK_PATH, self.handle_update)
+        app.router.add_post(NOWPAYMENTS_IPN_PATH, self.handle_ipn)
+        app.router.add_get('/health', self.health)
+        return app
+
+    async def start(self):
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Webhook sunucusu dinleniyor: {self.host}:{self.port}")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,61 @@
+import asyncio
+import os
+import sys
+import pytest
+
+# bot.config içe aktarılırken zorunlu ortam değişkenleri
+os.environ.setdefault('SUPER_ADMIN_ID', '1')
+os.environ.setdefault('BOT_TOKEN', '123456:test-token')
+os.environ.setdefault('POSTGRES_ENCRYPTION_KEY', 'test-encryption-key')
+
+# Veritabanı testleri ayrı bir PostgreSQL (pgcrypto ile) veritabanında çalışır; tablolar her testte boşaltılır
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+if TEST_DATABASE_URL:
+    os.environ['DATABASE_URL'] = TEST_DATABASE_URL
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'bot'))
+
+DATA_TABLES = (
+    'groups', 'forms', 'group_admins', 'admin_groups', 'group_credits', 'admin_credits',
+    'form_submissions', 'submission_values', 'payments', 'receipts', 'receipt_files', 'receipt_uploads',
+    'cache_versions', 'persistence_user_data', 'persistence_chat_data', 'persistence_singletons',
+    'persistence_conversations'
+)
+
+
+@pytest.fixture(scope='session')
+def _database_manager():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL tanımlı değil (pgcrypto yüklü bir test veritabanı gerekir)")
+    from bot.database.db_manager import DatabaseManager
+    manager = DatabaseManager()
+    assert manager.setup_database()
+    yield manager
+    manager.engine.dispose()
+
+
+@pytest.fixture
+def db(_database_manager):
+    """Boş tablolarla DatabaseManager"""
+    from sqlalchemy import text
+    with _database_manager.engine.connect() as conn:
+        conn.execute(text(f"TRUNCATE {', '.join(DATA_TABLES)} RESTART IDENTITY CASCADE"))
+        conn.commit()
+    _database_manager.auth_cache.clear()
+    _database_manager.form_cache.clear()
+    _database_manager._cache_versions = {}
+    _database_manager._cache_synced_at = float('-inf')
+    return _database_manager
+
+
+def run_db(db, coroutine):
+    """Coroutine'i yeni bir event loop'ta çalıştır; async havuz loop'a bağlı olduğundan sonunda kapatılır"""
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            if db.async_engine is not None:
+                await db.async_engine.dispose()
+    return asyncio.run(main())
@@ -0,0 +1,17 @@
+import pytest
+from conftest import run_db
+
+ADMIN_ID = 300
+
+
+def test_bakiye_dus_distinguishes_insufficient_credit_from_errors(db):
+    async def scenario():
+        assert await db.add_admin(ADMIN_ID, 'Admin', 1)
+        assert await db.bakiye_yukle(ADMIN_ID, 3) == 3
+        enough = await db.bakiye_dus(ADMIN_ID, 2)
+        insufficient = await db.bakiye_dus(ADMIN_ID, 5)
+        with pytest.raises(ValueError):
+            await db.bakiye_dus('gecersiz', 1)
+        return enough, insufficient, await db.bakiye_getir(ADMIN_ID)
+
+    assert run_db(db, scenario()) == (1, None, 1)
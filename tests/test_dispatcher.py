@@ -0,0 +1,94 @@
+import asyncio
+import time
+from telegram.error import RetryAfter
+from bot.utils.dispatcher import NotificationDispatcher, DIGEST_SEPARATOR
+
+
+class FakeBot:
+    """send_message çağrılarını kaydeden, istenen sohbetlerde hata üreten sahte bot"""
+
+    def __init__(self):
+        self.errors = {}
+        self.sent = []
+        self.started = time.monotonic()
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        error = self.errors.get((chat_id, text))
+        if error is not None:
+            del self.errors[(chat_id, text)]
+            raise error
+        self.sent.append((round(time.monotonic() - self.started, 2), chat_id, text))
+
+
+def run_dispatcher(scenario, **kwargs):
+    """Senaryoyu sahte botlu bir dağıtıcıyla çalıştır ve durdur"""
+    async def main():
+        options = dict(global_rate=100, chat_interval=0, digest_window=0)
+        options.update(kwargs)
+        dispatcher = NotificationDispatcher(bot=FakeBot(), **options)
+        try:
+            return await scenario(dispatcher, dispatcher._bots['main'])
+        finally:
+            await dispatcher.stop(timeout=5)
+    return asyncio.run(main())
+
+
+def test_retry_after_only_delays_limited_chat():
+    async def scenario(dispatcher, bot):
+        bot.errors[(1, 'a')] = RetryAfter(1)
+        dispatcher.notify(1, 'a')
+        dispatcher.notify(2, 'b')
+        await asyncio.sleep(0.3)
+        sent_early = [chat_id for _, chat_id, _ in bot.sent]
+        await dispatcher.stop(timeout=5)
+        return sent_early, bot.sent, dispatcher.get_stats()
+
+    sent_early, sent, stats = run_dispatcher(scenario)
+    assert sent_early == [2]
+    assert [chat_id for _, chat_id, _ in sent] == [2, 1]
+    assert sent[1][0] >= 1.0
+    assert stats['retry_after'] == 1
+    assert stats['queue_depth'] == 0
+
+
+def test_digest_window_does_not_delay_other_messages():
+    async def scenario(dispatcher, bot):
+        dispatcher.notify(1, 'x', digest=True)
+        dispatcher.notify(1, 'y', digest=True)
+        dispatcher.notify(2, 'acil')
+        await asyncio.sleep(0.2)
+        sent_early = list(bot.sent)
+        await dispatcher.stop(timeout=5)
+        return sent_early, bot.sent, dispatcher.get_stats()
+
+    sent_early, sent, stats = run_dispatcher(scenario, digest_window=0.5)
+    assert [(chat_id, text) for _, chat_id, text in sent_early] == [(2, 'acil')]
+    assert (1, 'x' + DIGEST_SEPARATOR + 'y') in [(chat_id, text) for _, chat_id, text in sent]
+    assert stats['merged'] == 1
+    assert stats['digests'] == 1
+
+
+def test_failing_message_does_not_drop_rest_of_batch():
+    async def scenario(dispatcher, bot):
+        bot.errors[(1, 'bozuk')] = ValueError('hata')
+        dispatcher.notify(1, 'bozuk')
+        dispatcher.notify(1, 'sağlam')
+        await dispatcher.stop(timeout=5)
+        return bot.sent, dispatcher.get_stats()
+
+    sent, stats = run_dispatcher(scenario)
+    assert [(chat_id, text) for _, chat_id, text in sent] == [(1, 'sağlam')]
+    assert stats['failed'] == 1
+    assert stats['sent'] == 1
+
+
+def test_queue_limit_drops_messages():
+    async def scenario(dispatcher, bot):
+        results = [dispatcher.notify(chat_id, 'm') for chat_id in range(3)]
+        await dispatcher.stop(timeout=5)
+        return results, dispatcher.get_stats()
+
+    results, stats = run_dispatcher(scenario, maxsize=2)
+    assert results == [True, True, False]
+    assert stats['dropped'] == 1
+    assert stats['sent'] == 2
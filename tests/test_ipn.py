@@ -0,0 +1,63 @@
+import asyncio
+import functools
+import hashlib
+import hmac
+import json
+from aiohttp.test_utils import TestClient, TestServer
+from bot.utils import webhook_server
+from bot.utils.webhook_server import WebhookServer, verify_ipn_signature
+
+SECRET = 'ipn-secret'
+
+
+def _sign(body: str) -> str:
+    return hmac.new(SECRET.encode(), body.encode(), hashlib.sha512).hexdigest()
+
+
+def test_signature_matches_sorted_compact_json():
+    payload = {'payment_status': 'finished', 'payment_id': 5000000001, 'price_amount': 100.0,
+               'fee': {'currency': 'usdttrc20', 'depositFee': 0.5}, 'order_description': 'bakiye_200_ödeme'}
+    # NowPayments imzayı JSON.stringify(sıralı) üzerinden üretir: 100.0 -> 100, ASCII dışı karakterler olduğu gibi
+    signed = ('{"fee":{"currency":"usdttrc20","depositFee":0.5},"order_description":"bakiye_200_ödeme",'
+              '"payment_id":5000000001,"payment_status":"finished","price_amount":100}')
+    assert verify_ipn_signature(payload, _sign(signed), SECRET)
+    assert verify_ipn_signature(payload, _sign(signed).upper() + ' ', SECRET)
+
+
+def test_signature_rejects_tampering_and_missing_values():
+    payload = {'payment_id': 1, 'payment_status': 'finished'}
+    signature = _sign('{"payment_id":1,"payment_status":"finished"}')
+    assert not verify_ipn_signature(dict(payload, payment_status='failed'), signature, SECRET)
+    assert not verify_ipn_signature(payload, signature, 'baska-secret')
+    assert not verify_ipn_signature(payload, '', SECRET)
+    assert not verify_ipn_signature(payload, signature, '')
+
+
+def test_handle_ipn_status_codes(monkeypatch):
+    monkeypatch.setattr(webhook_server, 'verify_ipn_signature', functools.partial(verify_ipn_signature, secret=SECRET))
+    handled = []
+
+    async def ipn_handler(payload):
+        handled.append(payload)
+        return payload['payment_status'] == 'finished'
+
+    async def main():
+        server = WebhookServer(application=None, ipn_handler=ipn_handler)
+        async with TestClient(TestServer(server.make_app())) as client:
+            async def post(body: str, signature: str = None):
+                response = await client.post(webhook_server.NOWPAYMENTS_IPN_PATH, data=body.encode(),
+                                             headers={'x-nowpayments-sig': signature or _sign(body)})
+                return response.status
+
+            ok = json.dumps({'payment_id': 1, 'payment_status': 'finished'}, separators=(',', ':'))
+            failed = json.dumps({'payment_id': 1, 'payment_status': 'waiting'}, separators=(',', ':'))
+            return [
+                await post('[1, 2]'),
+                await post('not json'),
+                await post(ok, signature='0' * 128),
+                await post(ok),
+                await post(failed),
+            ]
+
+    assert asyncio.run(main()) == [400, 400, 403, 200, 500]
+    assert len(handled) == 2
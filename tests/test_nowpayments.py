@@ -0,0 +1,98 @@
+import asyncio
+import socket
+import pytest
+from bot.utils.fake_nowpayments import FakeNowPayments
+from bot.utils.nowpayments import NowPaymentsClient, NowPaymentsError, CircuitBreaker, CircuitOpenError
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def run_with_fake(scenario):
+    """Senaryoyu sahte NowPayments sunucusu ve ona bağlı istemciyle çalıştır"""
+    async def main():
+        fake = FakeNowPayments(port=_free_port())
+        await fake.start()
+        client = NowPaymentsClient(api_key='test', base_url=fake.base_url, timeout=5,
+                                   retries=2, backoff=0.01,
+                                   breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+        try:
+            return await scenario(fake, client)
+        finally:
+            await client.close()
+            await fake.stop()
+    return asyncio.run(main())
+
+
+def test_create_and_get_payment():
+    async def scenario(fake, client):
+        payment = await client.create_payment({'price_amount': 400, 'price_currency': 'try', 'order_id': 'o-1'})
+        assert payment['payment_status'] == 'waiting'
+        fake.set_status(payment['payment_id'], 'finished')
+        status = await client.get_payment(payment['payment_id'])
+        assert status['payment_status'] == 'finished'
+        assert fake.requests == 2
+    run_with_fake(scenario)
+
+
+def test_get_payment_retries_on_5xx():
+    async def scenario(fake, client):
+        payment = await client.create_payment({'price_amount': 40})
+        fake.fail_next = 2
+        status = await client.get_payment(payment['payment_id'])
+        assert status['payment_id'] == payment['payment_id']
+        # 1 oluşturma + 2 başarısız + 1 başarılı sorgu
+        assert fake.requests == 4
+        assert client.breaker.state == 'closed'
+    run_with_fake(scenario)
+
+
+def test_create_payment_is_not_retried_on_5xx():
+    async def scenario(fake, client):
+        fake.fail_next = 1
+        with pytest.raises(NowPaymentsError) as error:
+            await client.create_payment({'price_amount': 40})
+        assert error.value.status == 503
+        # Sunucu isteği almış olabilir; ikinci ödeme açılmamalı
+        assert fake.requests == 1
+        assert fake.payments == {}
+    run_with_fake(scenario)
+
+
+def test_create_payment_retries_connection_errors(caplog):
+    async def scenario(fake, client):
+        await fake.stop()
+        with pytest.raises(NowPaymentsError) as error:
+            await client.create_payment({'price_amount': 40})
+        assert 'ClientConnectorError' in str(error.value)
+    run_with_fake(scenario)
+    # Bağlantı hiç kurulamadığı için tüm denemeler yapılır
+    attempts = [record for record in caplog.records if 'NowPayments isteği başarısız' in record.getMessage()]
+    assert len(attempts) == 3
+
+
+def test_client_error_is_not_retried_and_keeps_breaker_closed():
+    async def scenario(fake, client):
+        with pytest.raises(NowPaymentsError) as error:
+            await client.get_payment('missing')
+        assert error.value.status == 404
+        assert fake.requests == 1
+        assert client.breaker.state == 'closed'
+    run_with_fake(scenario)
+
+
+def test_breaker_opens_after_consecutive_failures():
+    async def scenario(fake, client):
+        fake.fail_next = 100
+        for _ in range(2):
+            with pytest.raises(NowPaymentsError):
+                await client.get_payment('1')
+        assert client.breaker.state == 'open'
+        requests = fake.requests
+        with pytest.raises(CircuitOpenError):
+            await client.get_payment('1')
+        assert fake.requests == requests
+    run_with_fake(scenario)
@@ -0,0 +1,65 @@
+import asyncio
+from sqlalchemy import text
+from conftest import run_db
+
+ADMIN_ID = 200
+
+
+def test_paid_status_credits_exactly_once(db):
+    async def scenario():
+        assert await db.record_payment('p-1', ADMIN_ID, price_amount=100, price_currency='try')
+        outcomes = [
+            await db.apply_payment_status('p-1', 'confirming', 10),
+            await db.apply_payment_status('p-1', 'confirmed', 10),
+            await db.apply_payment_status('p-1', 'confirmed', 10),
+            await db.apply_payment_status('p-1', 'finished', 10),
+            await db.apply_payment_status('p-1', 'finished', 10),
+        ]
+        return outcomes, await db.bakiye_getir(ADMIN_ID), await db.is_admin(ADMIN_ID)
+
+    outcomes, balance, is_admin = run_db(db, scenario())
+    assert [outcome['changed'] for outcome in outcomes] == [True, True, False, True, False]
+    assert [outcome['credited'] for outcome in outcomes] == [False, True, False, False, False]
+    # Ödeyen kullanıcı yükleme ile aynı işlemde admin yapılır
+    assert outcomes[1]['promoted'] and outcomes[1]['balance'] == 10
+    assert balance == 10
+    assert is_admin
+
+
+def test_concurrent_paid_updates_credit_once(db):
+    async def scenario():
+        assert await db.add_admin(ADMIN_ID, 'Admin', 1)
+        assert await db.record_payment('p-2', ADMIN_ID, price_amount=50)
+        outcomes = await asyncio.gather(
+            db.apply_payment_status('p-2', 'finished', 10),
+            db.apply_payment_status('p-2', 'finished', 10),
+            db.apply_payment_status('p-2', 'confirmed', 10),
+        )
+        return outcomes, await db.bakiye_getir(ADMIN_ID)
+
+    outcomes, balance = run_db(db, scenario())
+    assert sum(outcome['credited'] for outcome in outcomes) == 1
+    assert not any(outcome['promoted'] for outcome in outcomes)
+    assert balance == 5
+
+
+def test_late_payment_after_local_timeout_is_credited(db):
+    async def scenario():
+        assert await db.record_payment('p-3', ADMIN_ID, price_amount=30)
+        with db.engine.connect() as conn:
+            conn.execute(text("UPDATE payments SET status = 'timed_out' WHERE payment_id = 'p-3'"))
+            conn.commit()
+        # Zaman aşımına uğramış ödeme 'waiting' durumuna geri dönmez
+        back_to_waiting = await db.apply_payment_status('p-3', 'waiting', 10)
+        finished = await db.apply_payment_status('p-3', 'finished', 10)
+        return back_to_waiting, finished, await db.bakiye_getir(ADMIN_ID)
+
+    back_to_waiting, finished, balance = run_db(db, scenario())
+    assert not back_to_waiting['changed']
+    assert finished['credited']
+    assert balance == 3
+
+
+def test_unknown_payment_is_not_found(db):
+    outcome = run_db(db, db.apply_payment_status('yok', 'finished', 10))
+    assert outcome['found'] is False and outcome['changed'] is False
@@ -0,0 +1,72 @@
+from sqlalchemy import text
+from bot.database.persistence import PostgresPersistence
+from conftest import run_db
+
+
+def test_user_chat_and_bot_data_round_trip(db):
+    async def scenario():
+        writer = PostgresPersistence(db)
+        await writer.update_user_data(10, {'form': 'Kayit', 'step': 2})
+        await writer.update_user_data(10, {'form': 'Kayit', 'step': 2})
+        await writer.update_chat_data(-20, {'lang': 'tr'})
+        await writer.update_bot_data({'version': 3})
+        await writer.update_callback_data(([('id', 1.0, {'a': 'b'})], {'m': 'id'}))
+
+        # Yeniden başlatılmış süreç
+        reader = PostgresPersistence(db)
+        user_data, chat_data = {}, {}
+        await reader.refresh_user_data(10, user_data)
+        await reader.refresh_chat_data(-20, chat_data)
+        return (writer.get_stats(), user_data, chat_data, await reader.get_bot_data(),
+                await reader.get_callback_data(), await reader.get_user_data())
+
+    stats, user_data, chat_data, bot_data, callback_data, bulk_user_data = run_db(db, scenario())
+    # Değişmeyen içerik ikinci kez yazılmaz
+    assert stats['written'] == 4 and stats['skipped'] == 1
+    assert user_data == {'form': 'Kayit', 'step': 2}
+    assert chat_data == {'lang': 'tr'}
+    assert bot_data == {'version': 3}
+    assert callback_data == ([('id', 1.0, {'a': 'b'})], {'m': 'id'})
+    # Kullanıcı verisi toplu yüklenmez
+    assert bulk_user_data == {}
+
+
+def test_shared_mode_reloads_changes_from_other_process(db):
+    async def scenario():
+        first = PostgresPersistence(db, shared=True)
+        second = PostgresPersistence(db, shared=True)
+        data = {}
+        await first.update_user_data(10, {'step': 1})
+        await second.refresh_user_data(10, data)
+        await first.update_user_data(10, {'step': 2})
+        await second.refresh_user_data(10, data)
+        return data
+
+    assert run_db(db, scenario()) == {'step': 2}
+
+
+def test_conversations_round_trip_and_ttl(db):
+    async def scenario():
+        writer = PostgresPersistence(db, conversation_ttl=900)
+        await writer.update_conversation('form_data', (-20, 10), 1)
+        await writer.update_conversation('form_data', (-20, 11), 2)
+        await writer.update_conversation('form_data', (-20, 12), 3)
+        await writer.update_conversation('form_data', (-20, 11), None)
+        with db.engine.connect() as conn:
+            conn.execute(text("""
+                UPDATE persistence_conversations SET updated_at = CURRENT_TIMESTAMP - interval '1 hour'
+                WHERE key = '[-20, 12]'
+            """))
+            conn.commit()
+
+        reader = PostgresPersistence(db, conversation_ttl=900)
+        restored = await reader.get_conversations('form_data')
+        other = await reader.get_conversations('load_credits')
+        removed = await reader.compact(max_age=86400)
+        return restored, other, removed
+
+    restored, other, removed = run_db(db, scenario())
+    # Silinen ve zaman aşımına uğramış konuşmalar geri yüklenmez
+    assert restored == {(-20, 10): 1}
+    assert other == {}
+    assert removed['conversations'] == 1
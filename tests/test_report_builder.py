@@ -0,0 +1,42 @@
+import io
+from openpyxl import load_workbook
+from conftest import run_db
+from bot.database.report_builder import build_report
+
+ADMIN_ID = 100
+GROUP_ID = -500
+FORM_NAME = 'Kayit'
+
+
+def test_column_widths_cover_all_chunks(db):
+    async def scenario():
+        assert await db.add_admin(ADMIN_ID, 'Admin', 1)
+        assert await db.add_group(GROUP_ID, 'Grup', ADMIN_ID)
+        assert await db.add_form(FORM_NAME, ['Ad', 'Not'], ADMIN_ID, chat_id=GROUP_ID)
+        assert await db.bakiye_yukle(ADMIN_ID, 10) == 10
+        # Uzun değer ilk parçada değil, son satırda
+        for index, note in enumerate(['kisa', 'kisa', 'x' * 30]):
+            result = await db.submit_form(FORM_NAME, GROUP_ID, 7, GROUP_ID, f"Kisi {index}\n{note}")
+            assert result['status'] == 'ok'
+
+    run_db(db, scenario())
+    with db.engine.connect() as conn:
+        report = build_report(conn, FORM_NAME, is_super_admin=True, chunk_size=1)
+
+    ws = load_workbook(io.BytesIO(report.getvalue())).active
+    assert ws.max_row == 4
+    assert [ws.cell(row=row, column=3).value for row in range(2, 5)] == ['kisa', 'kisa', 'x' * 30]
+    assert ws.column_dimensions['C'].width == 32
+    assert ws.column_dimensions['B'].width == 10
+    assert ws.column_dimensions['A'].width == 8
+
+
+def test_report_without_rows_returns_none(db):
+    async def scenario():
+        assert await db.add_admin(ADMIN_ID, 'Admin', 1)
+        assert await db.add_group(GROUP_ID, 'Grup', ADMIN_ID)
+        assert await db.add_form(FORM_NAME, ['Ad'], ADMIN_ID, chat_id=GROUP_ID)
+
+    run_db(db, scenario())
+    with db.engine.connect() as conn:
+        assert build_report(conn, FORM_NAME, is_super_admin=True) is None
@@ -0,0 +1,40 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from bot.database.db_manager import submission_digest, blind_index
+from bot.database.keys import MissingKeyError
+
+
+def test_digest_ignores_whitespace_differences():
+    assert submission_digest('Ali Veli\n0555') == submission_digest('  Ali   Veli \n0555\n')
+    assert submission_digest('Ali Veli\n0555') != submission_digest('Ali Veli\n0556')
+
+
+def test_digest_uses_hash_key(monkeypatch):
+    monkeypatch.delenv('SUBMISSION_HASH_KEY', raising=False)
+    default = submission_digest('Ali Veli')
+    monkeypatch.setenv('SUBMISSION_HASH_KEY', 'baska-anahtar')
+    assert submission_digest('Ali Veli') != default
+
+
+def test_missing_keys_fail_fast(monkeypatch):
+    for name in ('POSTGRES_ENCRYPTION_KEY', 'SUBMISSION_HASH_KEY', 'BLIND_INDEX_KEY'):
+        monkeypatch.delenv(name, raising=False)
+    with pytest.raises(MissingKeyError):
+        submission_digest('Ali Veli')
+    with pytest.raises(MissingKeyError):
+        blind_index('Ad Soyad', 'Ali Veli')
+
+
+def test_unique_hash_index_rejects_second_row(db):
+    with db.engine.connect() as conn:
+        conn.execute(text("INSERT INTO groups (group_id, group_name) VALUES (-1, 'G')"))
+        conn.execute(text("INSERT INTO forms (form_name, group_id, fields) VALUES ('F', -1, 'A')"))
+        insert = text("""
+            INSERT INTO form_submissions (form_name, group_id, user_id, chat_id, data_hash)
+            VALUES ('F', -1, 1, -1, :data_hash)
+        """)
+        conn.execute(insert, {"data_hash": submission_digest('Ali')})
+        conn.commit()
+        with pytest.raises(IntegrityError):
+            conn.execute(insert, {"data_hash": submission_digest(' Ali ')})
@@ -0,0 +1,87 @@
+from sqlalchemy import text
+from conftest import run_db
+
+ADMIN_ID = 100
+GROUP_ID = -500
+FORM_NAME = 'Kayit'
+DATA = 'Ali Veli\n05550000000'
+
+
+async def _prepare(db, credits: float):
+    assert await db.add_admin(ADMIN_ID, 'Admin', 1)
+    assert await db.add_group(GROUP_ID, 'Grup', ADMIN_ID)
+    assert await db.add_form(FORM_NAME, ['Ad Soyad', 'Telefon'], ADMIN_ID, chat_id=GROUP_ID)
+    if credits:
+        assert await db.bakiye_yukle(ADMIN_ID, credits) == credits
+
+
+def _count(db, table: str) -> int:
+    with db.engine.connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+
+def test_successful_submission_returns_id_and_balance(db):
+    async def scenario():
+        await _prepare(db, 2)
+        result = await db.submit_form(FORM_NAME, GROUP_ID, 7, GROUP_ID, DATA)
+        assert result['status'] == 'ok'
+        assert result['balance'] == 1
+        submissions = await db.get_form_submissions(FORM_NAME, GROUP_ID, 'Ad Soyad', 'ali  VELİ', field_count=2)
+        return result, submissions
+
+    result, submissions = run_db(db, scenario())
+    assert [submission['id'] for submission in submissions] == [result['submission_id']]
+    assert submissions[0]['values'] == DATA.split('\n')
+    assert _count(db, 'submission_values') == 2
+
+
+def test_duplicate_is_rejected_without_charge(db):
+    async def scenario():
+        await _prepare(db, 5)
+        first = await db.submit_form(FORM_NAME, GROUP_ID, 7, GROUP_ID, DATA)
+        # Boşluk farkı mükerrer sayılır
+        second = await db.submit_form(FORM_NAME, GROUP_ID, 8, GROUP_ID, '  Ali   Veli \n05550000000')
+        return first, second, await db.bakiye_getir(ADMIN_ID)
+
+    first, second, balance = run_db(db, scenario())
+    assert first['status'] == 'ok'
+    assert second == {'status': 'duplicate', 'submission_id': None, 'balance': None}
+    assert balance == 4
+    assert _count(db, 'form_submissions') == 1
+
+
+def test_insufficient_credits_leaves_no_row(db):
+    async def scenario():
+        await _prepare(db, 0.5)
+        return await db.submit_form(FORM_NAME, GROUP_ID, 7, GROUP_ID, DATA), await db.bakiye_getir(ADMIN_ID)
+
+    result, balance = run_db(db, scenario())
+    assert result['status'] == 'insufficient_credits'
+    assert balance == 0.5
+    assert _count(db, 'form_submissions') == 0
+    assert _count(db, 'submission_values') == 0
+
+
+def test_unknown_form_is_reported(db):
+    async def scenario():
+        await _prepare(db, 2)
+        return await db.submit_form('Yok', GROUP_ID, 7, GROUP_ID, DATA), await db.bakiye_getir(ADMIN_ID)
+
+    result, balance = run_db(db, scenario())
+    assert result['status'] == 'form_not_found'
+    assert balance == 2
+    assert _count(db, 'form_submissions') == 0
+
+
+def test_receipt_upload_is_queued_with_submission(db):
+    async def scenario():
+        await _prepare(db, 2)
+        return await db.submit_form(FORM_NAME, GROUP_ID, 7, GROUP_ID, DATA + '\nDekont: bekleniyor-1', receipt_upload={
+            'file_id': 'file-1', 'file_unique_id': 'uniq-1', 'mime_type': 'image/jpeg', 'placeholder': 'bekleniyor-1'
+        })
+
+    result = run_db(db, scenario())
+    assert result['status'] == 'ok'
+    with db.engine.connect() as conn:
+        row = conn.execute(text("SELECT submission_id, file_unique_id, status FROM receipt_uploads")).fetchone()
+    assert tuple(row) == (result['submission_id'], 'uniq-1', 'pending')